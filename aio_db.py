@@ -0,0 +1,176 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import peewee
+from loguru import logger
+
+
+class QueryStats:
+    __slots__ = ("count", "errors", "wait", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wait = 0.0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait: float, duration: float, failed: bool):
+        self.count += 1
+        self.errors += int(failed)
+        self.wait += wait
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_wait_ms": self.wait / self.count * 1000 if self.count else 0.0,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+def _query_name(func: Callable) -> str:
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+def _resolve(future: asyncio.Future, result, exc: Optional[BaseException]):
+    if future.cancelled():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+class AsyncDatabase:
+    """
+    Runs peewee calls off the event loop.
+
+    Writes go to a single writer thread. Everything that is queued when the
+    writer wakes up is executed in one transaction, each call inside its own
+    savepoint, so a failing call doesn't roll back its neighbours. Reads go to
+    a small thread pool; with WAL journaling they don't wait for the writer.
+    """
+
+    def __init__(
+        self, database: peewee.Database, readers: int = 2, max_batch: int = 50
+    ):
+        self.database = database
+        self.max_batch = max_batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix="db-reader"
+        )
+        self._lock = threading.Lock()
+        self.stats: Dict[str, QueryStats] = defaultdict(QueryStats)
+        self.max_queue_depth = 0
+        self.batches = 0
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="db-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _record(self, func: Callable, queued: float, start: float, failed: bool):
+        now = time.perf_counter()
+        with self._lock:
+            self.stats[_query_name(func)].add(start - queued, now - start, failed)
+
+    async def write(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._start_writer()
+        self._queue.put((func, args, kwargs, future, loop, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def read(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._readers, self._run_read, func, args, kwargs, time.perf_counter()
+        )
+
+    def _run_read(self, func: Callable, args, kwargs, queued: float):
+        start = time.perf_counter()
+        failed = True
+        try:
+            res = func(*args, **kwargs)
+            failed = False
+            return res
+        finally:
+            self._record(func, queued, start, failed)
+
+    def _writer_loop(self):
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            self._run_batch(batch)
+
+        if not self.database.is_closed():
+            self.database.close()
+
+    def _run_batch(self, batch):
+        results = []
+        try:
+            with self.database.atomic():
+                for func, args, kwargs, future, loop, queued in batch:
+                    start = time.perf_counter()
+                    try:
+                        with self.database.atomic():
+                            res = func(*args, **kwargs)
+                    except Exception as e:
+                        self._record(func, queued, start, True)
+                        results.append((future, loop, None, e))
+                    else:
+                        self._record(func, queued, start, False)
+                        results.append((future, loop, res, None))
+        except Exception as e:
+            logger.exception("Database transaction failed")
+            results = [(job[3], job[4], None, e) for job in batch]
+
+        self.batches += 1
+        for future, loop, res, exc in results:
+            loop.call_soon_threadsafe(_resolve, future, res, exc)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            queries = {name: s.as_dict() for name, s in self.stats.items()}
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "queries": queries,
+        }
+
+    async def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+            self._writer = None
+        self._readers.shutdown(wait=True)
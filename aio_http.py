@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+# Nothing we talk to should take longer than this to accept a connection or
+# to send the next chunk of a response
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=5, sock_read=10)
+# the same for the remaining synchronous `requests` calls: (connect, read)
+REQUESTS_TIMEOUT = (5, 10)
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+DEFAULT_RETRIES = 2
+RETRY_BASE = 0.5
+RETRY_MAX = 5.0
+
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+_breakers: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures (connection errors, timeouts and 5xx) of one
+    upstream. After `threshold` of them the breaker opens and requests fail
+    immediately for `reset_timeout` seconds; then one trial request is let
+    through, and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.latencies: deque = deque(maxlen=100)
+        self.stats = {"requests": 0, "errors": 0, "rejected": 0, "opened": 0}
+
+    def before_request(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self.trial_running:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+            self.trial_running = True
+
+        self.stats["requests"] += 1
+
+    def record(self, ok: bool, latency: float):
+        self.latencies.append(latency)
+        self.trial_running = False
+        if ok:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} is back, closing circuit")
+            self.state = self.CLOSED
+            self.failures = 0
+            return
+
+        self.stats["errors"] += 1
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"{self.name} keeps failing, opening circuit")
+                self.stats["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """The request never got an answer, let another trial through"""
+        self.trial_running = False
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return dict(
+            self.stats,
+            state=self.state,
+            failures=self.failures,
+            p50_ms=p50 * 1000,
+            p95_ms=p95 * 1000,
+        )
+
+
+def get_session(name: str, **kwargs) -> aiohttp.ClientSession:
+    """
+    Shared aiohttp session (and connection pool) for one upstream, created on
+    first use. Must be called with the event loop running.
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        kwargs.setdefault(
+            "connector", aiohttp.TCPConnector(limit_per_host=4, ttl_dns_cache=300)
+        )
+        session = aiohttp.ClientSession(**kwargs)
+        _sessions[name] = session
+
+    return session
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def metrics() -> Dict[str, dict]:
+    return {name: breaker.metrics() for name, breaker in _breakers.items()}
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(RETRY_MAX, RETRY_BASE * 2**attempt))
+
+
+@contextlib.asynccontextmanager
+async def request(
+    name: str,
+    method: str,
+    url: str,
+    retries: Optional[int] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    **kwargs,
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    `session.request()` through the circuit breaker of upstream `name`.
+    Idempotent methods are retried `retries` times on connection errors,
+    timeouts and 5xx responses; the last response is returned whatever its
+    status, so callers still use raise_for_status().
+    """
+    if retries is None:
+        retries = DEFAULT_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+    if session is None:
+        session = get_session(name)
+    breaker = get_breaker(name)
+
+    for attempt in range(retries + 1):
+        breaker.before_request()
+        started = time.monotonic()
+        try:
+            response = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            breaker.record(False, time.monotonic() - started)
+            if attempt == retries:
+                raise
+        except BaseException:
+            # cancelled or broken on our side, says nothing about the upstream
+            breaker.abandon()
+            raise
+        else:
+            failed = response.status >= 500
+            breaker.record(not failed, time.monotonic() - started)
+            if not failed or attempt == retries:
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+            response.release()
+
+        await asyncio.sleep(retry_delay(attempt))
+
+
+async def close_sessions():
+    for session in _sessions.values():
+        if not session.closed:
+            await session.close()
+    _sessions.clear()
@@ -16,6 +16,27 @@ class Timer:
         self._task.cancel()
 
 
+class AdaptiveInterval:
+    """
+    Poll interval that grows exponentially (up to `maximum`) every time
+    backoff() is called and drops back to `minimum` on reset().
+    """
+
+    def __init__(self, minimum, maximum, factor=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.current = minimum
+
+    def backoff(self):
+        delay = self.current
+        self.current = min(self.maximum, self.current * self.factor)
+        return delay
+
+    def reset(self):
+        self.current = self.minimum
+
+
 class Periodic:
     def __init__(self, name, timeout, callback, loop):
         self.func = callback
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+from typing import Any, Callable, Dict, Optional
+
+import pika
+import pika.exceptions
+import pika.spec
+from loguru import logger
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+
+class PublishError(Exception):
+    pass
+
+
+def _resolve(future: asyncio.Future, result=None, exc: Optional[Exception] = None):
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+class AMQPPublisher:
+    """
+    Long-lived publisher for a single queue. Connects on first publish,
+    declares the queue once per connection and waits for the broker to confirm
+    every message. `connection_factory(on_open, on_open_error, on_close)` must
+    return an object with the pika AsyncioConnection interface.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str],
+        queue: str,
+        queue_arguments: Optional[Dict[str, Any]] = None,
+        connection_factory: Optional[Callable] = None,
+        connect_attempts: int = 5,
+        connect_timeout: float = 10.0,
+        max_backoff: float = 30.0,
+    ):
+        self.url = url
+        self.queue = queue
+        self.queue_arguments = queue_arguments or {}
+        self.connection_factory = connection_factory or self.pika_connection
+        self.connect_attempts = connect_attempts
+        self.connect_timeout = connect_timeout
+        self.max_backoff = max_backoff
+
+        self._connection = None
+        self._channel = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._delivery_tag = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    def pika_connection(self, on_open, on_open_error, on_close):
+        return AsyncioConnection(
+            pika.URLParameters(self.url),
+            on_open_callback=on_open,
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=asyncio.get_running_loop(),
+        )
+
+    @property
+    def is_open(self) -> bool:
+        return self._channel is not None and self._channel.is_open
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        opening = loop.create_future()
+
+        connection = self.connection_factory(
+            lambda conn: _resolve(opening),
+            lambda conn, exc: _resolve(opening, exc=ConnectionError(str(exc))),
+            functools.partial(self._on_connection_closed, opening),
+        )
+        try:
+            await opening
+
+            step = loop.create_future()
+            connection.channel(on_open_callback=lambda ch: _resolve(step, ch))
+            channel = await step
+            channel.add_on_close_callback(self._on_channel_closed)
+
+            step = loop.create_future()
+            channel.confirm_delivery(
+                self._on_delivery_confirmation, callback=lambda frame: _resolve(step)
+            )
+            await step
+
+            step = loop.create_future()
+            channel.queue_declare(
+                self.queue,
+                durable=True,
+                arguments=self.queue_arguments,
+                callback=lambda frame: _resolve(step),
+            )
+            await step
+        except BaseException:
+            # also abandons a connection that is still opening, e.g. on timeout
+            try:
+                connection.close()
+            except pika.exceptions.ConnectionWrongStateError:
+                pass
+            raise
+
+        self._connection = connection
+        self._channel = channel
+        self._delivery_tag = 0
+        logger.info(f"AMQP publisher for queue {self.queue} connected")
+
+    async def _ensure_channel(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            delay = min(1.0, self.max_backoff)
+            attempt = 0
+            while not self.is_open:
+                attempt += 1
+                try:
+                    await asyncio.wait_for(self._open(), self.connect_timeout)
+                except (ConnectionError, asyncio.TimeoutError) as e:
+                    if attempt >= self.connect_attempts:
+                        raise ConnectionError(
+                            f"AMQP connection failed after {attempt} attempts: {e}"
+                        )
+                    logger.warning(f"AMQP connection failed: {e}, retry in {delay}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+
+            return self._channel
+
+    async def connect(self):
+        await self._ensure_channel()
+
+    async def publish(self, body: bytes, expiration: Optional[int] = None):
+        """
+        Publish `body` to the queue and wait for the broker to confirm it.
+        `expiration` is the per-message TTL in milliseconds. Raises
+        ConnectionError if the broker can't be reached or the connection is
+        lost before the confirm arrives, PublishError if the broker nacks.
+        """
+        channel = await self._ensure_channel()
+
+        self._delivery_tag += 1
+        confirm = asyncio.get_running_loop().create_future()
+        self._pending[self._delivery_tag] = confirm
+        channel.basic_publish(
+            exchange="",
+            routing_key=self.queue,
+            body=body,
+            properties=pika.BasicProperties(
+                expiration=str(expiration) if expiration is not None else None
+            ),
+        )
+        await confirm
+
+    async def close(self):
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+        self._reset(ConnectionError("publisher closed"))
+
+    def _reset(self, exc: Exception):
+        self._connection = None
+        self._channel = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            _resolve(future, exc=exc)
+
+    def _on_connection_closed(self, opening, connection, reason):
+        _resolve(opening, exc=ConnectionError(str(reason)))
+        if connection is self._connection:
+            logger.warning(f"AMQP connection closed: {reason}")
+            self._reset(ConnectionError(f"connection closed: {reason}"))
+
+    def _on_channel_closed(self, channel, reason):
+        if channel is self._channel:
+            logger.warning(f"AMQP channel closed: {reason}")
+            connection = self._connection
+            self._reset(ConnectionError(f"channel closed: {reason}"))
+            if connection is not None and connection.is_open:
+                connection.close()
+
+    def _on_delivery_confirmation(self, frame):
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+
+        ack = isinstance(method, pika.spec.Basic.Ack)
+        for tag in tags:
+            future = self._pending.pop(tag, None)
+            if future is None:
+                continue
+            if ack:
+                _resolve(future)
+            else:
+                _resolve(future, exc=PublishError(f"message {tag} was nacked"))
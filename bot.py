@@ -12,21 +12,37 @@ from collections import defaultdict, deque
 from multiprocessing import Process
 from typing import Union, Iterable, Optional, List, Dict
 
+import aiohttp
 import eyed3 as eyed3
 import peewee
-import requests
 import socketio
 import uvicorn
 from dotenv import load_dotenv
 from loguru import logger
-from pywizlight import wizlight, PilotBuilder
 from requests.structures import CaseInsensitiveDict
-from twitchio import User, Message, Channel, Chatter, Client
-from twitchio.ext import commands, sounds, pubsub
-
+from twitchio import User, Message, Channel, Chatter
+from twitchio.ext import commands, sounds
+
+import aio_db
+import aio_http
+import channel_watcher
+import chatters
+import effects
+import eventsub
+import helix_client
+import moderation
 import nightbot_api
+import nightbot_client
+import redemptions
+import rewards
+import settings
+import sqlite_profile
+import stream_metrics
+import tokens
 import twitch_api
+import wiz_lights
 from aio_timer import Periodic
+from duel_stats import DuelStats
 from config import *
 
 from twitch_commands import twitch_command_aliased
@@ -35,9 +51,11 @@ httpclient_logger = logging.getLogger("http.client")
 proc: Process
 dashboard_timer: Periodic
 sl_client: socketio.AsyncClient
-database = peewee.SqliteDatabase(database_file)
-# PubSub client
-client: Optional[Client] = None
+database = sqlite_profile.open_database(
+    database_file,
+    **settings.options(profile="database_profile", overrides="database_pragmas"),
+)
+DuelStats.bind(database)
 
 
 class InterceptHandler(logging.Handler):
@@ -145,18 +163,6 @@ class GameConfig(peewee.Model):
         database = database
 
 
-class DuelStats(peewee.Model):
-    attacker = peewee.TextField()
-    defender = peewee.TextField()
-    losses = peewee.IntegerField(null=False, default=0)
-    wins = peewee.IntegerField(null=False, default=0)
-
-    class Meta:
-        table_name = "duelstats"
-        database = database
-        primary_key = peewee.CompositeKey("attacker", "defender")
-
-
 class Bot(commands.Bot):
     def __init__(self, sio_server, initial_channels=None):
         super().__init__(
@@ -178,7 +184,10 @@ class Bot(commands.Bot):
         self.trans = str.maketrans(s1, s2)
         self.rtrans = str.maketrans(s2, s1)
 
-        # hack
+        # The chat connection runs under its own app (TWITCH_CHAT_CLIENT_ID),
+        # not the one TokenManager keeps the "twitch" token for, and twitchio
+        # refreshes the chat token by itself - it only needs the refresh token,
+        # which it has no public way to accept.
         self._http._refresh_token = os.getenv("TWITCH_REFRESH_TOKEN")
 
         self.initial_channels = initial_channels or ["#iarspider"]
@@ -193,7 +202,53 @@ class Bot(commands.Bot):
 
         self.vmod = None
         self.vmod_active = False
-        self.pubsub_client: Optional[Client] = None
+        self.tokens = tokens.TokenManager()
+        self.tokens.add(
+            tokens.OAuth2Token(
+                "twitch",
+                twitch_api.TOKEN_FILE,
+                twitch_api.TOKEN_URL,
+                os.getenv("TWITCH_CLIENT_ID"),
+                os.getenv("TWITCH_CLIENT_SECRET"),
+                validate_url=twitch_api.VALIDATE_URL,
+                authorize=lambda: twitch_api.get_token(
+                    os.getenv("TWITCH_CLIENT_ID"),
+                    os.getenv("TWITCH_CLIENT_SECRET"),
+                    twitch_redirect_url,
+                ),
+            )
+        )
+        self.tokens_task: Optional[asyncio.Task] = None
+        self.helix = helix_client.HelixClient(
+            os.getenv("TWITCH_CLIENT_ID"), self.get_user_token
+        )
+        self.redemptions = redemptions.RedemptionUpdater(self.patch_redemptions)
+        self.moderation = moderation.ModerationQueue(
+            self.helix, lambda: self.streamer_id
+        )
+        self.channel = channel_watcher.ChannelWatcher(
+            self.fetch_channel_info, self.on_channel_change
+        )
+        self.channel_task: Optional[asyncio.Task] = None
+        self.stream_sampler = stream_metrics.StreamSampler(
+            self.fetch_stream, self.emit_stream_sample
+        )
+        self.sampler_task: Optional[asyncio.Task] = None
+        self.chatters = chatters.ChattersReconciler(
+            lambda: chatters.fetch_chatters(self.helix, str(self.streamer_id)),
+            lambda: {viewer.name.lower() for viewer in self.viewers.values()},
+            self.on_chatter_joined,
+            self.on_chatter_left,
+        )
+        self.chatters_task: Optional[asyncio.Task] = None
+        self.eventsub = eventsub.EventSubClient(
+            self.subscribe_eventsub,
+            {
+                eventsub.REDEMPTION_ADD: self.event_eventsub_redemption,
+                channel_watcher.CHANNEL_UPDATE: self.channel.on_channel_update,
+            },
+        )
+        self.eventsub_task: Optional[asyncio.Task] = None
 
         self.attacks = defaultdict(list)
         self.bots = (
@@ -214,22 +269,47 @@ class Bot(commands.Bot):
         self.sio_server = sio_server
         self.timer = None
         self.game: Optional[GameConfig] = None
+        self.aiodb = aio_db.AsyncDatabase(database)
+        self.effects = effects.EffectScheduler(on_change=self.emit_effects)
+        self.rewards = rewards.RewardDispatcher(
+            settings.get("channel_rewards", rewards.DEFAULT_REWARDS), self.do_reward
+        )
+        self.reward_effects = {
+            "voicemod": self.start_voicemod,
+            "disco": do_wizlight_disco,
+        }
         # self.duels: Optional[DuelStats] = None
         self.pubsub_events: List[Dict] = []
         self.title = ""
 
         self.load_pearls()
 
-        self.nightbot = nightbot_api.get_nightbot_session(
-            os.getenv("NIGHTBOT_CLIENT_ID"),
-            os.getenv("NIGHTBOT_CLIENT_SECRET"),
-            nightbot_redirect_url,
+        self.nightbot = nightbot_client.NightbotClient(
+            self.tokens.add(
+                tokens.OAuth2Token(
+                    "nightbot",
+                    nightbot_api.TOKEN_FILE,
+                    nightbot_api.TOKEN_URL,
+                    os.getenv("NIGHTBOT_CLIENT_ID"),
+                    os.getenv("NIGHTBOT_CLIENT_SECRET"),
+                    authorize=lambda: nightbot_api.get_token(
+                        os.getenv("NIGHTBOT_CLIENT_ID"),
+                        os.getenv("NIGHTBOT_CLIENT_SECRET"),
+                        nightbot_redirect_url,
+                    ),
+                    redirect_uri=nightbot_redirect_url,
+                )
+            )
         )
 
     async def send_message(self, message):
         channel: Channel = self.get_channel(self.initial_channels[0].lstrip("#"))
         asyncio.ensure_future(channel.send(message))
 
+    def emit_effects(self, snapshot: dict):
+        if self.sio_server is not None:
+            asyncio.ensure_future(self.sio_server.emit("effects", snapshot))
+
     async def player_done(self):
         pass
 
@@ -239,67 +319,84 @@ class Bot(commands.Bot):
             if cog_method:
                 cog_method()
 
-    def get_game_v5(self):
-        r = requests.get(
-            f"https://api.twitch.tv/helix/channels?broadcaster_id={self.streamer_id}&",
-            headers={
-                "Authorization": f"Bearer {os.getenv('TWITCH_CHAT_PASSWORD')}",
-                "Client-ID": os.getenv("TWITCH_CHAT_CLIENT_ID"),
-            },
-        )
+    def update_cogs(self, changed):
+        """Call update() of the cogs that watch any of the `changed` fields"""
+        for cog in self.cogs.values():
+            if getattr(cog, "watches", frozenset()) & changed:
+                cog.update()
+
+    async def update_nightbot(self, game: GameConfig):
+        timers = {"Мультитвич": game.mt, "Neputin": not game.mt}
+        messages = {}
+        if game.mt:
+            if game.mt_str.startswith("http"):
+                messages["!mt"] = "Мультитвич: " + game.mt_str
+            else:
+                messages["!mt"] = (
+                    "Мультитвич: https://www.multitwitch.tv/" + game.mt_str
+                )
 
         try:
-            r.raise_for_status()
-        except requests.RequestException as e:
-            logger.error("Request to Helix API failed!" + str(e))
-            self.game = GameConfig.create(game="")
-            return
+            await self.nightbot.reconcile(timers, messages)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to update Nightbot: {e}")
+
+    async def fetch_channel_info(self) -> channel_watcher.ChannelInfo:
+        res = await self.helix.request(
+            "GET",
+            "channels",
+            params={"broadcaster_id": str(self.streamer_id)},
+            priority=helix_client.PRIORITY_LOW,
+        )
+        data = res["data"][0]
+        return channel_watcher.ChannelInfo(data["game_name"], data["title"])
+
+    async def on_channel_change(self, info: channel_watcher.ChannelInfo, changed):
+        self.title = info.title
+        if "game" in changed:
+            self.game, _ = await self.aiodb.write(
+                GameConfig.get_or_create, game=info.game
+            )
+            asyncio.ensure_future(self.update_nightbot(self.game))
 
-        if "error" in r.json():
-            logger.error("Request to Helix API failed!" + r.json()["message"])
-            self.game = GameConfig.create(game="")
-            return
-        #
-        # with open("game.json", "w") as f:
-        #     json.dump(r.json(), f)
-
-        self.title = r.json()["data"][0]["title"]
-        game_name = r.json()["data"][0]["game_name"]
-        logger.info(f"get_game_v5: game is {game_name}, title is {self.title}")
-        self.game = GameConfig.get_or_none(game=game_name)
-        if self.game is None:
-            self.game = GameConfig.create(game=game_name)
-            self.game.save()
-
-        nightbot_api.enable_disable_timer(self.nightbot, "Мультитвич", self.game.mt)
-        nightbot_api.enable_disable_timer(self.nightbot, "Neputin", not self.game.mt)
-
-        if self.game.mt:
-            commands = nightbot_api.get_commands(self.nightbot)
-            if self.game.mt_str.startswith("http"):
-                msg = "Мультитвич: " + self.game.mt_str
-            else:
-                msg = "Мультитвич: https://www.multitwitch.tv/" + self.game.mt_str
-            cmd_id = None
-            for cmd in commands:
-                if cmd["name"] == "!mt":
-                    cmd_id = cmd["_id"]
-                    break
-            if not cmd_id:
-                logger.error("!mt command not found!")
-            else:
-                nightbot_api.put_command(self.nightbot, cmd_id, {"message": msg})
+        self.update_cogs(changed)
+
+    async def fetch_stream(self) -> Optional[dict]:
+        res = await self.helix.request(
+            "GET",
+            "streams",
+            params={"user_id": str(self.streamer_id)},
+            priority=helix_client.PRIORITY_LOW,
+        )
+        return res["data"][0] if res["data"] else None
+
+    def emit_stream_sample(self, sample: stream_metrics.StreamSample):
+        if self.sio_server is not None and sample.live:
+            asyncio.ensure_future(
+                self.sio_server.emit(
+                    "viewers", {"t": sample.timestamp, "v": sample.viewers}
+                )
+            )
 
-        self.call_cogs("update")
+    async def get_game_v5(self):
+        """Re-read the channel info and update everything, even if it didn't change"""
+        try:
+            await self.channel.poll(force=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+            logger.error("Request to Helix API failed!" + str(e))
+            if self.game is None:
+                self.game = await self.aiodb.write(GameConfig.create, game="")
 
     def add_user(self, user: Chatter):
         new_user = False
         name = user.name.lower()
         display_name = user.display_name.lower()
-        if name not in self.viewers:
+        if name not in self.viewers or isinstance(self.viewers[name], chatters.Lurker):
             self.viewers[name] = user
 
-        if display_name not in self.viewers:
+        if display_name not in self.viewers or isinstance(
+            self.viewers[display_name], chatters.Lurker
+        ):
             self.viewers[display_name] = user
 
         if not (
@@ -355,16 +452,19 @@ class Bot(commands.Bot):
         uu: User = u[0]
         self.streamer_id = uu.id
 
-        # noinspection PyProtectedMember
-        topics = [pubsub.channel_points(self.pubsub_client._http.token)[uu.id]]
-        # noinspection PyUnresolvedReferences
-        await self.pubsub_client.pubsub.subscribe_topics(topics)
-        await self.pubsub_client.connect()
+        if self.eventsub_task is None:
+            self.eventsub_task = asyncio.ensure_future(self.eventsub.run())
 
         # self.timer = Periodic("ws_server", 1, self.set_ws_server, self.loop)
         # await self.timer.start()
 
-        self.get_game_v5()
+        await self.get_game_v5()
+        if self.channel_task is None:
+            self.channel_task = asyncio.ensure_future(self.channel.run())
+        if self.sampler_task is None:
+            self.sampler_task = asyncio.ensure_future(self.stream_sampler.run())
+        if self.chatters_task is None:
+            self.chatters_task = asyncio.ensure_future(self.chatters.run())
 
     def get_emotes(self, tag, msg):
         # example tag: '306267910:5-11,20-26/74409:13-18'
@@ -393,7 +493,12 @@ class Bot(commands.Bot):
             logger.warning(f"event_message with no author! See {fn} for details")
             return
 
-        if message.author.name.lower() not in self.viewers:
+        known = self.viewers.get(message.author.name.lower())
+        if isinstance(known, chatters.Lurker):
+            # replace the plain label with the one showing badges and color
+            await self.send_viewer_left(known)
+            known = None
+        if known is None:
             # tags = ','.join(f'{k} = {v}' for k, v in message.tags.items())
             # print(f"Message from {message.author}, tags: {tags}")
             # print(f"Raw data: {message.raw_data}")
@@ -460,79 +565,99 @@ class Bot(commands.Bot):
         except (KeyError, AttributeError):
             pass
 
-    async def event_pubsub_channel_points(
-        self, event: pubsub.PubSubChannelPointsMessage
-    ):
-        user = await self.create_user(event.user.id, event.user.name).fetch()
-        # user = await event.user.fetch()
-        await self.do_reward(user, event.reward.title, event.input)
-
-    async def do_reward(self, user: User, title: str, prompt: str):
-        item = None
-        requestor = user.display_name or user.name
-        match title:
-            case "Смена голоса на 1 минуту":
-                vmod = self.get_cog("VMcog")
-                # noinspection PyUnresolvedReferences
-                asyncio.ensure_future(vmod.activate_voicemod())
-            case "Обнять стримера":
-                logger.debug(f"Queued redepmtion: hugs, {requestor}")
-                item = {"action": "event", "value": {"type": "hugs", "from": requestor}}
-                channel: Channel = self.get_channel(
-                    self.initial_channels[0].lstrip("#")
-                )
-                await self.send_message(
-                    f"{requestor} обнял стримера! Спасибо, {requestor}!"
-                )
+    async def on_chatter_joined(self, login: str, chatter: dict):
+        lurker = chatters.Lurker(chatter["user_id"], login, chatter["user_name"])
+        self.viewers[login] = lurker
+        self.viewers[lurker.display_name.lower()] = lurker
+        await self.send_viewer_joined(lurker)
+
+    async def on_chatter_left(self, login: str):
+        user = self.viewers.get(login)
+        if user is not None:
+            await self.event_part(user)
+
+    async def get_user_token(self, refresh: bool = False) -> str:
+        token = await self.tokens["twitch"].get_token(refresh)
+        return token.replace("oauth2:", "")
+
+    async def subscribe_eventsub(self, session_id: str):
+        for event_type, version in (
+            (eventsub.REDEMPTION_ADD, "1"),
+            (channel_watcher.CHANNEL_UPDATE, "2"),
+        ):
+            await self.helix.request(
+                "POST",
+                "eventsub/subscriptions",
+                json={
+                    "type": event_type,
+                    "version": version,
+                    "condition": {"broadcaster_user_id": str(self.streamer_id)},
+                    "transport": {"method": "websocket", "session_id": session_id},
+                },
+            )
 
-            case "Ничего":
-                logger.debug(f"Queued redepmtion: nothing, {requestor}")
-                self.play_sound("my_sound\\nothing0.mp3")
-                item = {
-                    "action": "event",
-                    "value": {"type": "nothing", "from": requestor},
-                }
-            case "Дизайнерское Ничего":
-                logger.debug(f"Queued redepmtion: designer nothing, {requestor}")
-                self.play_sound("my_sound\\designer_nothing0.mp3")
-                item = {
-                    "action": "event",
-                    "value": {"type": "nihil", "from": requestor},
-                }
-            case "Эксклюзивное Ничего, pro edition":
-                logger.debug(f"Queued redepmtion: pro nothing, {requestor}")
-                self.play_sound("my_sound\\exclusive_nothing_pro.mp3")
-                item = {
-                    "action": "event",
-                    "value": {"type": "nihil", "from": requestor},
-                }
-            case "Стримлер! Не горбись!":
-                logger.debug(f"Queued redepmtion: sit, {requestor}")
-                self.play_sound("my_sound\\StraightenUp.mp3")
-                item = {"action": "event", "value": {"type": "sit", "from": requestor}}
-            case "Распылить упорин":
-                logger.debug(f"Queued redepmtion: fun, {requestor}")
-                item = {"action": "event", "value": {"type": "fun", "from": requestor}}
-                s = random.choice(
-                    ["Nice01", "Nice02", "ThatWasFun01", "ThatWasFun02", "ThatWasFun03"]
-                )
-                self.play_sound(f"sound\\Minion General Speech@ignore@{s}.mp3")
-                asyncio.ensure_future(do_wizlight_disco())
-            case "Гори!":
-                snd = random.choice(
-                    ["Goblin_Burn_1", "Minion_BurnBurn", "Minion_FireNoHurt"]
-                )
-                self.play_sound(f"sound\\Minion General Speech@ignore@{snd}.mp3")
-            case "Лисо-Флешкино безумие":
-                self.play_sound("my_sound\\FoxFlashMadness.mp3")
-            case "Ты всё испортил!":
-                self.play_sound("my_sound\\fail.mp3")
+    async def patch_redemptions(self, reward_id: str, status: str, ids: List[str]):
+        params = [("broadcaster_id", str(self.streamer_id)), ("reward_id", reward_id)]
+        params.extend(("id", redemption_id) for redemption_id in ids)
+        await self.helix.request(
+            "PATCH",
+            "channel_points/custom_rewards/redemptions",
+            params=params,
+            json={"status": status},
+            priority=helix_client.PRIORITY_HIGH,
+        )
+
+    def set_redemption_status(self, event: dict, status: str):
+        # Rewards that skip the request queue are fulfilled by Twitch already
+        if event.get("status", "unfulfilled") == "unfulfilled":
+            self.redemptions.update(event["reward"]["id"], event["id"], status)
+
+    async def event_eventsub_redemption(self, event: dict):
+        title = event["reward"]["title"]
+        if title not in self.rewards.workers:
+            logger.debug(f"No handler for reward {title}")
+            return
+
+        if not self.rewards.dispatch(title, event):
+            self.set_redemption_status(event, redemptions.CANCELED)
 
-        if item and (self.sio_server is not None):
+    async def do_reward(self, reward: rewards.Reward, event: dict):
+        try:
+            await self.run_reward(reward, event["user_name"] or event["user_login"])
+        except Exception:
+            self.set_redemption_status(event, redemptions.CANCELED)
+            raise
+        self.set_redemption_status(event, redemptions.FULFILLED)
+
+    async def run_reward(self, reward: rewards.Reward, requestor: str):
+        logger.debug(f"Redemption: {reward.title}, {requestor}")
+
+        if reward.message:
+            await self.send_message(reward.message.format(requestor=requestor))
+
+        if reward.sound:
+            await self.play_sound_async(random.choice(reward.sound))
+
+        if reward.effect:
+            await self.reward_effects[reward.effect](requestor)
+
+        if reward.event and (self.sio_server is not None):
+            item = {
+                "action": "event",
+                "value": {"type": reward.event, "from": requestor},
+            }
             self.pubsub_events.append(item)
             await self.sio_server.emit(item["action"], item["value"])
 
-    def play_sound(self, sound: str, is_temporary: bool = False):
+    async def start_voicemod(self, requestor: str):
+        vmod = self.get_cog("VMcog")
+        # noinspection PyUnresolvedReferences
+        await vmod.activate_voicemod(requestor)
+
+    def start_sound(self, sound: str, is_temporary: bool = False):
+        """
+        Start playing `sound`, returns the file name and duration in seconds
+        """
         if sound.startswith("sound") and random.randint(1, 20) == 1:
             sound = sound.replace("sound", "sound.mono")
 
@@ -545,7 +670,14 @@ class Bot(commands.Bot):
 
         self.player.play(sound)
 
-        duration = eyed3.load(soundfile).info.time_secs
+        return soundfile, eyed3.load(soundfile).info.time_secs
+
+    async def play_sound_async(self, sound: str):
+        _, duration = self.start_sound(sound)
+        await asyncio.sleep(duration)
+
+    def play_sound(self, sound: str, is_temporary: bool = False):
+        soundfile, duration = self.start_sound(sound, is_temporary)
         time.sleep(duration)
 
         if is_temporary:
@@ -770,85 +902,45 @@ class Bot(commands.Bot):
                 )
             )
 
-    @staticmethod
-    def my_get_users(user_name):
-        res = requests.get(
-            "https://api.twitch.tv/helix/users",
-            params={"login": user_name},
-            headers={
-                "Accept": "application/vnd.twitchtv.v5+json",
-                "Authorization": f"Bearer {os.getenv('TWITCH_CHAT_PASSWORD')}",
-                "Client-ID": os.getenv("TWITCH_CHAT_CLIENT_ID"),
-            },
-        )
-        res.raise_for_status()
-        ress = res.json()["data"][0]
-        res.close()
-        return ress
+    async def my_get_users(self, user_name) -> dict:
+        res = await self.helix.request("GET", "users", params={"login": user_name})
+        return res["data"][0]
 
-    @staticmethod
-    async def my_get_stream(user_id) -> dict:
+    async def my_get_stream(self, user_id) -> dict:
         while True:
             logger.info("Attempting to get stream...")
-            res = requests.get(
-                "https://api.twitch.tv/helix/streams",
-                params={"user_id": user_id},
-                headers={
-                    "Accept": "application/vnd.twitchtv.v5+json",
-                    "Authorization": f"Bearer " f"{os.getenv('TWITCH_CHAT_PASSWORD')}",
-                    "Client-ID": os.getenv("TWITCH_CHAT_CLIENT_ID"),
-                },
-            )
-
             try:
-                res.raise_for_status()
-                stream = res.json()["data"][0]
+                res = await self.helix.request(
+                    "GET",
+                    "streams",
+                    params={"user_id": user_id},
+                    priority=helix_client.PRIORITY_LOW,
+                )
+                stream = res["data"][0]
             except IndexError:
                 logger.info("Stream not detected yet")
-                pass
-            except requests.RequestException as e:
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.error(f"Request to /helix/streams failed: {str(e)}")
             else:
                 logger.info("Got stream")
-                res.close()
                 return stream
 
-            res.close()
             await asyncio.sleep(60)
 
-    @staticmethod
-    def my_get_game(game_id):
-        res = requests.get(
-            "https://api.twitch.tv/helix/games",
-            params={"id": game_id},
-            headers={
-                "Accept": "application/vnd.twitchtv.v5+json",
-                "Authorization": f"Bearer {os.getenv('TWITCH_CHAT_PASSWORD')}",
-                "Client-ID": os.getenv("TWITCH_CHAT_CLIENT_ID"),
-            },
-        )
-
-        ress = res.json()["data"][0]
-        res.close()
-        return ress
+    async def my_get_game(self, game_id) -> dict:
+        res = await self.helix.request("GET", "games", params={"id": game_id})
+        return res["data"][0]
 
     async def my_run_commercial(self, user_id, length=90):
         await self.my_get_stream(self.streamer_id)
-        sess = twitch_api.get_session(
-            os.getenv("TWITCH_CLIENT_ID"),
-            os.getenv("TWITCH_CLIENT_SECRET"),
-            twitch_redirect_url,
-        )
-        res = sess.post(
-            "https://api.twitch.tv/helix/channels/commercial",
-            data={"broadcaster_id": user_id, "length": length},
-            headers={"Client-ID": os.getenv("TWITCH_CLIENT_ID")},
-        )
         try:
-            res.raise_for_status()
-            res.close()
-        except requests.HTTPError:
-            logger.error("Failed to run commercial:", res.json())
+            await self.helix.request(
+                "POST",
+                "channels/commercial",
+                json={"broadcaster_id": str(user_id), "length": length},
+            )
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"Failed to run commercial: {e.status} {e.message}")
 
     @twitch_command_aliased(name="ping", aliases=("пинг",))
     async def cmd_ping(self, ctx: commands.Context):
@@ -934,7 +1026,83 @@ class Bot(commands.Bot):
             return
 
         self.game.mt = not self.game.mt
-        self.game.save()
+        await self.aiodb.write(self.game.save)
+
+    @twitch_command_aliased(name="effect")
+    async def effect(self, ctx: commands.Context):
+        """
+        !effect extend <group> <seconds> / !effect stop <group> [all]
+        """
+        if not self.check_sender(ctx, "iarspider"):
+            return
+
+        args = ctx.message.content.split()[1:]
+        if len(args) >= 3 and args[0] == "extend" and args[2].isdigit():
+            ok = self.effects.extend(args[1], int(args[2]))
+        elif len(args) >= 2 and args[0] == "stop":
+            ok = await self.effects.cancel(args[1], clear_queue=args[2:] == ["all"])
+        else:
+            await ctx.send(
+                "!effect extend <group> <seconds> | !effect stop <group> [all]"
+            )
+            return
+
+        if not ok:
+            await ctx.send(f"Эффект {args[1]} не активен")
+
+    @twitch_command_aliased(name="rewardstats")
+    async def rewardstats(self, ctx: commands.Context):
+        if not self.check_sender(ctx, "iarspider"):
+            return
+
+        stats = sorted(
+            self.rewards.get_stats().items(),
+            key=lambda x: x[1]["max_ms"],
+            reverse=True,
+        )
+        await ctx.send(
+            "; ".join(
+                f"{title}: {s['count']}x, queue {s['queue_depth']} "
+                f"(max {s['max_queue_depth']}, dropped {s['dropped']}), "
+                f"wait {s['avg_wait_ms']:.0f}ms, max {s['max_ms']:.0f}ms"
+                for title, s in stats
+                if s["count"] or s["dropped"]
+            )
+            or "Наград пока не было"
+        )
+
+    @twitch_command_aliased(name="httpstats")
+    async def httpstats(self, ctx: commands.Context):
+        if not self.check_sender(ctx, "iarspider"):
+            return
+
+        await ctx.send(
+            "; ".join(
+                f"{name}: {m['state']}, {m['requests']} req, {m['errors']} err, "
+                f"{m['rejected']} rejected, p50 {m['p50_ms']:.0f}ms, "
+                f"p95 {m['p95_ms']:.0f}ms"
+                for name, m in sorted(aio_http.metrics().items())
+            )
+            or "Запросов пока не было"
+        )
+
+    @twitch_command_aliased(name="dbstats")
+    async def dbstats(self, ctx: commands.Context):
+        if not self.check_sender(ctx, "iarspider"):
+            return
+
+        stats = self.aiodb.get_stats()
+        slowest = sorted(
+            stats["queries"].items(), key=lambda x: x[1]["max_ms"], reverse=True
+        )[:3]
+        queries = ", ".join(
+            f"{name}: {s['count']}x avg {s['avg_ms']:.1f}ms max {s['max_ms']:.1f}ms"
+            for name, s in slowest
+        )
+        await ctx.send(
+            f"DB queue {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+            f"batches {stats['batches']}. {queries}"
+        )
 
     @twitch_command_aliased(
         name="perl", aliases=("перл", "пёрл", "pearl", "quote", "цитата", "цытата")
@@ -977,6 +1145,10 @@ class Bot(commands.Bot):
         ids = set()
 
         await self.sio_server.emit("reset", "", to=sid)
+        await self.sio_server.emit("effects", self.effects.snapshot(), to=sid)
+        await self.sio_server.emit(
+            "viewers_history", self.stream_sampler.series.points(), to=sid
+        )
 
         tasks = []
 
@@ -1001,15 +1173,18 @@ twitch_bot: Optional[Bot] = None
 sio_client: Optional[socketio.AsyncClient] = None
 sio_server: Optional[socketio.AsyncServer] = None
 app: Optional[socketio.WSGIApp] = None
+lights = wiz_lights.LightController(wiz_config)
 
 
 @logger.catch
 async def main():
-    global client, twitch_bot
+    global twitch_bot
     setup_logging("bot.log", color=True, debug=False, http_debug=False)
 
     random.seed()
 
+    sqlite_profile.check_indexes(database, (GameConfig, DuelStats))
+
     # logger.setLevel(logging.DEBUG)
     logging.getLogger("asyncio").setLevel(logging.DEBUG)
 
@@ -1019,8 +1194,8 @@ async def main():
         cors_allowed_origins="https://fr.iarazumov.com",
     )
     app = socketio.ASGIApp(sio_server, socketio_path="/ws")
-    config = uvicorn.Config(app, host="0.0.0.0", port=8081)
-    server = uvicorn.Server(config)
+    server_config = uvicorn.Config(app, host="0.0.0.0", port=8081)
+    server = uvicorn.Server(server_config)
 
     @sio_server.on("connect")
     async def on_ws_connected(sid, _):
@@ -1091,44 +1266,39 @@ async def main():
         twitch_bot.load_module(f"cogs.{extension}")
 
     twitch_bot.call_cogs("setup")
-    pubsub_sess = twitch_api.get_session(
-        os.getenv("TWITCH_CLIENT_ID"),
-        os.getenv("TWITCH_CLIENT_SECRET"),
-        twitch_redirect_url,
-    )
-    client = Client(
-        token=pubsub_sess.token["access_token"].replace("oauth2:", ""),
-        initial_channels=["#iarspider"],
-        client_secret=os.getenv("TWITCH_CLIENT_SECRET"),
-    )
-
-    client.pubsub = pubsub.PubSubPool(client)
-    twitch_bot.pubsub_client = client
-
-    # Forward event to bot. DO NOT DELETE THIS!!!
-    @client.event()
-    async def event_pubsub_channel_points(event: pubsub.PubSubChannelPointsMessage):
-        await twitch_bot.event_pubsub_channel_points(event)
-
-    @client.event()
-    async def event_token_expired():
-        logger.info("Renewing token...")
-        pubsub_sess = twitch_api.get_session(
-            os.getenv("TWITCH_CLIENT_ID"),
-            os.getenv("TWITCH_CLIENT_SECRET"),
-            twitch_redirect_url,
-        )
-
-        return pubsub_sess.token["access_token"].replace("oauth2:", "")
-
+    twitch_bot.tokens_task = asyncio.ensure_future(twitch_bot.tokens.run())
     await twitch_bot.start()
     # async with asyncio.TaskGroup() as tg:
     # task1 = tg.create_task(twitch_bot.start())
     # task2 = tg.create_task(server.serve())
 
-    # noinspection PyProtectedMember
-    if not client._closing.is_set():
-        await client.close()
+    if twitch_bot.eventsub_task is not None:
+        twitch_bot.eventsub_task.cancel()
+    if twitch_bot.channel_task is not None:
+        twitch_bot.channel_task.cancel()
+    if twitch_bot.sampler_task is not None:
+        twitch_bot.sampler_task.cancel()
+    if twitch_bot.chatters_task is not None:
+        twitch_bot.chatters_task.cancel()
+    twitch_bot.tokens_task.cancel()
+    discord_cog = twitch_bot.get_cog("DiscordCog")
+    if discord_cog is not None and discord_cog.relay_task is not None:
+        discord_cog.relay_task.cancel()
+        # the relay must be done with the database before it is closed
+        await asyncio.gather(discord_cog.relay_task, return_exceptions=True)
+
+    await twitch_bot.aiodb.close()
+    twitch_bot.rewards.close()
+    await twitch_bot.redemptions.close()
+    sl_cog = twitch_bot.get_cog("SLCog")
+    if sl_cog is not None:
+        await sl_cog.ledger.close()
+        await sl_cog.sl_client.events.close()
+        sl_cog.events_task.cancel()
+    if discord_cog is not None:
+        await discord_cog.publisher.close()
+    await aio_http.close_sessions()
+    await lights.close()
 
 
 # Patched version of socketio.AsyncManager.emit,
@@ -1165,41 +1335,16 @@ async def emit(
     await asyncio.wait(tasks)
 
 
-async def do_wizlight_disco():
-    states = []
+async def do_wizlight_disco(requestor: Optional[str] = None):
     logger.info("Starting disco...")
-    for _ in wiz_config:
-        b = wizlight(**_)
-        state = await b.updateState()
-        if not state.get_state():
-            logger.error(f"!!! Lightbulb {_['ip']} is off !!!")
-            states.append(None)
-            continue
-
-        states.append(
-            {
-                "speed": state.get_speed(),
-                "scene": state.get_scene_id(),
-                "brightness": state.get_brightness(),
-            }
-        )
-
-        await b.turn_on(PilotBuilder(speed=200, scene=4, brightness=255))
-        await b.async_close()
-        del b
-
-    logger.info("Sleeping...")
-    await asyncio.sleep(180)
-    logger.info("Restoring...")
-
-    for i, _ in enumerate(wiz_config):
-        if states[i] is not None:
-            b = wizlight(**_)
-            await b.turn_on(PilotBuilder(**states[i]))
-            await b.async_close()
-            del b
-
-    await asyncio.sleep(1)
+    await twitch_bot.effects.submit(
+        "disco",
+        "lights",
+        180,
+        lambda: lights.start_effect({"speed": 200, "scene": 4, "brightness": 255}),
+        lights.stop_effect,
+        requestor,
+    )
 
 
 def patch_socketio():
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Awaitable, Callable, FrozenSet, NamedTuple, Optional
+
+import aiohttp
+from loguru import logger
+
+from aio_timer import AdaptiveInterval
+
+CHANNEL_UPDATE = "channel.update"
+
+
+class ChannelInfo(NamedTuple):
+    game: str
+    title: str
+
+
+def diff(old: Optional[ChannelInfo], new: ChannelInfo) -> FrozenSet[str]:
+    """Names of the ChannelInfo fields that differ (all of them if `old` is None)"""
+    if old is None:
+        return frozenset(ChannelInfo._fields)
+    return frozenset(
+        field for field, a, b in zip(ChannelInfo._fields, old, new) if a != b
+    )
+
+
+class ChannelWatcher:
+    """
+    Keeps the current game and title of the channel. Snapshots come from the
+    channel.update EventSub notification (`on_channel_update`) and from
+    polling `fetch` every `interval` seconds as a fallback; the first one is
+    expected to come from an explicit poll(). `on_change(info, changed)` is
+    awaited only when a snapshot differs from the previous one, with the names
+    of the fields that changed.
+    """
+
+    retry_max = 600
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[ChannelInfo]],
+        on_change: Callable[[ChannelInfo, FrozenSet[str]], Awaitable],
+        interval: float = 300,
+    ):
+        self.fetch = fetch
+        self.on_change = on_change
+        self.interval = interval
+        self.current: Optional[ChannelInfo] = None
+
+    async def apply(self, info: ChannelInfo, force: bool = False) -> FrozenSet[str]:
+        changed = frozenset(ChannelInfo._fields) if force else diff(self.current, info)
+        self.current = info
+        if changed:
+            logger.info(f"Channel {', '.join(sorted(changed))} changed: {info}")
+            await self.on_change(info, changed)
+        return changed
+
+    async def poll(self, force: bool = False) -> FrozenSet[str]:
+        return await self.apply(await self.fetch(), force)
+
+    async def on_channel_update(self, event: dict):
+        await self.apply(ChannelInfo(event["category_name"], event["title"]))
+
+    async def run(self):
+        retry = AdaptiveInterval(self.interval, self.retry_max)
+        while True:
+            await asyncio.sleep(retry.current)
+            try:
+                await self.poll()
+                retry.reset()
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                logger.warning(f"Failed to get channel info: {e}")
+                retry.backoff()
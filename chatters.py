@@ -0,0 +1,111 @@
+import asyncio
+import math
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, Tuple
+
+import aiohttp
+from loguru import logger
+
+from helix_client import PRIORITY_LOW, HelixClient
+
+PAGE_SIZE = 1000
+
+
+class Lurker:
+    """
+    Viewer known only from the chatters list. Has the attributes of a twitchio
+    Chatter that the dashboard code looks at, until the viewer speaks up.
+    """
+
+    is_subscriber = False
+    is_mod = False
+    is_vip = False
+    color = None
+
+    def __init__(self, user_id: str, name: str, display_name: str):
+        self.id = user_id
+        self.name = name
+        self.display_name = display_name or name
+
+    @property
+    def badges(self) -> dict:
+        return {}
+
+    def __repr__(self):
+        return f"<Lurker {self.name}>"
+
+
+async def fetch_chatters(helix: HelixClient, broadcaster_id: str) -> Dict[str, dict]:
+    """Everybody in chat, login -> Helix chatter object, all pages"""
+    chatters = {}
+    params = {
+        "broadcaster_id": broadcaster_id,
+        "moderator_id": broadcaster_id,
+        "first": PAGE_SIZE,
+    }
+    while True:
+        res = await helix.request(
+            "GET", "chat/chatters", params=params, priority=PRIORITY_LOW
+        )
+        for chatter in res["data"]:
+            chatters[chatter["user_login"].lower()] = chatter
+
+        cursor = res.get("pagination", {}).get("cursor")
+        if not cursor or not res["data"]:
+            return chatters
+        params["after"] = cursor
+
+
+def diff(present: Iterable[str], known: Iterable[str]) -> Tuple[FrozenSet, FrozenSet]:
+    """(joined, left) logins"""
+    present = frozenset(present)
+    known = frozenset(known)
+    return present - known, known - present
+
+
+class ChattersReconciler:
+    """
+    Periodically compares the Helix chatters list with the viewer registry
+    (`known()` returns the logins in it) and reports only the differences
+    through `on_join(login, chatter)` and `on_part(login)`. The interval grows
+    with the number of pages the list takes, from `min_interval` up to
+    `max_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, dict]]],
+        known: Callable[[], Iterable[str]],
+        on_join: Callable[[str, dict], Awaitable],
+        on_part: Callable[[str], Awaitable],
+        min_interval: float = 60,
+        max_interval: float = 600,
+    ):
+        self.fetch = fetch
+        self.known = known
+        self.on_join = on_join
+        self.on_part = on_part
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+    async def reconcile(self) -> Tuple[FrozenSet, FrozenSet]:
+        chatters = await self.fetch()
+        joined, left = diff(chatters, self.known())
+        for login in joined:
+            await self.on_join(login, chatters[login])
+        for login in left:
+            await self.on_part(login)
+
+        pages = max(1, math.ceil(len(chatters) / PAGE_SIZE))
+        self.interval = min(self.max_interval, self.min_interval * pages)
+        if joined or left:
+            logger.info(f"Chatters: {len(joined)} joined, {len(left)} left")
+        return joined, left
+
+    async def run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                logger.warning(f"Failed to get chatters: {e}")
+            await asyncio.sleep(self.interval)
@@ -9,17 +9,20 @@ import datetime
 import logging
 import os
 import subprocess
-import time
 from tempfile import NamedTemporaryFile
 from loguru import logger
 
-import requests
+import aiohttp
 import socketio.asyncio_client
-from bs4 import BeautifulSoup
 from requests.structures import CaseInsensitiveDict
 from twitchio.ext import commands
 
+import aio_http
 import streamlabs_api as api
+import tokens
+from points_ledger import PointsLedger
+from sl_events import EventPipeline
+from voxworker_client import VoxWorker, VoxWorkerError
 from cogs.mycog import MyCog
 
 from config import rippers, streamlabs_redirect_uri
@@ -32,6 +35,7 @@ class SLClient(socketio.asyncio_client.AsyncClient):
         self.on("connect", self.sl_client_connected)
         self.on("disconnect", self.sl_client_disconnected)
         self.on("event", self.sl_client_event)
+        self.events = EventPipeline(self.emit_event)
 
     async def sl_client_connected(self):
         logger.info("SL client connected")
@@ -40,52 +44,10 @@ class SLClient(socketio.asyncio_client.AsyncClient):
         logger.warning("SL client disconnected")
 
     async def sl_client_event(self, data):
-        pick_keys = []
-        logger.info(f'SL event: {data["type"]}')
-        if data["type"] == "donation":
-            pick_keys.extend(("from", "message", "formatted_amount"))
-        elif data["type"] == "follow":
-            pick_keys.extend(("name",))
-        elif data["type"] == "subscription":
-            pick_keys.extend(("name", "months", "message", "sub_plan", "sub_type"))
-            if data["message"][0]["sub_type"] == "subgift":
-                pick_keys.extend(("gifter_display_name",))
-        elif data["type"] == "resub":
-            pick_keys.extend(("name", "months", "streak_months", "message", "sub_plan"))
-        elif data["type"] == "host":
-            pick_keys.extend(("name", "viewers"))
-        elif data["type"] == "bits":
-            pick_keys.extend(("name", "amount", "message"))
-        elif data["type"] == "raid":
-            pick_keys.extend(("name", "raiders"))
-        elif data["type"] in (
-            "alertPlaying",
-            "streamlabels",
-            "streamlabels.underlying",
-            "subscription-playing",
-        ):
-            return
-        else:
-            logger.info(f'SL event: {data["type"]}')
-            logger.warning(f"Unknown SL event type: {data}")
-            return
+        self.events.put(data)
 
-        def copy_keys(from_, to_, keys_):
-            for k_ in keys_:
-                if k_ in from_:
-                    to_[k_] = from_[k_]
-                else:
-                    logger.warning(f'Event {data["type"]} missing key {k_}')
-                    to_[k_] = "UNKNOWN"
-
-        message = {"action": "event", "value": {"type": data["type"]}}
-        if isinstance(data["message"], list):
-            for msg in data["message"]:
-                copy_keys(msg, message["value"], pick_keys)
-        else:
-            copy_keys(data["message"], message["value"], pick_keys)
-
-        await self.bot.sio_server.emit(message["action"], message["value"])
+    async def emit_event(self, event):
+        await self.bot.sio_server.emit("event", event)
 
 
 class SLCog(MyCog):
@@ -93,48 +55,76 @@ class SLCog(MyCog):
         self.bot = bot
         logger = logging.getLogger("arachnobot.sl")
         self.sl_client: SLClient = SLClient(logger=logger, bot=bot)
-        self.streamlabs_oauth = api.get_streamlabs_session(
-            os.getenv("STREAMLABS_CLIENT_ID"),
-            os.getenv("STREAMLABS_CLIENT_SECRET"),
-            streamlabs_redirect_uri,
+        self.streamlabs_token = self.bot.tokens.add(
+            tokens.OAuth2Token(
+                "streamlabs",
+                api.TOKEN_FILE,
+                api.TOKEN_URL,
+                os.getenv("STREAMLABS_CLIENT_ID"),
+                os.getenv("STREAMLABS_CLIENT_SECRET"),
+                authorize=lambda: api.get_token(
+                    os.getenv("STREAMLABS_CLIENT_ID"),
+                    os.getenv("STREAMLABS_CLIENT_SECRET"),
+                    streamlabs_redirect_uri,
+                ),
+                redirect_uri=streamlabs_redirect_uri,
+            )
         )
+        self.streamlabs_oauth = self.streamlabs_token.session()
+        self.ledger = PointsLedger(self.fetch_points, self.subtract_points)
 
-        token = api.get_socket_token(self.streamlabs_oauth)
-        asyncio.ensure_future(
-            self.sl_client.connect(f"https://sockets.streamlabs.com?token={token}")
-        )
+        self.events_task = asyncio.ensure_future(self.sl_client.events.run())
+        asyncio.ensure_future(self.connect_socket())
         self.last_post = CaseInsensitiveDict()
         self.post_timeout = 1 * 60
         self.post_price = {"regular": 50, "vip": 25, "mod": 25}
 
-        self.session = requests.Session()
+        self.vox = VoxWorker()
+
+    async def connect_socket(self):
         try:
-            res = self.session.get("https://voxworker.com/ru")
-            res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            textId = soup.select("input[name=textId]")
-            sessionId = soup.select("input[name=sessionId]")
-
-            logger.debug("Prepare session for VoxWorker")
-
-            self.voxdata = dict(
-                textId=textId[0]["value"],
-                sessionId=sessionId[0]["value"],
-                voice="rh-anna",
-                speed="1.0",
-                pitch="1.0",
-                text="Вы можете менять ударение знаком плюс. Например: хлоп+ок в "
-                "ладоши или белый "
-                "хл+опок.",
-            )
-            logger.debug("Session ready")
-        except requests.HTTPError as e:
-            logger.exception(msg="Failed to initialize voxworker session", exc_info=e)
-            self.voxdata = None
-        except (IndexError, KeyError) as e:
-            logger.exception("Failed to parse voxworker page")
-            self.voxdata = None
+            async with aio_http.request(
+                "streamlabs",
+                "GET",
+                api.SOCKET_TOKEN_URL,
+                params={"access_token": await self.streamlabs_token.get_token()},
+            ) as r:
+                r.raise_for_status()
+                token = (await r.json())["socket_token"]
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
+            logger.error(f"Failed to get Streamlabs socket token: {e}")
+            return
+
+        await self.sl_client.connect(f"https://sockets.streamlabs.com?token={token}")
+
+    async def fetch_points(self, username: str) -> int:
+        async with aio_http.request(
+            "streamlabs",
+            "GET",
+            api.POINTS_URL,
+            params={
+                "access_token": await self.streamlabs_token.get_token(),
+                "username": username,
+                "channel": "iarspider",
+            },
+        ) as r:
+            r.raise_for_status()
+            return int((await r.json())["points"])
+
+    async def subtract_points(self, username: str, points: int):
+        async with aio_http.request(
+            "streamlabs",
+            "POST",
+            api.POINTS_URL + "/subtract",
+            data={
+                "access_token": await self.streamlabs_token.get_token(),
+                "username": username,
+                "channel": "iarspider",
+                "points": points,
+            },
+        ) as r:
+            r.raise_for_status()
+            logger.debug(await r.json())
 
     def __getattr__(self, item):
         if item != "__bases__":
@@ -143,84 +133,45 @@ class SLCog(MyCog):
             )
         return self.bot.__getattribute__(item)
 
-    def say(self, text):
-        if not self.voxdata:
-            logger.warning("VoxWorker not setup")
-            return False
-        self.voxdata["text"] = text
-        res = self.session.post(
-            "https://voxworker.com/ru/ajax/convert", data=self.voxdata
-        )
-        if not res.ok:
-            logger.error(f"Initial request to VoxWorker failed: {res.status_code}")
-        resj = res.json()
-        logger.debug("Sent request to VoxWorker")
-
-        if resj["status"] == "notify":
-            logger.error(f"Got status 'notify': {resj['error']}, {resj['errorText']}")
-            return False
-
-        statusAttemptCount = 0
-        while statusAttemptCount < 60 and resj["status"] == "queue":
-            logger.debug(f"VoxWorker: request queued, count: {statusAttemptCount}")
-            res = self.session.get(
-                f'https://voxworker.com/ru/ajax/status?id={resj["taskId"]}'
-            )
-            if not res.ok:
-                logger.error(f"Status request to VoxWorker failed: {res.status_code}")
-                return False
-            resj = res.json()
-            statusAttemptCount += 1
-            time.sleep(1)
-
-        if statusAttemptCount == 60:
-            logger.error("VoxWorker: Conversion error")
+    async def say(self, text):
+        try:
+            mp3 = await self.vox.convert(text)
+        except (VoxWorkerError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"VoxWorker failed: {e}")
             return False
 
-        if resj["status"] != "ok":
-            logger.error(
-                f"VoxWorker bad status '{resj['status']}': {resj['error']}, "
-                f"{resj['errorText']}"
-            )
-            return False
-        else:
-            logger.debug("Downloading file from VoxWorker")
-            self.voxdata["textId"] = resj.get("textId", "")
-            res = self.session.get(resj["downloadUrl"])
-            if not res.ok:
-                logger.error(f"Failed to download URL: {res.status_code}")
-            with NamedTemporaryFile(delete=False, suffix=".mp3") as tempfile:
-                fname = tempfile.name
-                tempfile.write(res.content)
-
-            with NamedTemporaryFile(delete=False, suffix=".mp3") as tempfile:
-                oname = tempfile.name
-                try:
-                    subprocess.check_call(
-                        (
-                            "ffmpeg.exe",
-                            "-loglevel",
-                            "panic",
-                            "-y",
-                            "-i",
-                            fname,
-                            "-ab",
-                            "128",
-                            "-ar",
-                            "44100",
-                            "-ac",
-                            "2",
-                            oname,
-                        )
+        with NamedTemporaryFile(delete=False, suffix=".mp3") as tempfile:
+            fname = tempfile.name
+            tempfile.write(mp3)
+
+        with NamedTemporaryFile(delete=False, suffix=".mp3") as tempfile:
+            oname = tempfile.name
+            try:
+                subprocess.check_call(
+                    (
+                        "ffmpeg.exe",
+                        "-loglevel",
+                        "panic",
+                        "-y",
+                        "-i",
+                        fname,
+                        "-ab",
+                        "128",
+                        "-ar",
+                        "44100",
+                        "-ac",
+                        "2",
+                        oname,
                     )
-                    os.unlink(fname)
-                except subprocess.CalledProcessError as e:
-                    logger.exception("Call to ffmpeg.exe failed")
-                    return False
+                )
+                os.unlink(fname)
+            except subprocess.CalledProcessError as e:
+                logger.exception("Call to ffmpeg.exe failed")
+                return False
 
-            self.bot.play_sound("my_sound\\ding-sound-effect_1.mp3")
-            self.bot.play_sound(oname, True)
-            return True
+        self.bot.play_sound("my_sound\\ding-sound-effect_1.mp3")
+        self.bot.play_sound(oname, True)
+        return True
 
     @twitch_command_aliased(name="bugs", aliases=("баги",))
     async def bugs(self, ctx: commands.Context):
@@ -232,10 +183,8 @@ class SLCog(MyCog):
         user = ctx.author.name
         # print("Requesting points for", user)
         try:
-            res = api.get_points(self.streamlabs_oauth, user)
-            # print(res)
-            # res = res['points']
-        except requests.HTTPError:
+            res = await self.ledger.balance(user)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
             res = 0
 
         await ctx.send(f"@{user} Набрано багов: {res}")
@@ -269,9 +218,13 @@ class SLCog(MyCog):
             else:
                 price = self.post_price["regular"]
 
-            points = api.get_points(self.streamlabs_oauth, ctx.author.name)
+            try:
+                left = await self.ledger.debit(ctx.author.name, price)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Failed to get points of {ctx.author.name}: {e}")
+                return
 
-            if points < price:
+            if left is None:
                 asyncio.ensure_future(
                     ctx.send(
                         f"У вас недостаточно багов для отправки почты - вам нужно "
@@ -280,13 +233,11 @@ class SLCog(MyCog):
                 )
 
                 return
-            res = api.sub_points(self.streamlabs_oauth, ctx.author.name, price)
             self.last_post[ctx.author.name] = now
-            logger.debug(res)
         else:
             price = 0
 
-        if not self.say(post_message):
+        if not await self.say(post_message):
             self.bot.play_sound("my_sound\\pochta.mp3")
 
     @twitch_command_aliased(name="sos", aliases=("alarm",))
@@ -310,10 +261,16 @@ class SLCog(MyCog):
 
         # points = api.get_points(self.streamlabs_oauth, ctx.author.name)
         # httpclient_logging_patch()
-        requests.post(
-            "https://streamlabs.com/api/v1.0/wheel/spin",
-            data={"access_token": self.streamlabs_oauth.access_token},
-        )
+        try:
+            async with aio_http.request(
+                "streamlabs",
+                "POST",
+                api.WHEEL_SPIN_URL,
+                data={"access_token": await self.streamlabs_token.get_token()},
+            ) as r:
+                r.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to spin the wheel: {e}")
         # httpclient_logging_patch(logging.INFO)
 
 
@@ -4,20 +4,34 @@ import sys
 sys.path.append("..")
 from config import discord_channel, discord_role
 
+import asyncio
 import datetime
 import json
 
-import pika
+import aiohttp
+from loguru import logger
 from pytils import numeral
 from twitchio.ext import commands
 
+from amqp_publisher import AMQPPublisher
 from cogs.mycog import MyCog
+from outbox import Outbox
+from twitch_commands import twitch_command_aliased
 
 
 class DiscordCog(MyCog):
     def __init__(self, bot):
         self.bot = bot
         self.check_sender = self.bot.check_sender
+        self.publisher = AMQPPublisher(
+            os.getenv("RABBIT_URL"), "discord", {"x-message-ttl": 60000}
+        )
+        self.outbox = Outbox(self.bot.aiodb, self.publisher)
+        self.relay_task = None
+
+    def setup(self):
+        if self.relay_task is None:
+            self.relay_task = asyncio.ensure_future(self.outbox.relay())
 
     @twitch_command_aliased(name="announce")
     async def cmd_announce(self, ctx: commands.Context):
@@ -28,7 +42,11 @@ class DiscordCog(MyCog):
 
     async def announce(self, now_=False):
         stream = await self.bot.my_get_stream(self.bot.streamer_id)
-        game = self.bot.my_get_game(stream["game_id"])
+        try:
+            game = await self.bot.my_get_game(stream["game_id"])
+        except (aiohttp.ClientError, asyncio.TimeoutError, IndexError) as e:
+            logger.warning(f"Failed to get game {stream['game_id']}: {e}")
+            game = {"name": stream["game_name"]}
         #        game = {"name": "Just Chatting"}
         #        stream = {"title": "Проверка оповещений"}
         delta = self.bot.countdown_to - datetime.datetime.now()
@@ -48,23 +66,11 @@ class DiscordCog(MyCog):
             " открыть стрим - <https://twitch.tv/iarspider>!"
         )
 
-        connection = pika.BlockingConnection(
-            pika.URLParameters(os.getenv("RABBIT_URL"))
-        )
-        channel = connection.channel()
-        channel.queue_declare(
-            queue="discord", durable=True, arguments={"x-message-ttl": 60000}
-        )
-        channel.basic_publish(
-            exchange="",
-            routing_key="discord",
-            body=json.dumps(
-                {"action": "send", "message": announcement, "channel": discord_channel}
-            ).encode("utf-8"),
-            properties=pika.BasicProperties(expiration=str(delta.seconds * 1000)),
-        )
-        channel.close()
-        connection.close()
+        body = json.dumps(
+            {"action": "send", "message": announcement, "channel": discord_channel}
+        ).encode("utf-8")
+        # Delivered by the outbox relay, dropped if the stream starts first
+        await self.outbox.put(body, expiration=delta.seconds * 1000)
 
 
 def prepare(bot: commands.Bot):
@@ -1,14 +1,20 @@
 import asyncio
 import random
 import sys
-from collections import defaultdict
+import time
+import typing
 
 import peewee
 from loguru import logger
 from twitchio.ext import commands
 
+import duel_stats
+import settings
+from aio_timer import Timer
 from bot import DuelStats, Bot
 from cogs.mycog import MyCog
+from duel_challenges import AddResult, ChallengeStore
+from duel_leaderboard import DuelLeaderboard
 from twitch_commands import twitch_command_aliased
 
 sys.path.append("..")
@@ -19,12 +25,81 @@ class DuelCog(MyCog):
     def __init__(self, bot):
         self.bot = bot
 
-        self.attacks = defaultdict(list)
+        self.challenges = ChallengeStore(
+            **settings.options(
+                ttl="duel_challenge_ttl",
+                max_per_attacker="duel_max_challenges_per_attacker",
+                max_per_defender="duel_max_challenges_per_defender",
+            )
+        )
+        self.expiry_timer: typing.Optional[Timer] = None
+        self.expiry_deadline: typing.Optional[float] = None
         self.bots = bot.bots
+        self.leaderboard = DuelLeaderboard()
+        self.leaderboard_task: typing.Optional[asyncio.Task] = None
+
+    def setup(self):
+        if self.leaderboard_task is None:
+            self.leaderboard_task = asyncio.ensure_future(self.load_leaderboard())
+
+    async def load_leaderboard(self):
+        try:
+            rows = await self.bot.aiodb.read(duel_stats.query_all_duels)
+        except peewee.PeeweeException:
+            logger.exception("Failed to load duel leaderboard")
+            return
+        self.leaderboard.load(rows)
+        logger.info(f"Loaded duel leaderboard: {len(rows)} rows")
+
+    def schedule_expiry(self):
+        deadline = self.challenges.next_deadline()
+        if deadline == self.expiry_deadline:
+            return
+
+        if self.expiry_timer is not None:
+            self.expiry_timer.cancel()
+            self.expiry_timer = None
+
+        self.expiry_deadline = deadline
+        if deadline is not None:
+            self.expiry_timer = Timer(
+                max(0.0, deadline - time.monotonic()),
+                self.expire_challenges,
+                self.bot.loop,
+            )
+
+    async def expire_challenges(self):
+        self.expiry_timer = None
+        self.expiry_deadline = None
+        for challenge in self.challenges.expire():
+            await self.bot.send_message(
+                f"Вызов на дуэль от {challenge.attacker_name} для "
+                f"{challenge.defender_name} истёк"
+            )
+
+        self.schedule_expiry()
+
+    def login_of(self, user: str) -> str:
+        """Login for a display name (or login) as typed in chat"""
+        viewer = self.bot.viewers.get(user.lower().lstrip("@"))
+        if viewer is not None:
+            return viewer.name.lower()
+        return user.lower().lstrip("@")
 
     async def timeout(self, user: str, ctx: commands.Context, duration: int = 600):
-        # TODO: use Twitch API for this
-        await ctx.send(f"/timeout {user} {duration}")
+        ok = await self.bot.moderation.timeout(
+            self.login_of(user), duration, "Проиграл дуэль"
+        )
+        if not ok:
+            logger.warning(f"Timeout for {user} failed")
+        return ok
+
+    async def save_duel(self, winner: str, loser: str):
+        # a duel recorded before the load would be counted twice or lost
+        if self.leaderboard_task is not None:
+            await self.leaderboard_task
+        await self.bot.aiodb.write(DuelStats.record_duel, winner, loser)
+        self.leaderboard.record(winner, loser)
 
     @twitch_command_aliased(name="fakeduel")
     async def fake_duel(self, ctx: commands.Context):
@@ -47,16 +122,7 @@ class DuelCog(MyCog):
                 )
             )
             # await ctx.timeout(defender, 60)
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=attacker, defender=defender
-            )[0]
-            d.wins += 1
-            d.save()
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=defender, defender=attacker
-            )[0]
-            d.losses += 1
-            d.save()
+            await self.save_duel(attacker, defender)
         elif attack_d < defence_d:
             await ctx.send(
                 "#FAKEDUEL! @{0} побеждает с результатом {2}:{1}!".format(
@@ -64,16 +130,7 @@ class DuelCog(MyCog):
                 )
             )
             # await ctx.timeout(attacker, 60)
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=attacker, defender=defender
-            )[0]
-            d.losses += 1
-            d.save()
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=defender, defender=attacker
-            )[0]
-            d.wins += 1
-            d.save()
+            await self.save_duel(defender, attacker)
         else:
             await ctx.send("#FAKEDUEL! Бойцы вырубили друг друга!")
             # await ctx.timeout(defender, 30)
@@ -87,15 +144,16 @@ class DuelCog(MyCog):
         args = ctx.message.content.split()[1:]
         if len(args) != 1:
             await ctx.send("Использование: !deny <от кого>")
+            return
         attacker_s = args[0].strip("@")
         attacker = attacker_s.lower()
 
-        if not attacker in self.attacks[defender]:
+        challenge = self.challenges.pop(defender, attacker)
+        self.schedule_expiry()
+        if challenge is None:
             await ctx.send(f"{attacker_s} не вызывал на дуэль {defender_s}!")
-            logger.info(self.attacks)
             return
 
-        self.attacks[defender].remove(attacker)
         asyncio.ensure_future(
             ctx.send(
                 f"Бой между {attacker_s} и {defender_s} не состоится, можете "
@@ -111,17 +169,17 @@ class DuelCog(MyCog):
         args = ctx.message.content.split()[1:]
         if len(args) != 1:
             await ctx.send("Использование: !accept <от кого>")
+            return
 
         attacker_name = args[0].strip("@")
         attacker_lower = attacker_name.lower()
 
-        if not attacker_lower in self.attacks[defender_lower]:
+        challenge = self.challenges.pop(defender_lower, attacker_lower)
+        self.schedule_expiry()
+        if challenge is None:
             await ctx.send(f"{attacker_name} не вызывал на дуэль {defender_name}!")
-            logger.info(self.attacks)
             return
 
-        self.attacks[defender_lower].remove(attacker_lower)
-
         await ctx.send(
             "Пусть начнётся битва: {0} против {1}!".format(attacker_name, defender_name)
         )
@@ -136,16 +194,7 @@ class DuelCog(MyCog):
                 )
             )
             await self.timeout(defender_name, ctx, 60)
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=attacker_lower, defender=defender_lower
-            )[0]
-            d.wins += 1
-            d.save()
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=defender_lower, defender=attacker_lower
-            )[0]
-            d.losses += 1
-            d.save()
+            await self.save_duel(attacker_lower, defender_lower)
         elif attack_d < defence_d:
             await ctx.send(
                 "@{0} побеждает с результатом {2}:{1}!".format(
@@ -153,20 +202,13 @@ class DuelCog(MyCog):
                 )
             )
             await self.timeout(attacker_name, ctx, 60)
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=attacker_lower, defender=defender_lower
-            )[0]
-            d.losses += 1
-            d.save()
-            d: DuelStats = DuelStats.get_or_create(
-                attacker=defender_lower, defender=attacker_lower
-            )[0]
-            d.wins += 1
-            d.save()
+            await self.save_duel(defender_lower, attacker_lower)
         else:
             await ctx.send("Бойцы вырубили друг друга!")
-            await self.timeout(defender_name, ctx, 30)
-            await self.timeout(attacker_name, ctx, 30)
+            await asyncio.gather(
+                self.timeout(defender_name, ctx, 30),
+                self.timeout(attacker_name, ctx, 30),
+            )
 
     @twitch_command_aliased(name="attack")
     async def attack(self, ctx: commands.Context):
@@ -195,7 +237,9 @@ class DuelCog(MyCog):
 
         if defender.display_name.lower() == attacker.lower():
             await ctx.send("РКН на тебя нет, негодяй!")
-            await ctx.send(f"/timeout {defender.name} 120")
+            self.bot.moderation.timeout(
+                defender.name.lower(), 120, "Дуэль с самим собой"
+            )
             return
 
         if defender.display_name.lower() in self.bots and not allow_duel_to_bot:
@@ -204,7 +248,21 @@ class DuelCog(MyCog):
 
         defender_s = defender.display_name
         defender = defender_s.lower()
-        self.attacks[defender].append(attacker)
+        res = self.challenges.add(defender, attacker, defender_s, attacker_s)
+        if res == AddResult.EXISTS:
+            await ctx.send(f"@{attacker_s}, ты уже вызвал {defender_s} на дуэль!")
+            return
+        if res == AddResult.ATTACKER_LIMIT:
+            await ctx.send(
+                f"@{attacker_s}, дождись ответа на свои вызовы, прежде чем "
+                f"бросать новые!"
+            )
+            return
+        if res == AddResult.DEFENDER_LIMIT:
+            await ctx.send(f"{defender_s} уже и так вызвали на дуэль слишком много раз")
+            return
+
+        self.schedule_expiry()
 
         asyncio.ensure_future(
             ctx.send(
@@ -215,66 +273,32 @@ class DuelCog(MyCog):
         )
 
     async def get_duel_stats(self, ctx, author):
-        cnt = DuelStats.select().where(DuelStats.attacker == author).count()
-        if cnt == 0:
+        stats = await self.bot.aiodb.read(duel_stats.query_duel_stats, author)
+        if stats is None:
             asyncio.ensure_future(ctx.send(f"{author} ещё никого не атаковал"))
             return
 
-        sum_wins, sum_losses = (
-            DuelStats.select(
-                peewee.fn.Sum(DuelStats.wins), peewee.fn.Sum(DuelStats.losses)
-            )
-            .where(DuelStats.attacker == author)
-            .scalar(as_tuple=True)
-        )
-
-        max_wins = (
-            DuelStats.select(
-                DuelStats.attacker, peewee.fn.MAX(DuelStats.wins).alias("max_wins")
-            )
-            .where(DuelStats.attacker == author)
-            .get()
-            .max_wins
-        )
-
-        if max_wins > 0:
-            result = DuelStats.select(
-                DuelStats.attacker, DuelStats.defender, DuelStats.wins
-            ).where((DuelStats.wins == max_wins) & (DuelStats.attacker == author))
-
-            defenders_string = ", ".join([row.defender for row in result])
-            max_wins = result[0].wins
+        if stats["max_wins"] > 0:
+            defenders_string = ", ".join(stats["won_against"])
             wins_string = (
-                f"Чаще всего одерживал победу над {defenders_string} ({max_wins} раз),"
+                f"Чаще всего одерживал победу над {defenders_string} "
+                f"({stats['max_wins']} раз),"
             )
         else:
             wins_string = "Не одерживал побед, "
 
-        max_losses = (
-            DuelStats.select(
-                DuelStats.attacker, peewee.fn.MAX(DuelStats.losses).alias("max_losses")
-            )
-            .where(DuelStats.attacker == author)
-            .get()
-            .max_losses
-        )
-
-        if max_losses > 0:
-            result = DuelStats.select(
-                DuelStats.attacker, DuelStats.defender, DuelStats.losses
-            ).where((DuelStats.losses == max_losses) & (DuelStats.attacker == author))
-
-            defenders_string = ", ".join([row.defender for row in result])
-            max_wins = result[0].wins
+        if stats["max_losses"] > 0:
+            defenders_string = ", ".join(stats["lost_to"])
             losses_string = (
-                f"Чаще всего терпел поражение от {defenders_string} ({max_losses} раз)"
+                f"Чаще всего терпел поражение от {defenders_string} "
+                f"({stats['max_losses']} раз)"
             )
         else:
             losses_string = "не терпел поражений"
 
         asyncio.ensure_future(
             ctx.send(
-                f"Статистика дуэлянта {author}: побед {sum_wins}, поражений {sum_losses}. {wins_string}{losses_string}"
+                f"Статистика дуэлянта {author}: побед {stats['wins']}, поражений {stats['losses']}. {wins_string}{losses_string}"
             )
         )
 
@@ -292,6 +316,41 @@ class DuelCog(MyCog):
         author = ctx.author.display_name.lower()
         await self.get_duel_stats(ctx, author)
 
+    @twitch_command_aliased(name="duelstop", aliases=("dueltop",))
+    async def duelstop(self, ctx: commands.Context):
+        args = [x.strip("@").lower() for x in ctx.message.content.split()[1:]]
+        if len(args) == 2:
+            first_wins, second_wins = self.leaderboard.head_to_head(*args)
+            if first_wins + second_wins == 0:
+                await ctx.send(f"{args[0]} и {args[1]} ещё не сражались")
+            else:
+                await ctx.send(
+                    f"{args[0]} против {args[1]}: {first_wins}:{second_wins}"
+                )
+            return
+
+        if args:
+            await ctx.send("Использование: !duelstop [<кто> <с кем>]")
+            return
+
+        winners = self.leaderboard.top_winners(3)
+        if not winners:
+            await ctx.send("Дуэлей ещё не было")
+            return
+
+        winners_string = ", ".join(
+            f"{i}. {name} ({wins}:{losses})"
+            for i, (name, wins, losses) in enumerate(winners, 1)
+        )
+        rivalries = self.leaderboard.top_rivalries(3)
+        rivalries_string = ", ".join(
+            f"{first} - {second} ({first_wins}:{second_wins})"
+            for first, second, first_wins, second_wins in rivalries
+        )
+        await ctx.send(
+            f"Лучшие дуэлянты: {winners_string}. Главные соперники: {rivalries_string}"
+        )
+
 
 def prepare(bot: Bot):
     bot.add_cog(DuelCog(bot))
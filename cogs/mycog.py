@@ -3,6 +3,9 @@ from twitchio.ext import commands
 
 
 class MyCog(commands.Cog):
+    # channel info fields (see channel_watcher.ChannelInfo) update() depends on
+    watches = frozenset(("game",))
+
     def setup(self):
         pass
 
@@ -199,7 +199,7 @@ class OBSCog(MyCog):
         if self.use_teleport:
             self.teleport_ws.reconnect()
 
-        self.bot.get_game_v5()
+        await self.bot.get_game_v5()
 
         res: obsws_requests.GetStreamStatus = self.ws_call(
             obsws_requests.GetStreamStatus()
@@ -417,7 +417,7 @@ class OBSCog(MyCog):
         %%start
         """
         if not self.bot.check_sender(ctx, "iarspider"):
-            asyncio.ensure_future(ctx.send("/timeout " + ctx.author.name + " 1"))
+            self.bot.moderation.timeout(ctx.author.name, 1)
             return
 
         # self.get_player()
@@ -479,9 +479,15 @@ class OBSCog(MyCog):
         self.switch_to("Game")
 
         try:
-            res = await self.bot.my_get_stream(self.bot.streamer_id)
+            sample = self.bot.stream_sampler.latest
+            if sample is not None and sample.live:
+                viewer_count = sample.viewers
+            else:
+                # the sampler hasn't seen the stream go live yet
+                res = await self.bot.my_get_stream(self.bot.streamer_id)
+                viewer_count = res["viewer_count"]
             viewers = numeral.get_plural(
-                res["viewer_count"], ("зритель", "зрителя", "зрителей")
+                viewer_count, ("зритель", "зрителя", "зрителей")
             )
             msg = (
                 f"Перепись населения завершена успешно! Население стрима "
@@ -527,7 +533,7 @@ class OBSCog(MyCog):
         %%pause
         """
         if not self.bot.check_sender(ctx, "iarspider"):
-            asyncio.ensure_future(ctx.send("/timeout " + ctx.author.name + " 1"))
+            self.bot.moderation.timeout(ctx.author.name, 1)
             return
 
         self.do_pause(ctx, False)
@@ -540,7 +546,7 @@ class OBSCog(MyCog):
         %%ужин
         """
         if not self.bot.check_sender(ctx, "iarspider"):
-            asyncio.ensure_future(ctx.send("/timeout " + ctx.author.name + " 1"))
+            self.bot.moderation.timeout(ctx.author.name, 1)
             return
 
         try:
@@ -568,7 +574,7 @@ class OBSCog(MyCog):
         %%обед
         """
         if not self.bot.check_sender(ctx, "iarspider"):
-            asyncio.ensure_future(ctx.send("/timeout " + ctx.author.name + " 1"))
+            self.bot.moderation.timeout(ctx.author.name, 1)
             return
 
         try:
@@ -594,7 +600,7 @@ class OBSCog(MyCog):
     @twitch_command_aliased(name="save")
     async def save_window(self, ctx: commands.Context):
         if self.bot.game is None:
-            self.bot.get_game_v5()
+            await self.bot.get_game_v5()
 
         source = self.ws.call(obsws_requests.GetInputSettings(inputName="Game Capture"))
 
@@ -604,7 +610,7 @@ class OBSCog(MyCog):
             return
 
         self.bot.game.window = settings["window"]
-        self.bot.game.save()
+        await self.bot.aiodb.write(self.bot.game.save)
         # if self.bot.game.window == 'X':
         #     return
         #
@@ -43,16 +43,16 @@ class RIPCog(MyCog):
 
             f.write("☠: {today} (всего: {total})".format(**self.deaths))
 
-    def write_rip(self):
+    async def write_rip(self):
         self.display_rip()
         self.game.rip_total = self.deaths["total"]
-        self.game.save()
+        await self.bot.aiodb.write(self.game.save)
 
     async def do_rip(self, n=1):
         self.deaths["today"] += n
         self.deaths["total"] += n
 
-        self.write_rip()
+        await self.write_rip()
 
         return (
             "iarspiRip {today}".format(**self.deaths)
@@ -70,7 +70,7 @@ class RIPCog(MyCog):
 
         self.game.infinite = True
         asyncio.ensure_future(ctx.send("☠ → ∞"))
-        self.write_rip()
+        await self.write_rip()
 
     @twitch_command_aliased(name="xrip", aliases=("ripx",))
     async def inexrip(self, ctx: commands.Context):
@@ -150,7 +150,7 @@ class RIPCog(MyCog):
             logger.info("check_sender failed")
             return
 
-        self.get_game_v5()
+        await self.bot.get_game_v5()
         await ctx.send("Счётчик смертей обновлён")
 
     @twitch_command_aliased(name="setrip")
@@ -183,7 +183,7 @@ class RIPCog(MyCog):
             return
 
         self.bot.game.rip_enabled = True
-        self.bot.game.save()
+        await self.bot.aiodb.write(self.bot.game.save)
 
         await self.obscog.enable_rip(True)
         await ctx.send("Счётчик смертей активирован")
@@ -198,7 +198,7 @@ class RIPCog(MyCog):
             return
 
         self.bot.game.rip_enabled = False
-        self.bot.game.save()
+        await self.bot.aiodb.write(self.bot.game.save)
 
         await self.obscog.enable_rip(False)
         await ctx.send("Счётчик смертей отключён")
@@ -1,5 +1,5 @@
-import asyncio
 import warnings
+from typing import Optional
 
 from loguru import logger
 from twitchio.ext import commands
@@ -19,6 +19,9 @@ except ImportError as e:
 
 
 class VMcog(MyCog):
+    # How long one voice change lasts, in seconds
+    duration = 60
+
     def __init__(self, bot):
         self.bot = bot
         self.vmod = None
@@ -28,7 +31,6 @@ class VMcog(MyCog):
             self.get_voicemod()
 
     async def deactivate_voicemod(self):
-        await asyncio.sleep(60)
         self.get_voicemod()
         # self.get_discord()
         if self.vmod is not None:
@@ -38,11 +40,8 @@ class VMcog(MyCog):
             # if self.get_discord() is not None:
             self.vmod.type_keys("%{VK_NUMPAD0}", set_foreground=False)  # unmute
 
-    async def activate_voicemod(self):
-        while self.vmod_active:
-            await asyncio.sleep(5)
-
-        self.bot.play_sound("my_sound\\vmod.mp3")
+    async def start_voicemod(self):
+        await self.bot.play_sound_async("my_sound\\vmod.mp3")
 
         self.get_voicemod()
 
@@ -51,7 +50,15 @@ class VMcog(MyCog):
             self.vmod_active = True
             self.vmod.type_keys("%{VK_MULTIPLY}", set_foreground=False)  # random voice
 
-        asyncio.ensure_future(self.deactivate_voicemod())
+    async def activate_voicemod(self, requestor: Optional[str] = None):
+        await self.bot.effects.submit(
+            "voicemod",
+            "voice",
+            self.duration,
+            self.start_voicemod,
+            self.deactivate_voicemod,
+            requestor,
+        )
 
     def get_voicemod(self):
         if not pywinauto:
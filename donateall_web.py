@@ -0,0 +1,158 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+
+import aio_http
+from tokens import TokenError
+
+WEB_API_URL = "https://donateall.online/api/"
+
+
+class DonateAllWeb:
+    """
+    donateall.online web API (not the public one used for songs), used to
+    switch music requests on and off. The id_token is cached until it
+    expires and the chat settings document for `settings_ttl` seconds. A
+    cached document that says there is nothing to do is re-read first, so a
+    change made elsewhere isn't mistaken for ours; a failed PUT drops it.
+    """
+
+    # id_token lifetime if it can't be read from the token itself
+    token_fallback_ttl = 60 * 60
+    settings_ttl = 10 * 60
+
+    def __init__(
+        self,
+        login: Optional[str],
+        password: Optional[str],
+        base_url: str = WEB_API_URL,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
+        self.login = login
+        self.password = password
+        self.base_url = base_url
+        self.session = session
+        self.token: Optional[str] = None
+        self.token_deadline = 0.0
+        self.settings: Optional[dict] = None
+        self.settings_deadline = 0.0
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def jwt_expiry(token: str) -> Optional[float]:
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except (IndexError, KeyError, ValueError, TypeError):
+            return None
+
+    def _request(self, method: str, path: str, **kwargs):
+        return aio_http.request(
+            "donateall", method, self.base_url + path, session=self.session, **kwargs
+        )
+
+    async def get_token(self) -> str:
+        if self.token is not None and time.time() < self.token_deadline:
+            return self.token
+
+        async with self._request(
+            "POST",
+            "authenticate",
+            json={
+                "username": self.login,
+                "password": self.password,
+                "rememberMe": True,
+            },
+        ) as r:
+            r.raise_for_status()
+            token = (await r.json())["id_token"]
+
+        async with self._request(
+            "GET", "account", headers={"Authorization": "Bearer " + token}
+        ) as r:
+            r.raise_for_status()
+            res = await r.json()
+        if res.get("login") is None:
+            raise TokenError("login failed {0}".format(res))
+
+        expiry = self.jwt_expiry(token) or time.time() + self.token_fallback_ttl
+        self.token = token
+        # Renew a minute early so a request never races the expiry
+        self.token_deadline = expiry - 60
+        return token
+
+    def invalidate(self):
+        self.token = None
+        self.token_deadline = 0.0
+        self.settings = None
+
+    def settings_cached(self) -> bool:
+        return self.settings is not None and time.monotonic() < self.settings_deadline
+
+    async def get_chat_settings(self, token: str, refresh: bool = False) -> dict:
+        if not refresh and self.settings_cached():
+            return self.settings
+
+        async with self._request(
+            "GET",
+            "user-chat-advance-settings",
+            headers={"Authorization": "Bearer " + token},
+        ) as r:
+            r.raise_for_status()
+            res = (await r.json())[0]
+
+        self.settings = {"id": res["id"], "settings": json.loads(res["settings"])}
+        self.settings_deadline = time.monotonic() + self.settings_ttl
+        return self.settings
+
+    async def put_music_enabled(self, enabled: bool) -> bool:
+        token = await self.get_token()
+        cached = self.settings_cached()
+        doc = await self.get_chat_settings(token)
+        if doc["settings"]["musicSettings"]["isMusicEnabled"] == enabled and cached:
+            doc = await self.get_chat_settings(token, refresh=True)
+        if doc["settings"]["musicSettings"]["isMusicEnabled"] == enabled:
+            logger.debug(f"Music is already {'enabled' if enabled else 'disabled'}")
+            return False
+
+        settings = json.loads(json.dumps(doc["settings"]))
+        settings["musicSettings"]["isMusicEnabled"] = enabled
+        # whatever happens next, the cached copy can't be trusted until it's done
+        self.settings = None
+        async with self._request(
+            "PUT",
+            "user-chat-advance-settings",
+            headers={"Authorization": "Bearer " + token},
+            json={"id": doc["id"], "settings": json.dumps(settings)},
+        ) as r:
+            r.raise_for_status()
+
+        self.settings = {"id": doc["id"], "settings": settings}
+        return True
+
+    async def set_music(self, enabled: bool) -> Optional[bool]:
+        """
+        Enable or disable music requests. Returns whether anything changed,
+        or None if it failed (the error is logged).
+        """
+        async with self.lock:
+            try:
+                try:
+                    return await self.put_music_enabled(enabled)
+                except aiohttp.ClientResponseError as e:
+                    # Token revoked or settings changed elsewhere - start over
+                    logger.warning(f"set_music failed ({e.status}), retrying")
+                    self.invalidate()
+                    return await self.put_music_enabled(enabled)
+            except (aiohttp.ClientError, asyncio.TimeoutError, TokenError) as e:
+                logger.error(f"Failed to switch music requests: {e}")
+            except (LookupError, ValueError) as e:
+                logger.error(f"Unexpected donateall settings: {e}")
+            self.settings = None
+            return None
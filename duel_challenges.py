@@ -0,0 +1,117 @@
+import enum
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Challenge(NamedTuple):
+    attacker: str
+    defender: str
+    attacker_name: str
+    defender_name: str
+    deadline: float
+
+
+class AddResult(enum.Enum):
+    ADDED = "added"
+    EXISTS = "exists"
+    ATTACKER_LIMIT = "attacker_limit"
+    DEFENDER_LIMIT = "defender_limit"
+
+
+class ChallengeStore:
+    """
+    Pending duel challenges keyed by (defender, attacker).
+
+    All challenges share the same TTL, so the insertion order of the ordered
+    dict is also the expiry order: the first entry is always the next one to
+    expire and a single timer set to its deadline is enough.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 120,
+        max_per_attacker: int = 3,
+        max_per_defender: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_per_attacker = max_per_attacker
+        self.max_per_defender = max_per_defender
+        self.clock = clock
+        self._challenges: "OrderedDict[Tuple[str, str], Challenge]" = OrderedDict()
+        self._by_attacker: Dict[str, int] = defaultdict(int)
+        self._by_defender: Dict[str, int] = defaultdict(int)
+
+    def __len__(self):
+        return len(self._challenges)
+
+    def __contains__(self, key: Tuple[str, str]):
+        return key in self._challenges
+
+    def add(
+        self,
+        defender: str,
+        attacker: str,
+        defender_name: Optional[str] = None,
+        attacker_name: Optional[str] = None,
+    ) -> AddResult:
+        key = (defender, attacker)
+        # Repeating a challenge doesn't extend it, otherwise spamming !attack
+        # would keep it alive forever
+        if key in self._challenges:
+            return AddResult.EXISTS
+
+        if self._by_attacker.get(attacker, 0) >= self.max_per_attacker:
+            return AddResult.ATTACKER_LIMIT
+        if self._by_defender.get(defender, 0) >= self.max_per_defender:
+            return AddResult.DEFENDER_LIMIT
+
+        self._challenges[key] = Challenge(
+            attacker,
+            defender,
+            attacker_name or attacker,
+            defender_name or defender,
+            self.clock() + self.ttl,
+        )
+        self._by_attacker[attacker] += 1
+        self._by_defender[defender] += 1
+        return AddResult.ADDED
+
+    def _forget(self, challenge: Challenge):
+        for counter, name in (
+            (self._by_attacker, challenge.attacker),
+            (self._by_defender, challenge.defender),
+        ):
+            counter[name] -= 1
+            if counter[name] <= 0:
+                del counter[name]
+
+    def pop(self, defender: str, attacker: str) -> Optional[Challenge]:
+        challenge = self._challenges.pop((defender, attacker), None)
+        if challenge is None:
+            return None
+
+        self._forget(challenge)
+        if challenge.deadline <= self.clock():
+            # Timer hasn't fired yet, but the challenge is already stale
+            return None
+        return challenge
+
+    def expire(self) -> List[Challenge]:
+        now = self.clock()
+        expired = []
+        while self._challenges:
+            key, challenge = next(iter(self._challenges.items()))
+            if challenge.deadline > now:
+                break
+            del self._challenges[key]
+            self._forget(challenge)
+            expired.append(challenge)
+
+        return expired
+
+    def next_deadline(self) -> Optional[float]:
+        if not self._challenges:
+            return None
+        return next(iter(self._challenges.values())).deadline
@@ -0,0 +1,75 @@
+import heapq
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DuelLeaderboard:
+    """
+    In-memory copy of the duel statistics, kept up to date on every duel so
+    that leaderboard commands don't have to touch the database.
+
+    `wins[(a, b)]` is how many times `a` has beaten `b`, per-player totals are
+    maintained alongside. Sorted views are computed lazily and cached until
+    the next update.
+    """
+
+    def __init__(self):
+        self.wins: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._top_winners: Optional[List[Tuple[str, int, int]]] = None
+        self._top_rivalries: Optional[List[Tuple[str, str, int, int]]] = None
+
+    def load(self, rows: Iterable[Tuple[str, str, int, int]]):
+        """
+        Fill the leaderboard from (attacker, defender, wins, losses) rows.
+        Every duel is stored in both directions, so only wins are counted
+        for pairs and losses come from the attacker's own row.
+        """
+        self.wins.clear()
+        self.totals.clear()
+        for attacker, defender, wins, losses in rows:
+            if wins:
+                self.wins[(attacker, defender)] += wins
+            self.totals[attacker][0] += wins
+            self.totals[attacker][1] += losses
+        self._invalidate()
+
+    def record(self, winner: str, loser: str):
+        self.wins[(winner, loser)] += 1
+        self.totals[winner][0] += 1
+        self.totals[loser][1] += 1
+        self._invalidate()
+
+    def _invalidate(self):
+        self._top_winners = None
+        self._top_rivalries = None
+
+    def player(self, name: str) -> Tuple[int, int]:
+        wins, losses = self.totals.get(name, (0, 0))
+        return wins, losses
+
+    def head_to_head(self, first: str, second: str) -> Tuple[int, int]:
+        return self.wins.get((first, second), 0), self.wins.get((second, first), 0)
+
+    def top_winners(self, count: int = 3) -> List[Tuple[str, int, int]]:
+        """(name, wins, losses) of the players with most wins"""
+        if self._top_winners is None or len(self._top_winners) < count:
+            self._top_winners = heapq.nlargest(
+                count,
+                ((name, w, l) for name, (w, l) in self.totals.items() if w > 0),
+                key=lambda x: (x[1], -x[2]),
+            )
+        return self._top_winners[:count]
+
+    def top_rivalries(self, count: int = 3) -> List[Tuple[str, str, int, int]]:
+        """(first, second, first's wins, second's wins) of the most fought pairs"""
+        if self._top_rivalries is None or len(self._top_rivalries) < count:
+            pairs = {}
+            for (winner, loser), wins in self.wins.items():
+                key = (winner, loser) if winner < loser else (loser, winner)
+                if key not in pairs:
+                    pairs[key] = (*key, *self.head_to_head(*key))
+            self._top_rivalries = heapq.nlargest(
+                count, pairs.values(), key=lambda x: x[2] + x[3]
+            )
+        return self._top_rivalries[:count]
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import peewee
+
+
+class DuelStats(peewee.Model):
+    """
+    Duel results, one row per (attacker, defender) pair and direction. The
+    model is bound to the bot's database in bot.py.
+    """
+
+    attacker = peewee.TextField()
+    defender = peewee.TextField()
+    losses = peewee.IntegerField(null=False, default=0)
+    wins = peewee.IntegerField(null=False, default=0)
+
+    class Meta:
+        table_name = "duelstats"
+        primary_key = peewee.CompositeKey("attacker", "defender")
+        indexes = (
+            (("attacker", "wins"), False),
+            (("attacker", "losses"), False),
+        )
+
+    @classmethod
+    def record_duels(cls, results: Iterable[Tuple[str, str]]):
+        """
+        Apply (winner, loser) pairs in one transaction. Every pair updates both
+        directions, repeated pairs are summed up so each row is upserted once.
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        for winner, loser in results:
+            deltas[(winner, loser)][0] += 1
+            deltas[(loser, winner)][1] += 1
+
+        with cls._meta.database.atomic():
+            for (attacker, defender), (wins, losses) in deltas.items():
+                cls.insert(
+                    attacker=attacker, defender=defender, wins=wins, losses=losses
+                ).on_conflict(
+                    conflict_target=[cls.attacker, cls.defender],
+                    update={cls.wins: cls.wins + wins, cls.losses: cls.losses + losses},
+                ).execute()
+
+    @classmethod
+    def record_duel(cls, winner: str, loser: str):
+        cls.record_duels(((winner, loser),))
+
+
+def query_all_duels() -> List[Tuple[str, str, int, int]]:
+    return list(
+        DuelStats.select(
+            DuelStats.attacker, DuelStats.defender, DuelStats.wins, DuelStats.losses
+        ).tuples()
+    )
+
+
+def query_duel_stats(author: str) -> Optional[dict]:
+    """
+    Totals, best and worst opponents of `author` in one query: window
+    aggregates over the attacker's rows, then only the first row and the
+    rows matching the maximums are returned.
+    """
+    ranked = (
+        DuelStats.select(
+            DuelStats.defender,
+            DuelStats.wins,
+            DuelStats.losses,
+            peewee.fn.SUM(DuelStats.wins).over().alias("total_wins"),
+            peewee.fn.SUM(DuelStats.losses).over().alias("total_losses"),
+            peewee.fn.MAX(DuelStats.wins).over().alias("max_wins"),
+            peewee.fn.MAX(DuelStats.losses).over().alias("max_losses"),
+            peewee.fn.ROW_NUMBER().over().alias("rn"),
+        )
+        .where(DuelStats.attacker == author)
+        .alias("ranked")
+    )
+    c = ranked.c
+    rows = list(
+        DuelStats.select(
+            c.defender,
+            c.wins,
+            c.losses,
+            c.total_wins,
+            c.total_losses,
+            c.max_wins,
+            c.max_losses,
+        )
+        .from_(ranked)
+        .where(
+            (c.rn == 1)
+            | ((c.max_wins > 0) & (c.wins == c.max_wins))
+            | ((c.max_losses > 0) & (c.losses == c.max_losses))
+        )
+        .dicts()
+    )
+    if not rows:
+        return None
+
+    max_wins = rows[0]["max_wins"]
+    max_losses = rows[0]["max_losses"]
+    return {
+        "wins": rows[0]["total_wins"],
+        "losses": rows[0]["total_losses"],
+        "max_wins": max_wins,
+        "won_against": [
+            r["defender"] for r in rows if max_wins > 0 and r["wins"] == max_wins
+        ],
+        "max_losses": max_losses,
+        "lost_to": [
+            r["defender"] for r in rows if max_losses > 0 and r["losses"] == max_losses
+        ],
+    }
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+Callback = Callable[[], Awaitable[Any]]
+
+
+class EffectRun:
+    __slots__ = (
+        "name",
+        "group",
+        "duration",
+        "start",
+        "stop",
+        "requestor",
+        "deadline",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        group: str,
+        duration: float,
+        start: Optional[Callback],
+        stop: Optional[Callback],
+        requestor: Optional[str],
+    ):
+        self.name = name
+        self.group = group
+        self.duration = duration
+        self.start = start
+        self.stop = stop
+        self.requestor = requestor
+        # loop time when the effect ends, None until it starts
+        self.deadline: Optional[float] = None
+
+    def as_dict(self, now: float) -> dict:
+        res = {"name": self.name, "requestor": self.requestor}
+        if self.deadline is not None:
+            res["remaining"] = max(0.0, self.deadline - now)
+        else:
+            res["duration"] = self.duration
+        return res
+
+
+class EffectScheduler:
+    """
+    Runs time-boxed effects (voice changer, disco, ...). Only one effect of an
+    exclusivity group is active at a time, the rest wait in a FIFO queue.
+    Deadlines of all active effects live in one heap with a single loop timer
+    armed on the earliest one; extended or cancelled runs leave stale heap
+    entries that are skipped when they surface.
+    """
+
+    def __init__(self, on_change: Optional[Callable[[dict], Any]] = None):
+        self.on_change = on_change
+        self.active: Dict[str, EffectRun] = {}
+        self.queues: Dict[str, Deque[EffectRun]] = defaultdict(deque)
+        self._heap: List[Tuple[float, int, EffectRun]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(
+        self,
+        name: str,
+        group: str,
+        duration: float,
+        start: Optional[Callback] = None,
+        stop: Optional[Callback] = None,
+        requestor: Optional[str] = None,
+    ) -> EffectRun:
+        run = EffectRun(name, group, duration, start, stop, requestor)
+        if group in self.active:
+            logger.info(f"Effect {name} queued after {self.active[group].name}")
+            self.queues[group].append(run)
+            self._changed()
+        else:
+            await self._start(run)
+
+        return run
+
+    def extend(self, group: str, seconds: float) -> bool:
+        run = self.active.get(group)
+        if run is None:
+            return False
+
+        if run.deadline is None:
+            # still starting, the deadline is computed from the duration
+            run.duration += seconds
+            return True
+
+        run.deadline += seconds
+        self._push(run)
+        self._changed()
+        return True
+
+    async def cancel(self, group: str, clear_queue: bool = False) -> bool:
+        if clear_queue:
+            self.queues.pop(group, None)
+        run = self.active.get(group)
+        if run is None:
+            self._changed()
+            return False
+
+        await self._finish(run)
+        return True
+
+    def snapshot(self) -> dict:
+        now = asyncio.get_running_loop().time()
+        groups = set(self.active) | {g for g, q in self.queues.items() if q}
+        return {
+            group: {
+                "active": (
+                    self.active[group].as_dict(now) if group in self.active else None
+                ),
+                "queue": [run.as_dict(now) for run in self.queues.get(group, ())],
+            }
+            for group in groups
+        }
+
+    def _changed(self):
+        if self.on_change is not None:
+            try:
+                self.on_change(self.snapshot())
+            except Exception:
+                logger.exception("Effect change callback failed")
+
+    def _push(self, run: EffectRun):
+        heapq.heappush(self._heap, (run.deadline, next(self._seq), run))
+        self._arm()
+
+    def _arm(self):
+        heap = self._heap
+        while heap and heap[0][2].deadline != heap[0][0]:
+            heapq.heappop(heap)
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if heap:
+            self._timer = asyncio.get_running_loop().call_at(heap[0][0], self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        asyncio.ensure_future(self._expire())
+
+    async def _expire(self):
+        now = asyncio.get_running_loop().time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, run = heapq.heappop(self._heap)
+            if run.deadline == deadline:
+                due.append(run)
+
+        for run in due:
+            await self._finish(run)
+        self._arm()
+
+    async def _start(self, run: EffectRun):
+        self.active[run.group] = run
+        if run.start is not None:
+            try:
+                await run.start()
+            except Exception:
+                logger.exception(f"Failed to start effect {run.name}")
+                await self._finish(run, stop=False)
+                return
+
+            if self.active.get(run.group) is not run:
+                # cancelled while starting
+                return
+
+        # the duration counts from the moment the effect is actually on
+        run.deadline = asyncio.get_running_loop().time() + run.duration
+        self._push(run)
+        logger.info(f"Effect {run.name} started for {run.duration}s")
+        self._changed()
+
+    async def _finish(self, run: EffectRun, stop: bool = True):
+        if self.active.get(run.group) is not run:
+            return
+
+        del self.active[run.group]
+        run.deadline = None
+        logger.info(f"Effect {run.name} finished")
+
+        if stop and run.stop is not None:
+            try:
+                await run.stop()
+            except Exception:
+                logger.exception(f"Failed to stop effect {run.name}")
+
+        queue = self.queues.get(run.group)
+        if queue:
+            await self._start(queue.popleft())
+        else:
+            self.queues.pop(run.group, None)
+            self._changed()
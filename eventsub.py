@@ -0,0 +1,173 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+import aio_http
+from aio_timer import AdaptiveInterval
+
+EVENTSUB_URL = "wss://eventsub.wss.twitch.tv/ws"
+REDEMPTION_ADD = "channel.channel_points_custom_reward_redemption.add"
+
+
+class EventSubClient:
+    """
+    Twitch EventSub over WebSocket.
+
+    `subscribe(session_id)` is called after every fresh welcome to create the
+    subscriptions through Helix (they survive a session_reconnect, so it is
+    not called then). Notifications are deduplicated by message id and passed
+    to `handlers[subscription_type](event)`.
+    """
+
+    # Twitch allows a few seconds of slack on top of the keepalive timeout
+    keepalive_slack = 5
+    welcome_timeout = 10
+    seen_size = 1000
+    retry_min = 1
+    retry_max = 60
+
+    def __init__(
+        self,
+        subscribe: Callable[[str], Awaitable],
+        handlers: Dict[str, Callable[[dict], Awaitable]],
+        url: str = EVENTSUB_URL,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
+        self.subscribe = subscribe
+        self.handlers = handlers
+        self.url = url
+        self.session = session
+        self.session_id: Optional[str] = None
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+
+    def _http(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            self.session = aio_http.get_session("eventsub")
+        return self.session
+
+    @staticmethod
+    async def _receive(ws: aiohttp.ClientWebSocketResponse) -> dict:
+        msg = await ws.receive()
+        if msg.type == aiohttp.WSMsgType.TEXT:
+            return json.loads(msg.data)
+
+        raise ConnectionError(f"EventSub socket closed: {msg.type} {ws.close_code}")
+
+    async def _connect(self, url: str) -> Tuple[aiohttp.ClientWebSocketResponse, dict]:
+        ws = await self._http().ws_connect(url)
+        try:
+            msg = await asyncio.wait_for(self._receive(ws), self.welcome_timeout)
+            if msg["metadata"]["message_type"] != "session_welcome":
+                raise ConnectionError(f"Expected session_welcome, got {msg}")
+        except BaseException:
+            await ws.close()
+            raise
+
+        session = msg["payload"]["session"]
+        self.session_id = session["id"]
+        logger.info(f"EventSub session {self.session_id} ready")
+        return ws, session
+
+    async def run(self):
+        """Connect and consume events until cancelled."""
+        retry = AdaptiveInterval(self.retry_min, self.retry_max)
+        while True:
+            try:
+                ws, session = await self._connect(self.url)
+                try:
+                    await self.subscribe(session["id"])
+                    retry.reset()
+                    await self._consume(ws, session)
+                finally:
+                    # _consume closes the sockets it owns, this covers the rest
+                    await ws.close()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                delay = retry.backoff()
+                logger.warning(f"EventSub connection lost: {e}, reconnect in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _consume(self, ws: aiohttp.ClientWebSocketResponse, session: dict):
+        recv: Optional[asyncio.Task] = None
+        handoff: Optional[asyncio.Task] = None
+        try:
+            while True:
+                timeout = session["keepalive_timeout_seconds"] + self.keepalive_slack
+                if recv is None:
+                    recv = asyncio.ensure_future(self._receive(ws))
+                wait_for = {recv} if handoff is None else {recv, handoff}
+                done, _ = await asyncio.wait(
+                    wait_for, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise ConnectionError("EventSub keepalive timeout")
+
+                recv_failed = recv in done and recv.exception() is not None
+                if handoff is not None and (
+                    recv_failed or (handoff in done and recv not in done)
+                ):
+                    # Once the new session is welcomed the old socket can go
+                    new_ws, session = await asyncio.wait_for(handoff, timeout)
+                    handoff = None
+                    recv.cancel()
+                    recv = None
+                    await ws.close()
+                    ws = new_ws
+                    continue
+
+                msg = recv.result()
+                recv = None
+                reconnect_url = await self._handle(msg)
+                if reconnect_url is not None and handoff is None:
+                    logger.info("EventSub asked to reconnect")
+                    handoff = asyncio.ensure_future(self._connect(reconnect_url))
+        finally:
+            for task in (recv, handoff):
+                if task is not None:
+                    task.cancel()
+            await ws.close()
+
+    async def _handle(self, msg: dict) -> Optional[str]:
+        """Handle one message, returns the reconnect url if asked to move"""
+        metadata = msg["metadata"]
+        message_type = metadata["message_type"]
+        if message_type == "session_keepalive":
+            return None
+
+        if message_type == "session_reconnect":
+            return msg["payload"]["session"]["reconnect_url"]
+
+        if message_type == "revocation":
+            subscription = msg["payload"]["subscription"]
+            logger.error(
+                f"EventSub subscription {subscription['type']} revoked: "
+                f"{subscription['status']}"
+            )
+            return None
+
+        if message_type != "notification":
+            logger.debug(f"Unexpected EventSub message {message_type}")
+            return None
+
+        message_id = metadata["message_id"]
+        if message_id in self.seen:
+            logger.debug(f"Duplicate EventSub message {message_id}")
+            return None
+        self.seen[message_id] = None
+        if len(self.seen) > self.seen_size:
+            self.seen.popitem(last=False)
+
+        subscription_type = metadata["subscription_type"]
+        handler = self.handlers.get(subscription_type)
+        if handler is None:
+            logger.warning(f"No handler for EventSub {subscription_type}")
+            return None
+
+        try:
+            await handler(msg["payload"]["event"])
+        except Exception:
+            logger.exception(f"EventSub {subscription_type} handler failed")
+        return None
@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+import aio_http
+
+HELIX_URL = "https://api.twitch.tv/helix/"
+
+# request priorities, lower goes first
+PRIORITY_HIGH = 0  # moderation, redemptions
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2  # polling
+
+
+class HelixClient:
+    """
+    Async Helix client on the shared "helix" connection pool.
+    `token_provider(refresh)` returns the user access token; it is called with
+    refresh=True once after a 401, before the request is retried.
+
+    The Helix token bucket is tracked from the Ratelimit-* response headers.
+    Lower priority requests keep a bigger part of the bucket in reserve, so as
+    it drains they are the first to wait for the reset. Waiting requests are
+    queued by priority and woken when the bucket refills, so a high priority
+    request never waits behind a low priority one that came first. A 429
+    waits for the reset and tries again instead of failing.
+    """
+
+    # fraction of the bucket a request of each priority leaves untouched
+    reserve = {PRIORITY_HIGH: 0.0, PRIORITY_NORMAL: 0.1, PRIORITY_LOW: 0.3}
+    max_rate_limited = 3
+    # used when a 429 comes without a usable Ratelimit-Reset header
+    default_backoff = 5.0
+    # Helix refills the bucket over a minute; the headers correct our guess
+    window = 60.0
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        token_provider: Callable[[bool], Awaitable[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        base_url: str = HELIX_URL,
+    ):
+        self.client_id = client_id
+        self.token_provider = token_provider
+        self.session = session
+        self.base_url = base_url
+        # unknown until the first response
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        # (priority, arrival, future) of the requests waiting for the bucket
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self.stats = {"delayed": 0, "rate_limited": 0}
+
+    def _update_bucket(self, headers):
+        try:
+            self.limit = int(headers["Ratelimit-Limit"])
+            self.remaining = int(headers["Ratelimit-Remaining"])
+            self.reset_at = float(headers["Ratelimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        self._wake()
+
+    def _reset_delay(self, headers) -> float:
+        try:
+            return max(0.0, float(headers["Ratelimit-Reset"]) - time.time())
+        except (KeyError, ValueError):
+            return self.default_backoff
+
+    def _take(self, priority: int) -> bool:
+        """Take a token from the bucket if `priority` may have it"""
+        now = time.time()
+        if now >= self.reset_at:
+            # the bucket is full again, until the next window
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+
+        if self.remaining > self.limit * self.reserve[priority]:
+            self.remaining -= 1
+            return True
+        return False
+
+    def _wake(self):
+        """Hand out tokens to the waiters in priority order"""
+        if self._wake_handle is not None:
+            self._wake_handle.cancel()
+            self._wake_handle = None
+
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # cancelled while waiting
+                heapq.heappop(self._waiters)
+            elif self._take(priority):
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+            else:
+                break
+
+        if self._waiters:
+            delay = max(0.05, self.reset_at - time.time())
+            self._wake_handle = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    async def _acquire(self, priority: int):
+        if self.remaining is None:
+            return
+
+        # only requests of a higher priority may overtake the ones waiting
+        overtakes = not self._waiters or priority < self._waiters[0][0]
+        if overtakes and self._take(priority):
+            return
+
+        self.stats["delayed"] += 1
+        logger.debug(f"Helix bucket is low, delaying priority {priority}")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+        if self._wake_handle is None:
+            self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # cancelled right after getting a token, give it back
+                self.remaining += 1
+                self._wake()
+            raise
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params=None,
+        json=None,
+        priority: int = PRIORITY_NORMAL,
+    ) -> Optional[dict]:
+        refreshed = False
+        rate_limited = 0
+        while True:
+            await self._acquire(priority)
+            token = await self.token_provider(refreshed)
+            async with aio_http.request(
+                "helix",
+                method,
+                self.base_url + path,
+                session=self.session,
+                params=params,
+                json=json,
+                headers={
+                    "Client-ID": self.client_id,
+                    "Authorization": f"Bearer {token}",
+                },
+            ) as r:
+                self._update_bucket(r.headers)
+                if r.status == 401 and not refreshed:
+                    refreshed = True
+                    continue
+                if r.status != 429 or rate_limited == self.max_rate_limited:
+                    r.raise_for_status()
+                    if r.status == 204:
+                        return None
+                    return await r.json()
+
+                rate_limited += 1
+                self.stats["rate_limited"] += 1
+                delay = self._reset_delay(r.headers)
+                logger.warning(f"Helix rate limit hit, retrying in {delay:.1f}s")
+
+            await asyncio.sleep(delay)
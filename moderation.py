@@ -0,0 +1,128 @@
+import asyncio
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from helix_client import PRIORITY_HIGH, HelixClient
+
+
+class TimeoutAction:
+    __slots__ = ("duration", "reason", "future")
+
+    def __init__(self, duration: int, reason: str, future: asyncio.Future):
+        self.duration = duration
+        self.reason = reason
+        self.future = future
+
+
+class ModerationQueue:
+    """
+    Timeouts through the Helix moderation API instead of "/timeout" chat
+    commands. Requests for a user that is still waiting in the queue are
+    merged (the longest duration wins) and share the result. Logins are
+    resolved to user ids in batches of up to 100 and cached.
+    """
+
+    max_lookup = 100
+
+    def __init__(self, helix: HelixClient, broadcaster_id: Callable[[], str]):
+        self.helix = helix
+        self.broadcaster_id = broadcaster_id
+        self.pending: "OrderedDict[str, TimeoutAction]" = OrderedDict()
+        self.user_ids: Dict[str, str] = {}
+        self.worker: Optional[asyncio.Task] = None
+
+    def remember_user(self, login: str, user_id: str):
+        self.user_ids[login.lower()] = str(user_id)
+
+    def timeout(self, login: str, duration: int, reason: str = "") -> asyncio.Future:
+        """
+        Queue a timeout. The returned future resolves to True once Twitch
+        accepted it and to False if it failed.
+        """
+        login = login.lower().lstrip("@")
+        action = self.pending.get(login)
+        if action is not None:
+            action.duration = max(action.duration, duration)
+            return action.future
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[login] = TimeoutAction(duration, reason, future)
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.ensure_future(self._work())
+        return future
+
+    async def _work(self):
+        while self.pending:
+            logins = list(self.pending)[: self.max_lookup]
+            actions = [self.pending.pop(login) for login in logins]
+            try:
+                await self._run_batch(logins, actions)
+            except Exception:
+                logger.exception(f"Failed to time out {logins}")
+            finally:
+                # nobody waits forever, whatever happened above
+                for action in actions:
+                    if not action.future.done():
+                        action.future.set_result(False)
+
+    async def _run_batch(self, logins: List[str], actions: List[TimeoutAction]):
+        try:
+            await self._resolve(logins)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to look up users {logins}: {e}")
+
+        for login, action in zip(logins, actions):
+            user_id = self.user_ids.get(login)
+            if user_id is None:
+                logger.warning(f"Can't time out {login}: unknown user")
+                ok = False
+            else:
+                ok = await self._ban(login, user_id, action)
+            if not action.future.done():
+                action.future.set_result(ok)
+
+    async def _resolve(self, logins: List[str]):
+        missing = [login for login in logins if login not in self.user_ids]
+        if not missing:
+            return
+
+        res = await self.helix.request(
+            "GET",
+            "users",
+            params=[("login", login) for login in missing],
+            priority=PRIORITY_HIGH,
+        )
+        for user in res["data"]:
+            self.remember_user(user["login"], user["id"])
+
+    async def _ban(self, login: str, user_id: str, action: TimeoutAction) -> bool:
+        broadcaster_id = str(self.broadcaster_id())
+        try:
+            await self.helix.request(
+                "POST",
+                "moderation/bans",
+                params={
+                    "broadcaster_id": broadcaster_id,
+                    "moderator_id": broadcaster_id,
+                },
+                json={
+                    "data": {
+                        "user_id": user_id,
+                        "duration": action.duration,
+                        "reason": action.reason,
+                    }
+                },
+                priority=PRIORITY_HIGH,
+            )
+        except aiohttp.ClientResponseError as e:
+            logger.warning(f"Failed to time out {login}: {e.status} {e.message}")
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to time out {login}: {e}")
+            return False
+
+        logger.info(f"Timed out {login} for {action.duration}s")
+        return True
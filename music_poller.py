@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+from loguru import logger
+
+from aio_timer import AdaptiveInterval
+from tokens import TokenError
+
+
+class MusicPoller:
+    """
+    Polls `fetch()` for the song that is playing now (a dict with at least
+    "id" and "duration", or None when nothing plays) and calls
+    `on_song(song)` once per new song. While a song with a known duration
+    plays, the next poll is timed for its end; without one the poll interval
+    is `poll_playing`. Idle polls and errors back off separately.
+    """
+
+    # Poll intervals, in seconds
+    poll_min = 2
+    poll_playing = 5
+    poll_idle_max = 30
+    poll_error_max = 120
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Optional[dict]]],
+        on_song: Callable[[dict], None],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.on_song = on_song
+        self.clock = clock
+        self.last_song_id = 0
+        self.song_ends_at: Optional[float] = None
+        self.idle = AdaptiveInterval(self.poll_min, self.poll_idle_max)
+        self.errors = AdaptiveInterval(self.poll_min, self.poll_error_max)
+
+    def playing_delay(self) -> float:
+        if self.song_ends_at is None:
+            return self.poll_playing
+
+        # Poll rarely in the middle of the song and often around its end
+        remaining = self.song_ends_at - self.clock()
+        return max(self.poll_min, min(remaining, self.poll_idle_max))
+
+    def new_song(self, song: dict):
+        if song["id"] == self.last_song_id:
+            return
+
+        self.last_song_id = song["id"]
+        if song["duration"]:
+            self.song_ends_at = self.clock() + float(song["duration"])
+        else:
+            self.song_ends_at = None
+        self.on_song(song)
+
+    async def poll_once(self) -> float:
+        """Poll once, returns the delay until the next poll"""
+        try:
+            song = await self.fetch()
+        except TokenError as e:
+            logger.error(f"Token not available: {e}")
+            return self.errors.backoff()
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
+            logger.warning(f"API request to donateall failed: {e}")
+            return self.errors.backoff()
+
+        self.errors.reset()
+        if song is None:
+            logger.debug("No song playing")
+            self.song_ends_at = None
+            return self.idle.backoff()
+
+        self.idle.reset()
+        self.new_song(song)
+        return self.playing_delay()
+
+    async def run(self):
+        while True:
+            try:
+                delay = await self.poll_once()
+            except Exception:
+                logger.exception("Music poller failed")
+                delay = self.errors.backoff()
+
+            logger.debug(f"Next music poll in {delay}s")
+            await asyncio.sleep(delay)
@@ -10,9 +10,12 @@ import webbrowser
 
 from requests_oauthlib import OAuth2Session
 
+TOKEN_FILE = "nightbot_token.json"
+TOKEN_URL = "https://api.nightbot.tv/oauth2/token"
+
 
 def token_saver(token):
-    with open("nightbot_token.json", "w") as f:
+    with open(TOKEN_FILE, "w") as f:
         json.dump(token, f)
 
 
@@ -37,7 +40,7 @@ def get_token(client_id, client_secret, redirect_uri):
 
     authorization_response = input("Enter the full callback URL").strip()
     token = oauth.fetch_token(
-        "https://api.nightbot.tv/oauth2/token",
+        TOKEN_URL,
         client_id=client_id,
         client_secret=client_secret,
         authorization_response=authorization_response,
@@ -49,7 +52,7 @@ def get_token(client_id, client_secret, redirect_uri):
 
 def get_nightbot_session(client_id, client_secret, redirect_uri):
     try:
-        f = open("nightbot_token.json", "r")
+        f = open(TOKEN_FILE, "r")
         token = json.load(f)
     except (OSError, FileNotFoundError, json.JSONDecodeError):
         print("Failed to load token!")
@@ -61,7 +64,7 @@ def get_nightbot_session(client_id, client_secret, redirect_uri):
     oauth = OAuth2Session(
         client_id,
         token=token,
-        auto_refresh_url="https://api.nightbot.tv/oauth2/token",
+        auto_refresh_url=TOKEN_URL,
         auto_refresh_kwargs={"client_id": client_id, "client_secret": client_secret},
         redirect_uri=redirect_uri,
         scope=scope,
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+import aio_http
+from tokens import BaseToken
+
+NIGHTBOT_URL = "https://api.nightbot.tv/1/"
+TIMER_READ_ONLY = ("createdAt", "updatedAt", "nextRunAt")
+
+
+class ResourceIndex:
+    """Name-indexed copy of one Nightbot collection (timers or commands)"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.by_name: Dict[str, dict] = {}
+        self.deadline = 0.0
+
+    def fresh(self) -> bool:
+        return time.monotonic() < self.deadline
+
+    def load(self, items):
+        self.by_name = {item["name"]: item for item in items}
+        self.deadline = time.monotonic() + self.ttl
+
+    def store(self, item: dict):
+        self.by_name[item["name"]] = item
+
+    def invalidate(self):
+        self.deadline = 0.0
+
+
+class NightbotClient:
+    """
+    Async Nightbot API client. Timers and commands are cached by name and
+    reloaded after `ttl` seconds; our own writes update the cache from the
+    response, so they don't make it stale.
+    """
+
+    def __init__(
+        self,
+        token: BaseToken,
+        ttl: float = 600,
+        session: Optional[aiohttp.ClientSession] = None,
+        base_url: str = NIGHTBOT_URL,
+    ):
+        self.token = token
+        self.session = session
+        self.base_url = base_url
+        self.indexes = {"timers": ResourceIndex(ttl), "commands": ResourceIndex(ttl)}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._reconcile_lock = asyncio.Lock()
+
+    async def request(self, method: str, path: str, json=None) -> dict:
+        for attempt in range(2):
+            token = await self.token.get_token(refresh=attempt > 0)
+            async with aio_http.request(
+                "nightbot",
+                method,
+                self.base_url + path,
+                session=self.session,
+                json=json,
+                headers={"Authorization": f"Bearer {token}"},
+            ) as r:
+                if r.status == 401 and attempt == 0:
+                    continue
+                r.raise_for_status()
+                return await r.json()
+
+    async def _index(self, kind: str, refresh: bool = False) -> ResourceIndex:
+        index = self.indexes[kind]
+        if refresh:
+            index.invalidate()
+        if index.fresh():
+            return index
+
+        lock = self._locks.setdefault(kind, asyncio.Lock())
+        async with lock:
+            if not index.fresh():
+                logger.debug(f"Loading Nightbot {kind}")
+                index.load((await self.request("GET", kind)).get(kind, []))
+        return index
+
+    async def timers(self, refresh: bool = False) -> Dict[str, dict]:
+        return (await self._index("timers", refresh)).by_name
+
+    async def commands(self, refresh: bool = False) -> Dict[str, dict]:
+        return (await self._index("commands", refresh)).by_name
+
+    async def timer(self, name: str) -> Optional[dict]:
+        return (await self.timers()).get(name)
+
+    async def command(self, name: str) -> Optional[dict]:
+        return (await self.commands()).get(name)
+
+    async def _update(self, kind: str, item: dict, data: dict) -> dict:
+        try:
+            res = await self.request("PUT", f"{kind}/{item['_id']}", json=data)
+        except aiohttp.ClientResponseError:
+            # the object may have been changed or removed elsewhere
+            self.indexes[kind].invalidate()
+            raise
+
+        updated = res.get(kind[:-1]) or dict(item, **data)
+        self.indexes[kind].store(updated)
+        return updated
+
+    async def update_timer(self, name: str, data: dict) -> Optional[dict]:
+        timer = await self.timer(name)
+        if timer is None:
+            logger.error(f"No such timer: {name}")
+            return None
+
+        # Nightbot wants the whole timer back, minus the read-only fields
+        body = {k: v for k, v in timer.items() if k not in TIMER_READ_ONLY}
+        body.update(data)
+        return await self._update("timers", timer, body)
+
+    async def update_command(self, name: str, data: dict) -> Optional[dict]:
+        command = await self.command(name)
+        if command is None:
+            logger.error(f"No such command: {name}")
+            return None
+
+        return await self._update("commands", command, data)
+
+    async def set_timer_enabled(self, name: str, state: bool):
+        logger.info(f"Setting timer's {name} state to {state}")
+        await self.update_timer(name, {"enabled": state})
+
+    async def reconcile(self, timers: Dict[str, bool], commands: Dict[str, str]) -> int:
+        """
+        Bring Nightbot to the desired state: `timers` maps timer names to
+        their enabled flag, `commands` maps command names to their message.
+        Only the differences from the cached state are written, concurrently.
+        Returns the number of writes.
+        """
+        async with self._reconcile_lock:
+            current_timers = await self.timers()
+            current_commands = await self.commands()
+
+            writes = []
+            for name, enabled in timers.items():
+                timer = current_timers.get(name)
+                if timer is None:
+                    logger.error(f"No such timer: {name}")
+                elif timer["enabled"] != enabled:
+                    writes.append(self.set_timer_enabled(name, enabled))
+
+            for name, message in commands.items():
+                command = current_commands.get(name)
+                if command is None:
+                    logger.error(f"No such command: {name}")
+                elif command["message"] != message:
+                    writes.append(self.update_command(name, {"message": message}))
+
+            results = await asyncio.gather(*writes, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to update Nightbot: {result}")
+
+            return len(writes)
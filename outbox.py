@@ -0,0 +1,170 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+import peewee
+from loguru import logger
+
+from aio_db import AsyncDatabase
+from amqp_publisher import AMQPPublisher, PublishError
+
+
+class OutboxMessage(peewee.Model):
+    body = peewee.BlobField()
+    # unix time after which the message is dropped, NULL means never
+    expires_at = peewee.FloatField(null=True)
+    attempts = peewee.IntegerField(default=0)
+    next_attempt = peewee.FloatField(default=0.0, index=True)
+
+    class Meta:
+        table_name = "outbox"
+
+
+class Outbox:
+    """
+    Local store-and-forward queue in front of an AMQPPublisher. put() only
+    appends a row; relay() drains due rows to the broker in batches, retrying
+    failures with exponential backoff and dropping messages whose TTL ran out.
+    """
+
+    def __init__(
+        self,
+        aiodb: AsyncDatabase,
+        publisher: AMQPPublisher,
+        batch_size: int = 20,
+        poll_interval: float = 30.0,
+        retry_min: float = 1.0,
+        retry_max: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.aiodb = aiodb
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.clock = clock
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.expired = 0
+
+        OutboxMessage.bind(aiodb.database)
+        with aiodb.database.connection_context():
+            OutboxMessage.create_table(safe=True)
+
+    @property
+    def wakeup(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def _insert(self, body: bytes, expires_at: Optional[float]) -> int:
+        return OutboxMessage.insert(body=body, expires_at=expires_at).execute()
+
+    async def put(self, body: bytes, expiration: Optional[int] = None) -> int:
+        """Queue `body` for delivery. `expiration` is the TTL in milliseconds."""
+        expires_at = None
+        if expiration is not None:
+            expires_at = self.clock() + expiration / 1000
+        message_id = await self.aiodb.write(self._insert, body, expires_at)
+        self.wakeup.set()
+        return message_id
+
+    def _drop_expired(self, now: float) -> int:
+        return (
+            OutboxMessage.delete()
+            .where(OutboxMessage.expires_at.is_null(False))
+            .where(OutboxMessage.expires_at <= now)
+            .execute()
+        )
+
+    def _due(self, now: float) -> List[OutboxMessage]:
+        return list(
+            OutboxMessage.select()
+            .where(OutboxMessage.next_attempt <= now)
+            .order_by(OutboxMessage.id)
+            .limit(self.batch_size)
+        )
+
+    def _next_attempt(self) -> Optional[float]:
+        return OutboxMessage.select(peewee.fn.MIN(OutboxMessage.next_attempt)).scalar()
+
+    def _delete(self, ids: List[int]):
+        OutboxMessage.delete().where(OutboxMessage.id.in_(ids)).execute()
+
+    def _reschedule(self, messages: List[OutboxMessage], now: float):
+        for message in messages:
+            delay = min(self.retry_max, self.retry_min * 2**message.attempts)
+            OutboxMessage.update(
+                attempts=OutboxMessage.attempts + 1, next_attempt=now + delay
+            ).where(OutboxMessage.id == message.id).execute()
+
+    async def _send(self, message: OutboxMessage, now: float):
+        expiration = None
+        if message.expires_at is not None:
+            expiration = max(1, int((message.expires_at - now) * 1000))
+        await self.publisher.publish(bytes(message.body), expiration=expiration)
+
+    async def flush(self) -> int:
+        """
+        Send one batch of due messages. Returns the number of messages sent.
+        """
+        now = self.clock()
+        expired = await self.aiodb.write(self._drop_expired, now)
+        if expired:
+            logger.warning(f"Dropped {expired} expired outbox message(s)")
+            self.expired += expired
+
+        batch = await self.aiodb.read(self._due, now)
+        if not batch:
+            return 0
+
+        try:
+            await self.publisher.connect()
+        except ConnectionError as e:
+            logger.warning(f"Outbox relay can't reach the broker: {e}")
+            await self.aiodb.write(self._reschedule, batch, self.clock())
+            return 0
+
+        # Confirms are pipelined by the publisher, so send the batch at once
+        results = await asyncio.gather(
+            *(self._send(message, now) for message in batch), return_exceptions=True
+        )
+        sent, failed = [], []
+        for message, res in zip(batch, results):
+            if isinstance(res, BaseException):
+                if not isinstance(res, (ConnectionError, PublishError)):
+                    logger.opt(exception=res).error("Outbox publish failed")
+                failed.append(message)
+            else:
+                sent.append(message.id)
+
+        if sent:
+            await self.aiodb.write(self._delete, sent)
+            self.sent += len(sent)
+        if failed:
+            logger.warning(f"Failed to send {len(failed)} outbox message(s)")
+            await self.aiodb.write(self._reschedule, failed, self.clock())
+
+        return len(sent)
+
+    async def relay(self):
+        """Background task: drain the outbox until cancelled."""
+        while True:
+            self.wakeup.clear()
+            try:
+                while await self.flush() == self.batch_size:
+                    pass
+                next_attempt = await self.aiodb.read(self._next_attempt)
+            except Exception:
+                logger.exception("Outbox relay failed")
+                next_attempt = None
+
+            timeout = self.poll_interval
+            if next_attempt is not None:
+                timeout = min(timeout, max(0.0, next_attempt - self.clock()))
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
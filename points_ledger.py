@@ -0,0 +1,106 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import aiohttp
+from loguru import logger
+
+
+class Balance:
+    __slots__ = ("points", "fetched_at")
+
+    def __init__(self, points: int, fetched_at: float):
+        self.points = points
+        self.fetched_at = fetched_at
+
+
+class PointsLedger:
+    """
+    Local view of Streamlabs loyalty points. Balances are cached for `ttl`
+    seconds; debits are applied to the cached balance right away and sent to
+    Streamlabs in the background. Everything that reads and changes one
+    user's balance runs under that user's lock, so two commands from the same
+    user can't spend the same points twice.
+
+    `fetch(user)` returns the balance, `subtract(user, points)` spends points.
+    """
+
+    retries = 3
+    retry_delay = 5.0
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[int]],
+        subtract: Callable[[str, int], Awaitable],
+        ttl: float = 60,
+    ):
+        self.fetch = fetch
+        self.subtract = subtract
+        self.ttl = ttl
+        self.balances: Dict[str, Balance] = {}
+        # debits not yet confirmed by Streamlabs
+        self.pending: Dict[str, int] = defaultdict(int)
+        self.locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def _balance(self, user: str) -> int:
+        entry = self.balances.get(user)
+        if entry is None or time.monotonic() - entry.fetched_at > self.ttl:
+            points = await self.fetch(user)
+            # the server hasn't seen our pending debits yet
+            points = max(0, points - self.pending.get(user, 0))
+            entry = self.balances[user] = Balance(points, time.monotonic())
+        return entry.points
+
+    async def balance(self, user: str) -> int:
+        user = user.lower()
+        async with self.locks[user]:
+            return await self._balance(user)
+
+    async def debit(self, user: str, points: int) -> Optional[int]:
+        """
+        Spend `points` if the user has enough of them. Returns the remaining
+        balance, or None when there are not enough points.
+        """
+        user = user.lower()
+        async with self.locks[user]:
+            balance = await self._balance(user)
+            if balance < points:
+                return None
+
+            self.balances[user].points = balance - points
+            self.pending[user] += points
+            task = asyncio.ensure_future(self._send(user, points))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            return balance - points
+
+    async def _send(self, user: str, points: int):
+        try:
+            for attempt in range(self.retries):
+                try:
+                    await self.subtract(user, points)
+                    return
+                except aiohttp.ClientResponseError as e:
+                    if e.status < 500:
+                        logger.error(
+                            f"Streamlabs refused to take {points} from {user}: {e}"
+                        )
+                        break
+                    logger.warning(f"Failed to take {points} from {user}: {e}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Failed to take {points} from {user}: {e}")
+                if attempt + 1 < self.retries:
+                    await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+            # our local balance is wrong now, get the real one next time
+            self.balances.pop(user, None)
+        finally:
+            self.pending[user] -= points
+            if self.pending[user] <= 0:
+                del self.pending[user]
+
+    async def close(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -0,0 +1,116 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from loguru import logger
+
+from aio_timer import Timer
+
+FULFILLED = "FULFILLED"
+CANCELED = "CANCELED"
+
+
+class RedemptionUpdater:
+    """
+    Collects redemption outcomes and sends them in batches: one call per
+    (reward, status) pair with up to `max_batch` redemption ids, flushed
+    `delay` seconds after the first outcome or as soon as a batch is full.
+
+    `send(reward_id, status, ids)` does the actual Helix call. Rewards that
+    Helix refuses to update (not created by our client id) are remembered and
+    skipped. A 401 means the token lacks channel:manage:redemptions, the batch
+    is dropped. Other failures are retried once on the next flush.
+    """
+
+    max_batch = 50
+
+    def __init__(
+        self,
+        send: Callable[[str, str, List[str]], Awaitable],
+        delay: float = 2.0,
+    ):
+        self.send = send
+        self.delay = delay
+        # (reward_id, status) -> [(redemption_id, attempt)]
+        self.pending: Dict[Tuple[str, str], List[Tuple[str, int]]] = defaultdict(list)
+        self.unmanaged: Set[str] = set()
+        self.timer: Optional[Timer] = None
+        self.calls = 0
+        self.updated = 0
+
+    def update(self, reward_id: str, redemption_id: str, status: str):
+        if reward_id in self.unmanaged:
+            return
+
+        batch = self.pending[(reward_id, status)]
+        batch.append((redemption_id, 0))
+        if len(batch) >= self.max_batch:
+            asyncio.ensure_future(self.flush())
+        else:
+            self._arm()
+
+    def _arm(self):
+        if self.timer is None:
+            self.timer = Timer(self.delay, self._on_timer, asyncio.get_running_loop())
+
+    async def _on_timer(self):
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        pending, self.pending = self.pending, defaultdict(list)
+        retry = []
+        for (reward_id, status), items in pending.items():
+            for i in range(0, len(items), self.max_batch):
+                chunk = items[i : i + self.max_batch]
+                if not await self._send(reward_id, status, chunk):
+                    retry.extend(
+                        (reward_id, status, item) for item in chunk if item[1] == 0
+                    )
+
+        for reward_id, status, (redemption_id, attempt) in retry:
+            self.pending[(reward_id, status)].append((redemption_id, attempt + 1))
+        if self.pending:
+            self._arm()
+
+    async def _send(self, reward_id: str, status: str, chunk) -> bool:
+        if reward_id in self.unmanaged:
+            return True
+
+        self.calls += 1
+        try:
+            await self.send(reward_id, status, [item[0] for item in chunk])
+        except aiohttp.ClientResponseError as e:
+            if e.status == 401:
+                # HelixClient has already retried with a refreshed token
+                logger.error(
+                    f"Not allowed to mark redemptions {status}: the Twitch token "
+                    f"needs the channel:manage:redemptions scope, re-authorize it"
+                )
+                return True
+            if e.status in (403, 404):
+                logger.warning(
+                    f"Can't update redemptions of reward {reward_id} ({e.status}), "
+                    f"it was probably created outside of this app"
+                )
+                self.unmanaged.add(reward_id)
+                return True
+            logger.warning(f"Failed to mark redemptions {status}: {e}")
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to mark redemptions {status}: {e}")
+            return False
+
+        self.updated += len(chunk)
+        return True
+
+    async def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        await self.flush()
+        # don't leave a retry timer behind
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
@@ -0,0 +1,197 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+# Used when config.py has no channel_rewards
+DEFAULT_REWARDS: Dict[str, dict] = {
+    "Смена голоса на 1 минуту": {"effect": "voicemod"},
+    "Обнять стримера": {
+        "event": "hugs",
+        "message": "{requestor} обнял стримера! Спасибо, {requestor}!",
+    },
+    "Ничего": {"sound": "my_sound\\nothing0.mp3", "event": "nothing"},
+    "Дизайнерское Ничего": {
+        "sound": "my_sound\\designer_nothing0.mp3",
+        "event": "nihil",
+    },
+    "Эксклюзивное Ничего, pro edition": {
+        "sound": "my_sound\\exclusive_nothing_pro.mp3",
+        "event": "nihil",
+    },
+    "Стримлер! Не горбись!": {"sound": "my_sound\\StraightenUp.mp3", "event": "sit"},
+    "Распылить упорин": {
+        "sound": [
+            "sound\\Minion General Speech@ignore@" + s + ".mp3"
+            for s in (
+                "Nice01",
+                "Nice02",
+                "ThatWasFun01",
+                "ThatWasFun02",
+                "ThatWasFun03",
+            )
+        ],
+        "event": "fun",
+        "effect": "disco",
+    },
+    "Гори!": {
+        "sound": [
+            "sound\\Minion General Speech@ignore@" + s + ".mp3"
+            for s in ("Goblin_Burn_1", "Minion_BurnBurn", "Minion_FireNoHurt")
+        ]
+    },
+    "Лисо-Флешкино безумие": {"sound": "my_sound\\FoxFlashMadness.mp3"},
+    "Ты всё испортил!": {"sound": "my_sound\\fail.mp3"},
+}
+
+
+class Reward(NamedTuple):
+    title: str
+    # sound to play, or a tuple of sounds to pick one from
+    sound: Optional[Tuple[str, ...]] = None
+    # dashboard event type
+    event: Optional[str] = None
+    # name of a timed effect to start
+    effect: Optional[str] = None
+    # chat message, "{requestor}" is replaced with the viewer's name
+    message: Optional[str] = None
+    # minimal interval between two runs, in seconds
+    cooldown: float = 0.0
+    concurrency: int = 1
+    # redemptions waiting for a worker; more are dropped
+    queue_size: int = 10
+
+
+def compile_rewards(table: Dict[str, dict]) -> Dict[str, Reward]:
+    rewards = {}
+    for title, spec in table.items():
+        unknown = set(spec) - set(Reward._fields)
+        if unknown:
+            raise ValueError(f"Unknown reward options for {title}: {unknown}")
+
+        spec = dict(spec)
+        sound = spec.get("sound")
+        if isinstance(sound, str):
+            spec["sound"] = (sound,)
+        elif sound is not None:
+            spec["sound"] = tuple(sound)
+        if spec.get("concurrency", 1) < 1:
+            raise ValueError(f"Reward {title} needs at least one worker")
+
+        rewards[title] = Reward(title=title, **spec)
+
+    return rewards
+
+
+Handler = Callable[..., Awaitable]
+
+
+class RewardWorker:
+    """Bounded queue and worker tasks of a single reward"""
+
+    def __init__(self, reward: Reward, handler: Handler):
+        self.reward = reward
+        self.handler = handler
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.last_start = float("-inf")
+
+        self.count = 0
+        self.errors = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.wait = 0.0
+        self.total = 0.0
+        self.max = 0.0
+
+    def submit(self, *args) -> bool:
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.reward.queue_size)
+            self.tasks = [
+                asyncio.ensure_future(self._work())
+                for _ in range(self.reward.concurrency)
+            ]
+
+        try:
+            self.queue.put_nowait((time.monotonic(), args))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Reward {self.reward.title} queue is full, dropping")
+            return False
+
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    async def _work(self):
+        while True:
+            queued, args = await self.queue.get()
+            try:
+                # Reserve the slot before sleeping so that parallel workers
+                # keep the cooldown between each other too
+                now = time.monotonic()
+                self.last_start = max(now, self.last_start + self.reward.cooldown)
+                if self.last_start > now:
+                    await asyncio.sleep(self.last_start - now)
+
+                start = time.monotonic()
+                try:
+                    await self.handler(self.reward, *args)
+                except Exception:
+                    self.errors += 1
+                    logger.exception(f"Reward {self.reward.title} failed")
+
+                duration = time.monotonic() - start
+                self.count += 1
+                self.wait += start - queued
+                self.total += duration
+                self.max = max(self.max, duration)
+            finally:
+                self.queue.task_done()
+
+    def get_stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_depth,
+            "count": self.count,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "avg_wait_ms": self.wait / self.count * 1000 if self.count else 0.0,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        self.queue = None
+
+
+class RewardDispatcher:
+    """
+    Maps reward titles to their workers; `handler(reward, *args)` does the
+    actual work and runs in the reward's own worker tasks, so a slow reward
+    only holds up its own queue.
+    """
+
+    def __init__(self, table: Dict[str, dict], handler: Handler):
+        self.workers = {
+            title: RewardWorker(reward, handler)
+            for title, reward in compile_rewards(table).items()
+        }
+
+    def dispatch(self, title: str, *args) -> bool:
+        worker = self.workers.get(title)
+        if worker is None:
+            logger.debug(f"No handler for reward {title}")
+            return False
+
+        return worker.submit(*args)
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {title: w.get_stats() for title, w in self.workers.items()}
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.cancel()
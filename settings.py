@@ -0,0 +1,23 @@
+"""
+Optional config.py settings. An older config.py may lack settings added
+later; these helpers leave the defaults to the code that owns them.
+"""
+
+import config
+
+
+def get(name: str, default=None):
+    return getattr(config, name, default)
+
+
+def options(**names: str) -> dict:
+    """
+    Keyword arguments from config.py settings, `keyword="setting_name"`.
+    Settings missing from config.py are left out, so the callee's defaults
+    apply.
+    """
+    return {
+        keyword: getattr(config, name)
+        for keyword, name in names.items()
+        if hasattr(config, name)
+    }
@@ -0,0 +1,168 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from aio_timer import Timer
+
+# event type -> fields copied from the Streamlabs message to the dashboard
+EVENT_FIELDS = {
+    "donation": ("from", "message", "formatted_amount"),
+    "follow": ("name",),
+    "subscription": ("name", "months", "message", "sub_plan", "sub_type"),
+    "resub": ("name", "months", "streak_months", "message", "sub_plan"),
+    "host": ("name", "viewers"),
+    "bits": ("name", "amount", "message"),
+    "raid": ("name", "raiders"),
+}
+SUBGIFT_FIELDS = EVENT_FIELDS["subscription"] + ("gifter_display_name",)
+IGNORED_EVENTS = frozenset(
+    ("alertPlaying", "streamlabels", "streamlabels.underlying", "subscription-playing")
+)
+
+
+def normalise(data: dict) -> List[Tuple[Optional[str], dict]]:
+    """
+    Split a Streamlabs socket event into dashboard events, each paired with
+    the key used to recognise redeliveries (None if the event has no id).
+    """
+    event_type = data.get("type")
+    if event_type in IGNORED_EVENTS:
+        return []
+    if event_type not in EVENT_FIELDS:
+        logger.warning(f"Unknown SL event type: {data}")
+        return []
+
+    messages = data.get("message")
+    if not isinstance(messages, list):
+        messages = [messages]
+
+    events = []
+    for i, message in enumerate(messages):
+        fields = EVENT_FIELDS[event_type]
+        if event_type == "subscription" and message.get("sub_type") == "subgift":
+            fields = SUBGIFT_FIELDS
+
+        event = {"type": event_type}
+        for field in fields:
+            if field in message:
+                event[field] = message[field]
+            else:
+                logger.warning(f"Event {event_type} missing key {field}")
+                event[field] = "UNKNOWN"
+
+        if "_id" in message:
+            key = message["_id"]
+        elif "event_id" in data:
+            key = f"{data['event_id']}:{i}"
+        else:
+            key = None
+        events.append((key, event))
+
+    return events
+
+
+class EventPipeline:
+    """
+    Streamlabs socket events on their way to the dashboard. Events are
+    normalised, redeliveries are dropped, gifted subs from one gifter that
+    arrive within `coalesce_window` seconds are merged into one "subgifts"
+    event, and the rest waits in a queue of `maxsize` events for `emit`.
+    When the dashboard can't keep up the oldest queued event is dropped.
+    """
+
+    seen_size = 1000
+
+    def __init__(
+        self,
+        emit: Callable[[dict], Awaitable],
+        maxsize: int = 100,
+        coalesce_window: float = 2.0,
+    ):
+        self.emit = emit
+        self.coalesce_window = coalesce_window
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        # (gifter, plan) -> gift events collected so far
+        self.gifts: Dict[Tuple[str, str], List[dict]] = {}
+        self.gift_timers: Dict[Tuple[str, str], Timer] = {}
+        self.stats = {"emitted": 0, "duplicates": 0, "coalesced": 0, "dropped": 0}
+
+    def put(self, data: dict):
+        logger.info(f'SL event: {data.get("type")}')
+        for key, event in normalise(data):
+            if key is not None:
+                if key in self.seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                self.seen[key] = None
+                if len(self.seen) > self.seen_size:
+                    self.seen.popitem(last=False)
+
+            if event.get("sub_type") == "subgift":
+                self._add_gift(event)
+            else:
+                self._enqueue(event)
+
+    def _add_gift(self, event: dict):
+        group = (event["gifter_display_name"], event["sub_plan"])
+        self.gifts.setdefault(group, []).append(event)
+        if group not in self.gift_timers:
+            self.gift_timers[group] = Timer(
+                self.coalesce_window,
+                lambda: self._flush_gifts(group),
+                asyncio.get_running_loop(),
+            )
+
+    async def _flush_gifts(self, group: Tuple[str, str]):
+        self.gift_timers.pop(group, None)
+        gifts = self.gifts.pop(group, [])
+        if len(gifts) == 1:
+            self._enqueue(gifts[0])
+        elif gifts:
+            self.stats["coalesced"] += len(gifts) - 1
+            gifter, plan = group
+            self._enqueue(
+                {
+                    "type": "subgifts",
+                    "gifter_display_name": gifter,
+                    "sub_plan": plan,
+                    "count": len(gifts),
+                    "names": [gift["name"] for gift in gifts],
+                }
+            )
+
+    def _enqueue(self, event: dict):
+        if self.queue.full():
+            dropped = self.queue.get_nowait()
+            self.queue.task_done()
+            self.stats["dropped"] += 1
+            logger.warning(f"Dashboard is lagging, dropped SL event {dropped}")
+        self.queue.put_nowait(event)
+
+    async def run(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.emit(event)
+                self.stats["emitted"] += 1
+            except Exception as e:
+                logger.error(f"Failed to send SL event to dashboard: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def close(self, timeout: float = 5.0):
+        """
+        Flush the gifts still being coalesced and wait up to `timeout` seconds
+        for run() to emit everything queued
+        """
+        for timer in self.gift_timers.values():
+            timer.cancel()
+        for group in list(self.gifts):
+            await self._flush_gifts(group)
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.queue.qsize()} SL events not sent to dashboard")
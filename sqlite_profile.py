@@ -0,0 +1,132 @@
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, Iterable, Optional, Type
+
+import peewee
+from loguru import logger
+
+# Named sets of PRAGMAs applied by peewee to every new connection.
+# "default" keeps SQLite's stock behaviour (rollback journal, synchronous=FULL),
+# "performance" is what the bot uses: WAL lets readers run next to the writer and
+# synchronous=NORMAL only fsyncs on checkpoints, which is safe in WAL mode.
+PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "performance": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16 * 1024,  # negative value is in KiB, i.e. 16 MiB
+        "temp_store": "memory",
+        "busy_timeout": 5000,  # ms
+    },
+}
+
+
+def get_pragmas(profile: str = "performance", overrides: Optional[dict] = None):
+    try:
+        pragmas = dict(PROFILES[profile])
+    except KeyError:
+        raise ValueError(
+            f"Unknown database profile {profile}, known profiles: "
+            f"{','.join(PROFILES.keys())}"
+        )
+
+    if overrides:
+        pragmas.update(overrides)
+
+    return pragmas
+
+
+def open_database(
+    path: str, profile: str = "performance", overrides: Optional[dict] = None
+) -> peewee.SqliteDatabase:
+    pragmas = get_pragmas(profile, overrides)
+    # sqlite3 module has its own busy handler, keep it in sync with the pragma
+    timeout = pragmas.get("busy_timeout", 5000) / 1000
+    return peewee.SqliteDatabase(path, pragmas=pragmas, timeout=timeout)
+
+
+def check_indexes(
+    database: peewee.SqliteDatabase, models: Iterable[Type[peewee.Model]]
+):
+    """
+    Make sure every index declared on the models exists in the database file.
+    Missing indexes are logged and created, missing tables are only logged.
+    Returns the list of created index names.
+    """
+    created = []
+    for model in models:
+        table = model._meta.table_name
+        if not database.table_exists(table):
+            logger.error(f"Table {table} does not exist!")
+            continue
+
+        existing = {tuple(idx.columns) for idx in database.get_indexes(table)}
+
+        if isinstance(model._meta.primary_key, peewee.CompositeKey):
+            pk = tuple(
+                model._meta.fields[name].column_name
+                for name in model._meta.primary_key.field_names
+            )
+            if pk not in existing:
+                logger.error(f"Table {table} has no primary key index on {pk}!")
+
+        missing = []
+        for index in model._meta.fields_to_index():
+            columns = tuple(
+                getattr(expr, "column_name", str(expr)) for expr in index._expressions
+            )
+            if columns not in existing:
+                missing.append(index._name)
+
+        if missing:
+            logger.warning(f"Table {table} is missing indexes: {', '.join(missing)}")
+            model._schema.create_indexes(safe=True)
+            created.extend(missing)
+
+    return created
+
+
+def bench_commits(database: peewee.SqliteDatabase, count: int = 500):
+    database.execute_sql(
+        "CREATE TABLE IF NOT EXISTS bench (k TEXT PRIMARY KEY, v INTEGER NOT NULL)"
+    )
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        with database.atomic():
+            database.execute_sql(
+                "INSERT INTO bench (k, v) VALUES (?, 1) "
+                "ON CONFLICT(k) DO UPDATE SET v = v + 1",
+                (f"user{i % 50}",),
+            )
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return {
+        "median": statistics.median(timings) * 1000,
+        "p95": timings[int(len(timings) * 0.95)] * 1000,
+        "total": sum(timings) * 1000,
+    }
+
+
+def main():
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in PROFILES:
+            database = open_database(os.path.join(tmpdir, f"{profile}.db"), profile)
+            database.connect()
+            res = bench_commits(database, count)
+            database.close()
+            print(
+                f"{profile:>12}: {count} commits, median {res['median']:.3f} ms, "
+                f"p95 {res['p95']:.3f} ms, total {res['total']:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from array import array
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+
+class StreamSample(NamedTuple):
+    timestamp: float
+    live: bool
+    viewers: int
+    started_at: Optional[str]
+    title: str
+    game: str
+
+
+class ViewerSeries:
+    """
+    (timestamp, viewers) time series in two flat arrays. Samples older than
+    `recent_window` seconds are averaged into `bucket`-second buckets, so a
+    long stream keeps full resolution only for the last part.
+    """
+
+    def __init__(self, recent_window: float = 3600, bucket: float = 300):
+        self.recent_window = recent_window
+        self.bucket = bucket
+        self.times = array("d")
+        self.viewers = array("l")
+        self.coarse_times = array("d")
+        self.coarse_viewers = array("l")
+
+    def __len__(self):
+        return len(self.times) + len(self.coarse_times)
+
+    def add(self, timestamp: float, viewers: int):
+        self.times.append(timestamp)
+        self.viewers.append(viewers)
+        self._downsample(timestamp - self.recent_window)
+
+    def _downsample(self, cutoff: float):
+        # only whole buckets that ended before the cutoff
+        while self.times:
+            start = self.times[0] - self.times[0] % self.bucket
+            if start + self.bucket > cutoff:
+                break
+
+            count = 0
+            while count < len(self.times) and self.times[count] < start + self.bucket:
+                count += 1
+            total = sum(self.viewers[:count])
+            self.coarse_times.append(start)
+            self.coarse_viewers.append(round(total / count))
+            del self.times[:count]
+            del self.viewers[:count]
+
+    def points(self) -> List[Tuple[float, int]]:
+        return list(zip(self.coarse_times, self.coarse_viewers)) + list(
+            zip(self.times, self.viewers)
+        )
+
+    def clear(self):
+        for a in (self.times, self.viewers, self.coarse_times, self.coarse_viewers):
+            del a[:]
+
+
+class StreamSampler:
+    """
+    Polls the stream every `interval` seconds. `fetch()` returns the Helix
+    stream object or None while offline. The latest sample is kept in
+    `latest`, viewer counts go to `series` (reset when a new stream starts),
+    and every sample is passed to `on_sample`.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Optional[dict]]],
+        on_sample: Optional[Callable[[StreamSample], None]] = None,
+        interval: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetch = fetch
+        self.on_sample = on_sample
+        self.interval = interval
+        self.clock = clock
+        self.latest: Optional[StreamSample] = None
+        self.series = ViewerSeries()
+
+    async def sample(self) -> StreamSample:
+        stream = await self.fetch()
+        now = self.clock()
+        if stream is None:
+            sample = StreamSample(now, False, 0, None, "", "")
+        else:
+            sample = StreamSample(
+                now,
+                True,
+                int(stream["viewer_count"]),
+                stream["started_at"],
+                stream["title"],
+                stream["game_name"],
+            )
+            if self.latest is not None and self.latest.started_at != sample.started_at:
+                self.series.clear()
+            self.series.add(now, sample.viewers)
+
+        self.latest = sample
+        if self.on_sample is not None:
+            self.on_sample(sample)
+        return sample
+
+    async def run(self):
+        while True:
+            try:
+                await self.sample()
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                logger.warning(f"Failed to sample stream: {e}")
+            await asyncio.sleep(self.interval)
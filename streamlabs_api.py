@@ -1,13 +1,21 @@
 #!python3
 # -*- coding: utf-8 -*-
 import requests
+
+import aio_http
 import json as simplejson
 from requests_oauthlib import OAuth2Session
 import webbrowser
 
+TOKEN_FILE = "streamlabs_token.json"
+TOKEN_URL = "https://streamlabs.com/api/v1.0/token"
+POINTS_URL = "https://streamlabs.com/api/v1.0/points"
+SOCKET_TOKEN_URL = "https://streamlabs.com/api/v1.0/socket/token"
+WHEEL_SPIN_URL = "https://streamlabs.com/api/v1.0/wheel/spin"
+
 
 def token_saver(token):
-    with open("streamlabs_token.json", "w") as f:
+    with open(TOKEN_FILE, "w") as f:
         simplejson.dump(token, f)
 
 
@@ -29,7 +37,7 @@ def get_token(client_id, client_secret, redirect_uri):
 
     authorization_response = input("Enter the full callback URL").strip()
     token = oauth.fetch_token(
-        "https://streamlabs.com/api/v1.0/token",
+        TOKEN_URL,
         client_id=client_id,
         client_secret=client_secret,
         authorization_response=authorization_response,
@@ -41,7 +49,7 @@ def get_token(client_id, client_secret, redirect_uri):
 
 def get_streamlabs_session(client_id, client_secret, redirect_uri):
     try:
-        f = open("streamlabs_token.json", "r")
+        f = open(TOKEN_FILE, "r")
         token = simplejson.load(f)
     except (OSError, simplejson.JSONDecodeError):
         print("Failed to load token!")
@@ -57,7 +65,7 @@ def get_streamlabs_session(client_id, client_secret, redirect_uri):
     oauth = OAuth2Session(
         client_id,
         token=token,
-        auto_refresh_url="https://streamlabs.com/api/v1.0/token",
+        auto_refresh_url=TOKEN_URL,
         auto_refresh_kwargs={"client_id": client_id, "client_secret": client_secret},
         redirect_uri=redirect_uri,
         scope=scope,
@@ -69,7 +77,7 @@ def get_streamlabs_session(client_id, client_secret, redirect_uri):
 
 def get_points(oauth, username, channel="iarspider"):
     r = oauth.get(
-        "https://streamlabs.com/api/v1.0/points",
+        POINTS_URL,
         params=dict(username=username, channel=channel),
     )
     r.raise_for_status()
@@ -78,7 +86,7 @@ def get_points(oauth, username, channel="iarspider"):
 
 def sub_points(oauth, username, points, channel="iarspider"):
     r = oauth.post(
-        "https://streamlabs.com/api/v1.0/points/subtract",
+        POINTS_URL + "/subtract",
         data=dict(username=username, channel=channel, points=points),
     )
     r.raise_for_status()
@@ -90,15 +98,6 @@ def roll_credits(oauth):
     r.raise_for_status()
 
 
-def get_socket_token(oauth):
-    r = requests.get(
-        "https://streamlabs.com/api/v1.0/socket/token?access_token="
-        + oauth.access_token
-    )
-    r.raise_for_status()
-    return r.json()["socket_token"]
-
-
 def main():
     from config import (
         streamlabs_client_id,
@@ -128,8 +127,9 @@ def main():
 
     pprint(points)
     r = requests.get(
-        "https://streamlabs.com/api/v1.0/socket/token?access_token="
-        + oauth.access_token
+        SOCKET_TOKEN_URL,
+        params={"access_token": oauth.access_token},
+        timeout=aio_http.REQUESTS_TIMEOUT,
     )
     # r.raise_for_status()
     print(r.json())
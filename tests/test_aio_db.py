@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+import peewee
+
+from aio_db import AsyncDatabase
+from sqlite_profile import open_database
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = open_database(os.path.join(self.tmpdir.name, "test.db"))
+
+        class Counter(peewee.Model):
+            name = peewee.CharField(primary_key=True)
+            value = peewee.IntegerField(default=0)
+
+            class Meta:
+                database = self.database
+
+        self.Counter = Counter
+        self.database.create_tables([Counter])
+        self.database.close()
+        self.aiodb = AsyncDatabase(self.database)
+
+    async def asyncTearDown(self):
+        await self.aiodb.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def increment(self, name):
+        self.Counter.insert(name=name, value=1).on_conflict(
+            conflict_target=[self.Counter.name],
+            update={self.Counter.value: self.Counter.value + 1},
+        ).execute()
+        return threading.current_thread().name
+
+    def get_value(self, name):
+        return self.Counter.get(self.Counter.name == name).value
+
+    async def test_writes_run_on_writer_thread(self):
+        thread = await self.aiodb.write(self.increment, "a")
+        self.assertEqual(thread, "db-writer")
+        self.assertEqual(await self.aiodb.read(self.get_value, "a"), 1)
+
+    async def test_concurrent_writes_are_batched(self):
+        await asyncio.gather(
+            *(self.aiodb.write(self.increment, "b") for _ in range(20))
+        )
+        self.assertEqual(await self.aiodb.read(self.get_value, "b"), 20)
+        stats = self.aiodb.get_stats()
+        self.assertLess(stats["batches"], 20)
+        self.assertEqual(stats["queries"][self.increment.__qualname__]["count"], 20)
+
+    async def test_failed_write_does_not_roll_back_batch(self):
+        def fail():
+            self.increment("c")
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            self.aiodb.write(self.increment, "c"),
+            self.aiodb.write(fail),
+            self.aiodb.write(self.increment, "c"),
+            return_exceptions=True,
+        )
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(await self.aiodb.read(self.get_value, "c"), 2)
+        stats = self.aiodb.get_stats()
+        self.assertEqual(stats["queries"][fail.__qualname__]["errors"], 1)
+
+    async def test_read_errors_propagate(self):
+        with self.assertRaises(self.Counter.DoesNotExist):
+            await self.aiodb.read(self.get_value, "missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+import aio_http
+
+
+class TestRequest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+        self.statuses = []
+        self.delay = 0
+        app = web.Application()
+        app.router.add_route("*", "/", self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/"
+        self.old_base = aio_http.RETRY_BASE
+        aio_http.RETRY_BASE = 0.001
+
+    async def asyncTearDown(self):
+        aio_http.RETRY_BASE = self.old_base
+        aio_http._breakers.clear()
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+
+    async def handler(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return web.Response(status=status, text="ok")
+
+    async def test_idempotent_requests_are_retried(self):
+        self.statuses = [503, 502]
+        async with aio_http.request("test", "GET", self.url) as r:
+            self.assertEqual(r.status, 200)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(aio_http.metrics()["test"]["errors"], 2)
+
+    async def test_post_is_not_retried(self):
+        self.statuses = [503]
+        async with aio_http.request("test", "POST", self.url) as r:
+            self.assertEqual(r.status, 503)
+        self.assertEqual(self.calls, 1)
+
+    async def test_breaker_opens_and_recovers(self):
+        breaker = aio_http.get_breaker("test")
+        breaker.threshold = 2
+        self.statuses = [500, 500]
+        async with aio_http.request("test", "GET", self.url, retries=1) as r:
+            self.assertEqual(r.status, 500)
+        self.assertEqual(breaker.state, breaker.OPEN)
+
+        with self.assertRaises(aiohttp.ClientError):
+            async with aio_http.request("test", "GET", self.url):
+                pass
+        self.assertEqual(self.calls, 2)
+
+        breaker.reset_timeout = 0
+        async with aio_http.request("test", "GET", self.url) as r:
+            self.assertEqual(r.status, 200)
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(aio_http.metrics()["test"]["rejected"], 1)
+
+    async def test_cancelled_trial_does_not_wedge_breaker(self):
+        breaker = aio_http.get_breaker("test")
+        breaker.state = breaker.OPEN
+        breaker.reset_timeout = 0
+        self.delay = 1
+
+        async def call():
+            async with aio_http.request("test", "GET", self.url):
+                pass
+
+        task = asyncio.ensure_future(call())
+        await asyncio.sleep(0.05)
+        self.assertTrue(breaker.trial_running)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertFalse(breaker.trial_running)
+
+        self.delay = 0
+        await call()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import pika.spec
+
+from amqp_publisher import AMQPPublisher, PublishError
+
+
+class FakeBroker:
+    """In-process stand-in for RabbitMQ speaking the AsyncioConnection API"""
+
+    def __init__(self):
+        self.up = True
+        self.nack = False
+        self.hang = 0
+        self.open_delay = 0
+        self.close_delay = 0
+        self.connections = []
+        self.declared = []
+        self.messages = []
+
+    def connect(self, on_open, on_open_error, on_close):
+        connection = FakeConnection(self, on_close)
+        self.connections.append(connection)
+        loop = asyncio.get_running_loop()
+        if self.hang:
+            self.hang -= 1
+        elif self.up:
+            loop.call_later(self.open_delay, connection.opened, on_open)
+        else:
+            loop.call_soon(on_open_error, connection, OSError("connection refused"))
+        return connection
+
+    def drop(self):
+        for connection in self.connections:
+            if connection.is_open:
+                connection.close()
+
+
+class FakeConnection:
+    def __init__(self, broker, on_close):
+        self.broker = broker
+        self.on_close = on_close
+        self.is_open = False
+        self.closed = False
+
+    def opened(self, on_open):
+        if not self.closed:
+            self.is_open = True
+            on_open(self)
+
+    def channel(self, on_open_callback):
+        channel = FakeChannel(self)
+        asyncio.get_running_loop().call_soon(on_open_callback, channel)
+
+    def close(self):
+        self.is_open = False
+        self.closed = True
+        asyncio.get_running_loop().call_later(
+            self.broker.close_delay, self.on_close, self, "closed"
+        )
+
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.on_ack_nack = None
+        self.delivery_tag = 0
+
+    @property
+    def is_open(self):
+        return self.connection.is_open
+
+    def add_on_close_callback(self, callback):
+        pass
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self.on_ack_nack = ack_nack_callback
+        asyncio.get_running_loop().call_soon(callback, None)
+
+    def queue_declare(self, queue, durable, arguments, callback):
+        self.connection.broker.declared.append((queue, durable, arguments))
+        asyncio.get_running_loop().call_soon(callback, None)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        broker = self.connection.broker
+        self.delivery_tag += 1
+        if broker.nack:
+            method = pika.spec.Basic.Nack(delivery_tag=self.delivery_tag)
+        else:
+            broker.messages.append((routing_key, body, properties.expiration))
+            method = pika.spec.Basic.Ack(delivery_tag=self.delivery_tag)
+        asyncio.get_running_loop().call_soon(
+            self.on_ack_nack, SimpleNamespace(method=method)
+        )
+
+
+class TestAMQPPublisher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.publisher = AMQPPublisher(
+            None,
+            "discord",
+            {"x-message-ttl": 60000},
+            connection_factory=self.broker.connect,
+            connect_attempts=3,
+            max_backoff=0.01,
+        )
+
+    async def test_connects_lazily_and_declares_once(self):
+        self.assertEqual(self.broker.connections, [])
+
+        await self.publisher.publish(b"one", expiration=1000)
+        await self.publisher.publish(b"two")
+
+        self.assertEqual(len(self.broker.connections), 1)
+        self.assertEqual(
+            self.broker.declared, [("discord", True, {"x-message-ttl": 60000})]
+        )
+        self.assertEqual(
+            self.broker.messages,
+            [("discord", b"one", "1000"), ("discord", b"two", None)],
+        )
+
+    async def test_reconnects_after_drop(self):
+        await self.publisher.publish(b"one")
+        self.broker.drop()
+        await asyncio.sleep(0)
+
+        await self.publisher.publish(b"two")
+        self.assertEqual(len(self.broker.connections), 2)
+        self.assertEqual(len(self.broker.messages), 2)
+
+    async def test_broker_down(self):
+        self.broker.up = False
+        with self.assertRaises(ConnectionError):
+            await self.publisher.publish(b"one")
+        self.assertEqual(len(self.broker.connections), 3)
+
+        self.broker.up = True
+        await self.publisher.publish(b"two")
+        self.assertEqual(self.broker.messages, [("discord", b"two", None)])
+
+    async def test_connect_timeout_closes_pending_connection(self):
+        self.publisher.connect_timeout = 0.2
+        self.broker.hang = 1
+        self.broker.open_delay = 0.1
+        # the first connection reports closing while the second one is opening
+        self.broker.close_delay = 0.05
+
+        await self.publisher.publish(b"one")
+
+        self.assertEqual(len(self.broker.connections), 2)
+        self.assertTrue(self.broker.connections[0].closed)
+        self.assertEqual(self.broker.messages, [("discord", b"one", None)])
+
+    async def test_nack(self):
+        self.broker.nack = True
+        with self.assertRaises(PublishError):
+            await self.publisher.publish(b"one")
+
+    async def asyncTearDown(self):
+        await self.publisher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
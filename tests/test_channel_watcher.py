@@ -0,0 +1,45 @@
+import unittest
+
+from channel_watcher import ChannelInfo, ChannelWatcher, diff
+
+
+class TestChannelWatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.snapshot = ChannelInfo("Factorio", "Stream")
+        self.changes = []
+        self.watcher = ChannelWatcher(self.fetch, self.on_change)
+
+    async def fetch(self):
+        return self.snapshot
+
+    async def on_change(self, info, changed):
+        self.changes.append((info, changed))
+
+    def test_diff(self):
+        old = ChannelInfo("a", "b")
+        self.assertEqual(diff(None, old), {"game", "title"})
+        self.assertEqual(diff(old, ChannelInfo("a", "c")), {"title"})
+        self.assertEqual(diff(old, old), set())
+
+    async def test_only_changes_are_reported(self):
+        await self.watcher.poll()
+        await self.watcher.poll()
+        self.snapshot = ChannelInfo("Factorio", "Still factorio")
+        await self.watcher.poll()
+        await self.watcher.on_channel_update(
+            {"category_name": "Noita", "title": "Still factorio"}
+        )
+        self.assertEqual(
+            [changed for _, changed in self.changes],
+            [{"game", "title"}, {"title"}, {"game"}],
+        )
+        self.assertEqual(self.watcher.current.game, "Noita")
+
+    async def test_forced_poll(self):
+        await self.watcher.poll()
+        self.assertEqual(await self.watcher.poll(force=True), {"game", "title"})
+        self.assertEqual(len(self.changes), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from chatters import ChattersReconciler, Lurker, diff, fetch_chatters
+
+
+class FakeHelix:
+    def __init__(self, logins, page_size):
+        self.logins = logins
+        self.page_size = page_size
+        self.calls = []
+
+    async def request(self, method, path, params=None, json=None, priority=None):
+        self.calls.append(dict(params))
+        start = int(params.get("after", 0))
+        page = self.logins[start : start + self.page_size]
+        res = {
+            "data": [
+                {"user_id": str(i), "user_login": login, "user_name": login.upper()}
+                for i, login in enumerate(page, start)
+            ],
+            "pagination": {},
+        }
+        if start + self.page_size < len(self.logins):
+            res["pagination"]["cursor"] = str(start + self.page_size)
+        return res
+
+
+class TestChatters(unittest.IsolatedAsyncioTestCase):
+    async def test_fetch_all_pages(self):
+        helix = FakeHelix([f"user{i}" for i in range(5)], page_size=2)
+        chatters = await fetch_chatters(helix, "42")
+        self.assertEqual(len(chatters), 5)
+        self.assertEqual(chatters["user4"]["user_name"], "USER4")
+        self.assertEqual([c.get("after") for c in helix.calls], [None, "2", "4"])
+        self.assertEqual(helix.calls[0]["first"], 1000)
+
+    def test_diff(self):
+        self.assertEqual(diff({"a", "b"}, {"b", "c"}), ({"a"}, {"c"}))
+
+    async def test_reconcile_reports_only_changes(self):
+        registry = {"alice": Lurker("1", "alice", "Alice"), "ghost": None}
+        present = {"alice": {}, "bob": {"user_id": "2"}}
+        events = []
+
+        async def on_join(login, chatter):
+            events.append(("join", login))
+            registry[login] = chatter
+
+        async def on_part(login):
+            events.append(("part", login))
+            del registry[login]
+
+        async def fetch():
+            return present
+
+        reconciler = ChattersReconciler(
+            fetch, lambda: list(registry), on_join, on_part, min_interval=10
+        )
+        await reconciler.reconcile()
+        self.assertEqual(sorted(events), [("join", "bob"), ("part", "ghost")])
+
+        events.clear()
+        await reconciler.reconcile()
+        self.assertEqual(events, [])
+        self.assertEqual(reconciler.interval, 10)
+
+        present.update({f"user{i}": {} for i in range(2500)})
+        await reconciler.reconcile()
+        self.assertEqual(reconciler.interval, 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
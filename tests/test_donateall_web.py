@@ -0,0 +1,108 @@
+import json
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+import aio_http
+from donateall_web import DonateAllWeb
+
+
+class TestDonateAllWeb(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logins = 0
+        self.reads = 0
+        self.puts = []
+        self.settings = {
+            "musicSettings": {"isMusicEnabled": False},
+            "other": "mine",
+        }
+        self.fail_settings = False
+        self.fail_put = False
+
+        app = web.Application()
+        app.router.add_post("/authenticate", self.authenticate)
+        app.router.add_get("/account", self.account)
+        app.router.add_get("/user-chat-advance-settings", self.get_settings)
+        app.router.add_put("/user-chat-advance-settings", self.put_settings)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.web = DonateAllWeb("user", "pass", f"http://127.0.0.1:{port}/")
+
+    async def asyncTearDown(self):
+        aio_http._breakers.clear()
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+
+    async def authenticate(self, request):
+        self.logins += 1
+        return web.json_response({"id_token": "not.a.jwt"})
+
+    async def account(self, request):
+        return web.json_response({"login": "user"})
+
+    async def get_settings(self, request):
+        self.reads += 1
+        if self.fail_settings:
+            return web.Response(status=400)
+        return web.json_response([{"id": 7, "settings": json.dumps(self.settings)}])
+
+    async def put_settings(self, request):
+        if self.fail_put:
+            return web.Response(status=409)
+        doc = await request.json()
+        self.puts.append(doc)
+        self.settings = json.loads(doc["settings"])
+        return web.Response(status=200)
+
+    async def test_token_and_settings_are_cached(self):
+        self.assertTrue(await self.web.set_music(True))
+        self.assertTrue(await self.web.set_music(False))
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(self.reads, 1)
+        self.assertEqual(len(self.puts), 2)
+        self.assertEqual(self.settings["other"], "mine")
+
+    async def test_cached_no_op_is_confirmed(self):
+        await self.web.set_music(True)
+        # switched off elsewhere, the cache still says it's on
+        self.settings["musicSettings"]["isMusicEnabled"] = False
+        self.assertTrue(await self.web.set_music(True))
+        self.assertEqual(self.reads, 2)
+        self.assertEqual(len(self.puts), 2)
+
+        self.assertFalse(await self.web.set_music(True))
+        self.assertEqual(len(self.puts), 2)
+
+    async def test_expired_settings_are_read_again(self):
+        await self.web.set_music(True)
+        self.web.settings_deadline = 0
+        self.settings = {"musicSettings": {"isMusicEnabled": True}, "other": "new"}
+        self.assertTrue(await self.web.set_music(False))
+        self.assertEqual(self.reads, 2)
+        self.assertEqual(self.settings["other"], "new")
+
+    async def test_failed_put_drops_the_cache(self):
+        await self.web.set_music(True)
+        self.fail_put = True
+        self.assertIsNone(await self.web.set_music(False))
+        self.assertIsNone(self.web.settings)
+
+        self.fail_put = False
+        self.settings["other"] = "new"
+        self.assertTrue(await self.web.set_music(False))
+        self.assertEqual(self.settings["other"], "new")
+
+    async def test_failure_is_logged_not_raised(self):
+        self.fail_settings = True
+        self.assertIsNone(await self.web.set_music(True))
+        # the first failure forced a new login
+        self.assertEqual(self.logins, 2)
+        self.assertEqual(self.puts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
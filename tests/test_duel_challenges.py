@@ -0,0 +1,69 @@
+import unittest
+
+from duel_challenges import AddResult, ChallengeStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestChallengeStore(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = ChallengeStore(
+            ttl=60, max_per_attacker=2, max_per_defender=2, clock=self.clock
+        )
+
+    def test_add_and_pop(self):
+        self.assertEqual(
+            self.store.add("bob", "alice", "Bob", "Alice"), AddResult.ADDED
+        )
+        self.assertEqual(self.store.add("bob", "alice"), AddResult.EXISTS)
+        self.assertIsNone(self.store.pop("alice", "bob"))
+
+        challenge = self.store.pop("bob", "alice")
+        self.assertEqual(challenge.attacker_name, "Alice")
+        self.assertEqual(challenge.defender_name, "Bob")
+        self.assertIsNone(self.store.pop("bob", "alice"))
+        self.assertEqual(len(self.store), 0)
+
+    def test_limits(self):
+        self.store.add("bob", "alice")
+        self.store.add("carol", "alice")
+        self.assertEqual(self.store.add("dave", "alice"), AddResult.ATTACKER_LIMIT)
+
+        self.store.add("bob", "erin")
+        self.assertEqual(self.store.add("bob", "frank"), AddResult.DEFENDER_LIMIT)
+
+        self.store.pop("bob", "alice")
+        self.assertEqual(self.store.add("dave", "alice"), AddResult.ADDED)
+
+    def test_expire(self):
+        self.store.add("bob", "alice")
+        self.clock.now += 30
+        self.store.add("carol", "alice")
+        self.assertEqual(self.store.next_deadline(), 1060.0)
+
+        self.clock.now += 30
+        expired = self.store.expire()
+        self.assertEqual(
+            [(c.defender, c.attacker) for c in expired], [("bob", "alice")]
+        )
+        self.assertEqual(self.store.next_deadline(), 1090.0)
+        # expired challenge no longer counts towards the limit
+        self.assertEqual(self.store.add("dave", "alice"), AddResult.ADDED)
+
+    def test_stale_challenge_cannot_be_accepted(self):
+        self.store.add("bob", "alice")
+        self.clock.now += 61
+        self.assertIsNone(self.store.pop("bob", "alice"))
+        self.assertIsNone(self.store.next_deadline())
+        self.assertEqual(self.store.add("bob", "alice"), AddResult.ADDED)
+
+
+if __name__ == "__main__":
+    unittest.main()
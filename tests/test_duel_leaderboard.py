@@ -0,0 +1,50 @@
+import unittest
+
+from duel_leaderboard import DuelLeaderboard
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.board = DuelLeaderboard()
+        # (attacker, defender, wins, losses), both directions as in duelstats
+        self.board.load(
+            [
+                ("alice", "bob", 3, 1),
+                ("bob", "alice", 1, 3),
+                ("alice", "carol", 0, 2),
+                ("carol", "alice", 2, 0),
+                ("dave", "bob", 1, 0),
+                ("bob", "dave", 0, 1),
+            ]
+        )
+
+    def test_load(self):
+        self.assertEqual(self.board.player("alice"), (3, 3))
+        self.assertEqual(self.board.player("bob"), (1, 4))
+        self.assertEqual(self.board.player("nobody"), (0, 0))
+        self.assertEqual(self.board.head_to_head("alice", "bob"), (3, 1))
+        self.assertEqual(self.board.head_to_head("bob", "alice"), (1, 3))
+
+    def test_top_winners(self):
+        self.assertEqual(self.board.top_winners(2), [("alice", 3, 3), ("carol", 2, 0)])
+
+    def test_top_rivalries(self):
+        self.assertEqual(
+            self.board.top_rivalries(2),
+            [("alice", "bob", 3, 1), ("alice", "carol", 0, 2)],
+        )
+
+    def test_record_updates_cached_views(self):
+        self.assertEqual(self.board.top_winners(1)[0][0], "alice")
+        for _ in range(4):
+            self.board.record("dave", "carol")
+
+        self.assertEqual(self.board.top_winners(1), [("dave", 5, 0)])
+        self.assertEqual(self.board.head_to_head("carol", "dave"), (0, 4))
+        self.assertEqual(self.board.top_rivalries(1), [("alice", "bob", 3, 1)])
+        self.board.record("carol", "dave")
+        self.assertEqual(self.board.top_rivalries(1), [("carol", "dave", 1, 4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+import peewee
+
+from duel_stats import DuelStats, query_all_duels, query_duel_stats
+
+
+class DuelStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = peewee.SqliteDatabase(":memory:")
+        self.bound = self.database.bind_ctx([DuelStats])
+        self.bound.__enter__()
+        self.database.create_tables([DuelStats])
+
+    def tearDown(self):
+        self.bound.__exit__(None, None, None)
+        self.database.close()
+
+
+class TestRecordDuels(DuelStatsTestCase):
+    def rows(self):
+        return {
+            (row.attacker, row.defender): (row.wins, row.losses)
+            for row in DuelStats.select()
+        }
+
+    def test_batch_with_repeated_and_reversed_pairs(self):
+        DuelStats.record_duel("a", "b")
+        DuelStats.record_duels(
+            [("a", "b"), ("a", "b"), ("b", "a"), ("a", "c"), ("a", "b")]
+        )
+        self.assertEqual(
+            self.rows(),
+            {
+                ("a", "b"): (4, 1),
+                ("b", "a"): (1, 4),
+                ("a", "c"): (1, 0),
+                ("c", "a"): (0, 1),
+            },
+        )
+
+    def test_batches_add_up(self):
+        for _ in range(3):
+            DuelStats.record_duels([("a", "b"), ("b", "a"), ("b", "a")])
+        self.assertEqual(self.rows(), {("a", "b"): (3, 6), ("b", "a"): (6, 3)})
+
+    def test_all_duels(self):
+        DuelStats.record_duels([("a", "b"), ("a", "b")])
+        self.assertEqual(
+            sorted(query_all_duels()), [("a", "b", 2, 0), ("b", "a", 0, 2)]
+        )
+
+
+def reference_duel_stats(author):
+    """The query_duel_stats() from before the window query, one step at a time"""
+    rows = list(DuelStats.select().where(DuelStats.attacker == author))
+    if not rows:
+        return None
+
+    max_wins = max(row.wins for row in rows)
+    max_losses = max(row.losses for row in rows)
+    return {
+        "wins": sum(row.wins for row in rows),
+        "losses": sum(row.losses for row in rows),
+        "max_wins": max_wins,
+        "won_against": [r.defender for r in rows if max_wins and r.wins == max_wins],
+        "max_losses": max_losses,
+        "lost_to": [r.defender for r in rows if max_losses and r.losses == max_losses],
+    }
+
+
+class TestQueryDuelStats(DuelStatsTestCase):
+    def setUp(self):
+        super().setUp()
+        DuelStats.record_duels(
+            [("a", "b")] * 3
+            + [("a", "c")] * 3
+            + [("a", "d")]
+            + [("d", "a")] * 2
+            + [("e", "a")] * 2
+            + [("b", "z"), ("c", "z")]
+        )
+
+    def assert_same(self, author):
+        stats = query_duel_stats(author)
+        expected = reference_duel_stats(author)
+        if expected is not None:
+            for key in ("won_against", "lost_to"):
+                stats[key].sort()
+                expected[key].sort()
+        self.assertEqual(stats, expected)
+        return stats
+
+    def test_tied_counts(self):
+        stats = self.assert_same("a")
+        self.assertEqual(stats["wins"], 7)
+        self.assertEqual(stats["losses"], 4)
+        self.assertEqual(stats["won_against"], ["b", "c"])
+        self.assertEqual(stats["lost_to"], ["d", "e"])
+
+    def test_no_wins(self):
+        stats = self.assert_same("z")
+        self.assertEqual(stats["wins"], 0)
+        self.assertEqual(stats["won_against"], [])
+        self.assertEqual(stats["lost_to"], ["b", "c"])
+
+    def test_no_losses(self):
+        stats = self.assert_same("e")
+        self.assertEqual(stats["lost_to"], [])
+
+    def test_unknown(self):
+        self.assertIsNone(self.assert_same("nobody"))
+
+
+if __name__ == "__main__":
+    unittest.main()
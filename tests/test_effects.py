@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+from effects import EffectScheduler
+
+
+class TestEffectScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.log = []
+        self.snapshots = []
+        self.scheduler = EffectScheduler(on_change=self.snapshots.append)
+
+    def callbacks(self, name):
+        async def start():
+            self.log.append(("start", name))
+
+        async def stop():
+            self.log.append(("stop", name))
+
+        return start, stop
+
+    async def submit(self, name, group, duration):
+        return await self.scheduler.submit(
+            name, group, duration, *self.callbacks(name), requestor="bob"
+        )
+
+    async def test_group_is_exclusive(self):
+        await self.submit("a", "voice", 0.05)
+        await self.submit("b", "voice", 0.05)
+        await self.submit("c", "lights", 0.05)
+        self.assertEqual(self.log, [("start", "a"), ("start", "c")])
+        snapshot = self.scheduler.snapshot()
+        self.assertEqual(snapshot["voice"]["active"]["name"], "a")
+        self.assertEqual(snapshot["voice"]["queue"][0]["name"], "b")
+
+        await asyncio.sleep(0.08)
+        self.assertIn(("stop", "a"), self.log)
+        self.assertIn(("start", "b"), self.log)
+        self.assertEqual(self.scheduler.active["voice"].name, "b")
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.scheduler.active, {})
+        self.assertEqual(self.snapshots[-1], {})
+
+    async def test_extend_and_cancel(self):
+        await self.submit("a", "voice", 0.05)
+        self.assertTrue(self.scheduler.extend("voice", 0.1))
+        await asyncio.sleep(0.08)
+        self.assertNotIn(("stop", "a"), self.log)
+
+        await self.submit("b", "voice", 10)
+        self.assertTrue(await self.scheduler.cancel("voice"))
+        self.assertEqual(self.log[-2:], [("stop", "a"), ("start", "b")])
+        self.assertTrue(await self.scheduler.cancel("voice"))
+        self.assertFalse(await self.scheduler.cancel("voice"))
+        self.assertFalse(self.scheduler.extend("voice", 1))
+
+    async def test_duration_counts_from_start(self):
+        async def slow_start():
+            await asyncio.sleep(0.05)
+
+        task = asyncio.ensure_future(
+            self.scheduler.submit("a", "voice", 0.1, slow_start)
+        )
+        await asyncio.sleep(0.01)
+        self.assertTrue(self.scheduler.extend("voice", 0.1))
+        await task
+
+        remaining = self.scheduler.snapshot()["voice"]["active"]["remaining"]
+        self.assertGreater(remaining, 0.19)
+
+    async def test_failed_start_moves_on(self):
+        async def broken():
+            raise RuntimeError("boom")
+
+        await self.scheduler.submit("a", "voice", 10, broken)
+        self.assertEqual(self.scheduler.active, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from eventsub import REDEMPTION_ADD, EventSubClient
+
+
+def welcome(session_id, keepalive=10):
+    return {
+        "metadata": {
+            "message_id": "w-" + session_id,
+            "message_type": "session_welcome",
+        },
+        "payload": {
+            "session": {"id": session_id, "keepalive_timeout_seconds": keepalive}
+        },
+    }
+
+
+def notification(message_id, title):
+    return {
+        "metadata": {
+            "message_id": message_id,
+            "message_type": "notification",
+            "subscription_type": REDEMPTION_ADD,
+        },
+        "payload": {"event": {"id": message_id, "reward": {"title": title}}},
+    }
+
+
+class StandInServer:
+    """Local EventSub stand-in: scripted messages per path"""
+
+    def __init__(self):
+        self.scripts = {}
+        self.closed = []
+        app = web.Application()
+        app.router.add_get("/{path}", self.handle)
+        self.runner = web.AppRunner(app)
+
+    async def start(self):
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def handle(self, request):
+        path = request.match_info["path"]
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for msg in self.scripts[path](self.url):
+            await ws.send_json(msg)
+        # keep the socket open until the client goes away
+        async for _ in ws:
+            pass
+        self.closed.append(path)
+        return ws
+
+
+class TestEventSubClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = StandInServer()
+        await self.server.start()
+        self.session = aiohttp.ClientSession()
+        self.events = []
+        self.subscribed = []
+        self.got_events = asyncio.Event()
+        self.client = EventSubClient(
+            self.subscribe,
+            {REDEMPTION_ADD: self.on_redemption},
+            url=self.server.url + "/ws",
+            session=self.session,
+        )
+        self.client.retry_min = 0.01
+        self.task = None
+
+    async def asyncTearDown(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        await self.session.close()
+        await self.server.runner.cleanup()
+
+    async def subscribe(self, session_id):
+        self.subscribed.append(session_id)
+
+    async def on_redemption(self, event):
+        self.events.append(event["id"])
+        if len(self.events) == 3:
+            self.got_events.set()
+
+    async def test_dedup_and_reconnect_handoff(self):
+        self.server.scripts["ws"] = lambda url: [
+            welcome("s1"),
+            notification("m1", "Ничего"),
+            notification("m1", "Ничего"),
+            notification("m2", "Гори!"),
+            {
+                "metadata": {"message_id": "r", "message_type": "session_reconnect"},
+                "payload": {"session": {"reconnect_url": url + "/ws2"}},
+            },
+        ]
+        self.server.scripts["ws2"] = lambda url: [
+            welcome("s2"),
+            notification("m2", "Гори!"),
+            notification("m3", "Ничего"),
+        ]
+
+        self.task = asyncio.ensure_future(self.client.run())
+        await asyncio.wait_for(self.got_events.wait(), 5)
+
+        self.assertEqual(self.events, ["m1", "m2", "m3"])
+        # subscriptions are carried over to the new session
+        self.assertEqual(self.subscribed, ["s1"])
+        self.assertEqual(self.client.session_id, "s2")
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.server.closed, ["ws"])
+
+    async def test_keepalive_timeout_reconnects(self):
+        self.server.scripts["ws"] = lambda url: [welcome("s1", keepalive=0)]
+        self.client.keepalive_slack = 0.05
+
+        self.task = asyncio.ensure_future(self.client.run())
+        for _ in range(100):
+            if len(self.subscribed) >= 2:
+                break
+            await asyncio.sleep(0.02)
+
+        self.assertGreaterEqual(len(self.subscribed), 2)
+
+    async def test_failed_subscribe_closes_socket(self):
+        self.server.scripts["ws"] = lambda url: [welcome("s1")]
+
+        async def subscribe(session_id):
+            self.subscribed.append(session_id)
+            raise aiohttp.ClientConnectionError("helix is down")
+
+        self.client.subscribe = subscribe
+        self.client.retry_min = 1
+        self.task = asyncio.ensure_future(self.client.run())
+        for _ in range(100):
+            if self.server.closed:
+                break
+            await asyncio.sleep(0.02)
+
+        self.assertEqual(self.subscribed, ["s1"])
+        self.assertEqual(self.server.closed, ["ws"])
+
+
+if __name__ == "__main__":
+    unittest.main()
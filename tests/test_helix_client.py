@@ -0,0 +1,128 @@
+import asyncio
+import time
+import unittest
+
+from aiohttp import web
+
+import aio_http
+from helix_client import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, HelixClient
+
+
+async def token(refresh):
+    return "token"
+
+
+class TestHelixRateLimit(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.served = []
+        self.limit = 10
+        self.remaining = 10
+        self.reset_at = time.time() + 0.3
+        self.throttle = 0
+
+        app = web.Application()
+        app.router.add_get("/{name}", self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.helix = HelixClient("id", token, base_url=f"http://127.0.0.1:{port}/")
+
+    async def asyncTearDown(self):
+        aio_http._breakers.clear()
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+
+    async def handler(self, request):
+        if time.time() >= self.reset_at:
+            self.remaining = self.limit
+        headers = {
+            "Ratelimit-Limit": str(self.limit),
+            "Ratelimit-Reset": str(self.reset_at),
+        }
+        if self.throttle:
+            self.throttle -= 1
+            headers["Ratelimit-Remaining"] = "0"
+            self.reset_at = time.time() + 0.1
+            return web.json_response({}, status=429, headers=headers)
+
+        self.remaining -= 1
+        headers["Ratelimit-Remaining"] = str(self.remaining)
+        self.served.append(request.match_info["name"])
+        return web.json_response({"data": []}, headers=headers)
+
+    async def test_low_priority_waits_when_bucket_is_low(self):
+        await self.helix.request("GET", "warmup")
+        self.helix.remaining = 2
+
+        low = asyncio.ensure_future(
+            self.helix.request("GET", "poll", priority=PRIORITY_LOW)
+        )
+        await asyncio.sleep(0.05)
+        await self.helix.request("GET", "ban", priority=PRIORITY_HIGH)
+        self.assertEqual(self.served, ["warmup", "ban"])
+
+        await low
+        self.assertEqual(self.served, ["warmup", "ban", "poll"])
+        self.assertEqual(self.helix.stats["delayed"], 1)
+
+    async def test_429_waits_for_reset(self):
+        self.throttle = 2
+        res = await self.helix.request("GET", "users")
+        self.assertEqual(res, {"data": []})
+        self.assertEqual(self.served, ["users"])
+        self.assertEqual(self.helix.stats["rate_limited"], 2)
+
+
+class TestHelixScheduling(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.helix = HelixClient("id", token)
+        self.helix.limit = 10
+        self.helix.remaining = 0
+        self.helix.reset_at = time.time() + 0.1
+        self.granted = []
+
+    async def acquire(self, name, priority):
+        await self.helix._acquire(priority)
+        self.granted.append(name)
+
+    async def test_later_high_priority_goes_first(self):
+        low = asyncio.ensure_future(self.acquire("low", PRIORITY_LOW))
+        normal = asyncio.ensure_future(self.acquire("normal", PRIORITY_NORMAL))
+        await asyncio.sleep(0.02)
+        high = asyncio.ensure_future(self.acquire("high", PRIORITY_HIGH))
+        await asyncio.gather(low, normal, high)
+        self.assertEqual(self.granted, ["high", "normal", "low"])
+        self.assertEqual(self.helix.stats["delayed"], 3)
+
+    async def test_same_priority_keeps_order(self):
+        tasks = [
+            asyncio.ensure_future(self.acquire(i, PRIORITY_NORMAL)) for i in range(3)
+        ]
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.granted, [0, 1, 2])
+
+    def test_bucket_is_refilled_once_per_reset(self):
+        self.helix.reset_at = time.time() - 1
+        taken = [self.helix._take(PRIORITY_HIGH) for _ in range(50)]
+        self.assertEqual(taken.count(True), 10)
+        self.assertGreater(self.helix.reset_at, time.time())
+
+        # the reserve still holds back lower priorities after a reset
+        self.helix.reset_at = time.time() - 1
+        taken = [self.helix._take(PRIORITY_LOW) for _ in range(50)]
+        self.assertEqual(taken.count(True), 7)
+
+    async def test_cancelled_waiter_takes_no_token(self):
+        low = asyncio.ensure_future(self.acquire("low", PRIORITY_LOW))
+        await asyncio.sleep(0.02)
+        low.cancel()
+        await self.acquire("high", PRIORITY_HIGH)
+        self.assertEqual(self.granted, ["high"])
+        self.assertEqual(self.helix.remaining, 9)
+        self.assertEqual(self.helix._waiters, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
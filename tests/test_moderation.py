@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+
+from moderation import ModerationQueue
+
+
+class FakeHelix:
+    def __init__(self):
+        self.calls = []
+
+    async def request(self, method, path, params=None, json=None, priority=None):
+        self.calls.append((method, path, params, json))
+        await asyncio.sleep(0)
+        if path == "users":
+            return {
+                "data": [
+                    {"login": login, "id": str(100 + i)}
+                    for i, (_, login) in enumerate(params)
+                    if login != "ghost"
+                ]
+            }
+        return {"data": []}
+
+
+class TestModerationQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesce_and_batch_lookup(self):
+        helix = FakeHelix()
+        queue = ModerationQueue(helix, lambda: 42)
+
+        results = await asyncio.gather(
+            queue.timeout("Alice", 30),
+            queue.timeout("@alice", 60),
+            queue.timeout("bob", 30),
+            queue.timeout("ghost", 30),
+        )
+        self.assertEqual(results, [True, True, True, False])
+
+        lookups = [c for c in helix.calls if c[1] == "users"]
+        self.assertEqual(len(lookups), 1)
+        bans = [c[3]["data"] for c in helix.calls if c[1] == "moderation/bans"]
+        self.assertEqual(
+            [(b["user_id"], b["duration"]) for b in bans], [("100", 60), ("101", 30)]
+        )
+
+        # ids are cached
+        await queue.timeout("bob", 10)
+        self.assertEqual(len([c for c in helix.calls if c[1] == "users"]), 1)
+
+    async def test_unexpected_error_resolves_futures(self):
+        helix = FakeHelix()
+
+        async def broken(*args, **kwargs):
+            return {}  # no "data"
+
+        helix.request = broken
+        queue = ModerationQueue(helix, lambda: 42)
+        results = await asyncio.wait_for(
+            asyncio.gather(queue.timeout("alice", 30), queue.timeout("bob", 30)), 1
+        )
+        self.assertEqual(results, [False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+import unittest.mock
+
+import aiohttp
+
+from music_poller import MusicPoller
+from tokens import TokenError
+
+
+def song(song_id, duration=None):
+    return {"id": song_id, "song": f"song {song_id}", "duration": duration}
+
+
+class TestMusicPoller(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.results = []
+        self.posted = []
+        self.poller = MusicPoller(self.fetch, self.posted.append, lambda: self.now)
+
+    async def fetch(self):
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def poll(self, *results):
+        self.results.extend(results)
+        return [await self.poller.poll_once() for _ in results]
+
+    def test_playing_delay_without_duration(self):
+        self.assertEqual(self.poller.playing_delay(), MusicPoller.poll_playing)
+
+    def test_playing_delay_with_duration(self):
+        self.poller.new_song(song(1, 200))
+        # far from the end: capped
+        self.assertEqual(self.poller.playing_delay(), MusicPoller.poll_idle_max)
+        self.now += 190
+        self.assertEqual(self.poller.playing_delay(), 10)
+        self.now += 20
+        # past the end: never busy-loops
+        self.assertEqual(self.poller.playing_delay(), MusicPoller.poll_min)
+
+    async def test_song_is_posted_once(self):
+        delays = await self.poll(song(1), song(1), song(2, 20))
+        self.assertEqual([s["id"] for s in self.posted], [1, 2])
+        self.assertEqual(delays, [5, 5, 20])
+
+    async def test_idle_backs_off_and_song_resets(self):
+        delays = await self.poll(None, None, None, None, None, None)
+        self.assertEqual(delays, [2, 4, 8, 16, 30, 30])
+
+        delays = await self.poll(song(1), None)
+        self.assertEqual(delays, [5, 2])
+        self.assertIsNone(self.poller.song_ends_at)
+
+    async def test_errors_back_off_separately(self):
+        delays = await self.poll(
+            None,
+            aiohttp.ClientError("down"),
+            asyncio.TimeoutError(),
+            TokenError("no token"),
+            KeyError("songName"),
+        )
+        self.assertEqual(delays, [2, 2, 4, 8, 16])
+
+        # a successful poll resets the error backoff, idle keeps growing
+        delays = await self.poll(None, aiohttp.ClientError("down"))
+        self.assertEqual(delays, [4, 2])
+
+    async def test_song_idle_error_transitions(self):
+        delays = await self.poll(
+            song(1, 60), aiohttp.ClientError("down"), song(1, 60), None
+        )
+        self.assertEqual(delays, [30, 2, 30, 2])
+        self.assertEqual(len(self.posted), 1)
+
+    async def test_run_survives_unexpected_errors(self):
+        self.results.append(ValueError("bug"))
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            raise asyncio.CancelledError
+
+        with unittest.mock.patch("music_poller.asyncio.sleep", fake_sleep):
+            with self.assertRaises(asyncio.CancelledError):
+                await self.poller.run()
+        self.assertEqual(sleeps, [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from aiohttp import web
+
+import aio_http
+from nightbot_client import NightbotClient
+
+
+class StaticToken:
+    async def get_token(self, refresh=False):
+        return "token"
+
+
+class TestNightbotClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.timers = {
+            "t1": {"_id": "t1", "name": "Мультитвич", "enabled": False},
+            "t2": {"_id": "t2", "name": "Neputin", "enabled": True},
+        }
+        self.commands = {"c1": {"_id": "c1", "name": "!mt", "message": "old"}}
+
+        app = web.Application()
+        app.router.add_get("/timers", self.list_timers)
+        app.router.add_get("/commands", self.list_commands)
+        app.router.add_put("/timers/{id}", self.put_timer)
+        app.router.add_put("/commands/{id}", self.put_command)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = NightbotClient(
+            StaticToken(), base_url=f"http://127.0.0.1:{port}/"
+        )
+
+    async def asyncTearDown(self):
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+
+    async def list_timers(self, request):
+        self.requests.append(("GET", request.path))
+        return web.json_response({"timers": list(self.timers.values())})
+
+    async def list_commands(self, request):
+        self.requests.append(("GET", request.path))
+        return web.json_response({"commands": list(self.commands.values())})
+
+    async def put_timer(self, request):
+        self.requests.append(("PUT", request.path))
+        timer = self.timers[request.match_info["id"]]
+        timer.update(await request.json())
+        return web.json_response({"status": 200, "timer": timer})
+
+    async def put_command(self, request):
+        self.requests.append(("PUT", request.path))
+        command = self.commands[request.match_info["id"]]
+        command.update(await request.json())
+        return web.json_response({"status": 200, "command": command})
+
+    async def test_lookups_are_cached(self):
+        self.assertEqual((await self.client.timer("Neputin"))["_id"], "t2")
+        self.assertEqual((await self.client.timer("Мультитвич"))["_id"], "t1")
+        self.assertIsNone(await self.client.command("!nope"))
+        self.assertEqual(self.requests, [("GET", "/timers"), ("GET", "/commands")])
+
+    async def test_writes_keep_cache_warm(self):
+        await self.client.timers()
+        await self.client.commands()
+        self.requests.clear()
+
+        await self.client.set_timer_enabled("Мультитвич", True)
+        await self.client.update_command("!mt", {"message": "new"})
+        self.assertEqual(
+            self.requests, [("PUT", "/timers/t1"), ("PUT", "/commands/c1")]
+        )
+        self.assertTrue((await self.client.timer("Мультитвич"))["enabled"])
+        self.assertEqual((await self.client.command("!mt"))["message"], "new")
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_refresh_reloads(self):
+        await self.client.timers()
+        self.timers["t3"] = {"_id": "t3", "name": "new", "enabled": True}
+        self.assertIsNone(await self.client.timer("new"))
+        await self.client.timers(refresh=True)
+        self.assertIsNotNone(await self.client.timer("new"))
+
+    async def test_reconcile_writes_only_differences(self):
+        desired = {"Мультитвич": True, "Neputin": False}
+        self.assertEqual(await self.client.reconcile(desired, {"!mt": "new"}), 3)
+        self.requests.clear()
+
+        self.assertEqual(await self.client.reconcile(desired, {"!mt": "new"}), 0)
+        self.assertEqual(await self.client.reconcile({"Neputin": True}, {}), 1)
+        self.assertEqual(self.requests, [("PUT", "/timers/t2")])
+        self.assertTrue(self.timers["t2"]["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
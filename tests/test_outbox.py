@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from aio_db import AsyncDatabase
+from outbox import Outbox
+from sqlite_profile import open_database
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePublisher:
+    def __init__(self):
+        self.up = True
+        self.messages = []
+
+    async def connect(self):
+        if not self.up:
+            raise ConnectionError("broker is down")
+
+    async def publish(self, body, expiration=None):
+        await self.connect()
+        self.messages.append((body, expiration))
+
+
+class TestOutbox(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = open_database(os.path.join(self.tmpdir.name, "test.db"))
+        self.aiodb = AsyncDatabase(self.database)
+        self.clock = FakeClock()
+        self.publisher = FakePublisher()
+        self.outbox = Outbox(
+            self.aiodb, self.publisher, batch_size=2, retry_min=10, clock=self.clock
+        )
+
+    async def asyncTearDown(self):
+        await self.aiodb.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def test_flush_in_batches(self):
+        for i in range(3):
+            await self.outbox.put(b"%d" % i, expiration=60000)
+
+        self.clock.now += 20
+        self.assertEqual(await self.outbox.flush(), 2)
+        self.assertEqual(await self.outbox.flush(), 1)
+        self.assertEqual(await self.outbox.flush(), 0)
+        # remaining TTL is passed on to the broker
+        self.assertEqual(
+            self.publisher.messages, [(b"0", 40000), (b"1", 40000), (b"2", 40000)]
+        )
+
+    async def test_retry_after_failure(self):
+        self.publisher.up = False
+        await self.outbox.put(b"hello")
+        self.assertEqual(await self.outbox.flush(), 0)
+
+        self.publisher.up = True
+        self.assertEqual(await self.outbox.flush(), 0)
+        self.clock.now += 10
+        self.assertEqual(await self.outbox.flush(), 1)
+        self.assertEqual(self.publisher.messages, [(b"hello", None)])
+
+    async def test_expired_messages_are_dropped(self):
+        self.publisher.up = False
+        await self.outbox.put(b"late", expiration=5000)
+        await self.outbox.flush()
+
+        self.publisher.up = True
+        self.clock.now += 10
+        self.assertEqual(await self.outbox.flush(), 0)
+        self.assertEqual(self.outbox.expired, 1)
+        self.assertEqual(self.publisher.messages, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
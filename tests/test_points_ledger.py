@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import aiohttp
+
+from points_ledger import PointsLedger
+
+
+class FakeStreamlabs:
+    def __init__(self, points):
+        self.points = dict(points)
+        self.fetches = 0
+        self.subtracts = []
+        self.fail = 0
+
+    async def fetch(self, user):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return self.points.get(user, 0)
+
+    async def subtract(self, user, points):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            self.fail -= 1
+            raise aiohttp.ClientConnectionError("boom")
+        self.subtracts.append((user, points))
+        self.points[user] -= points
+
+
+class TestPointsLedger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sl = FakeStreamlabs({"alice": 120})
+        self.ledger = PointsLedger(self.sl.fetch, self.sl.subtract)
+        self.ledger.retry_delay = 0
+
+    async def test_balance_is_cached(self):
+        self.assertEqual(await self.ledger.balance("Alice"), 120)
+        self.assertEqual(await self.ledger.balance("alice"), 120)
+        self.assertEqual(self.sl.fetches, 1)
+
+    async def test_concurrent_debits_do_not_double_spend(self):
+        results = await asyncio.gather(
+            *(self.ledger.debit("alice", 50) for _ in range(3))
+        )
+        self.assertEqual(sorted(results, key=str), [20, 70, None])
+        await self.ledger.close()
+        self.assertEqual(self.sl.subtracts, [("alice", 50), ("alice", 50)])
+        self.assertEqual(self.sl.points["alice"], 20)
+        self.assertEqual(self.sl.fetches, 1)
+
+    async def test_pending_debits_survive_refetch(self):
+        self.sl.fail = 1
+        await self.ledger.debit("alice", 50)
+        self.ledger.balances.clear()
+        # Streamlabs still says 120, but 50 are on their way
+        self.assertEqual(await self.ledger.balance("alice"), 70)
+        await self.ledger.close()
+        self.assertEqual(self.sl.points["alice"], 70)
+
+    async def test_failed_debit_invalidates_balance(self):
+        self.sl.fail = PointsLedger.retries
+        self.assertEqual(await self.ledger.debit("alice", 50), 70)
+        await self.ledger.close()
+        self.assertEqual(self.ledger.pending, {})
+        self.assertEqual(await self.ledger.balance("alice"), 120)
+        self.assertEqual(self.sl.fetches, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+
+import aiohttp
+from yarl import URL
+
+from redemptions import CANCELED, FULFILLED, RedemptionUpdater
+
+
+class TestRedemptionUpdater(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+        self.fail = {}
+        self.updater = RedemptionUpdater(self.send, delay=0.01)
+
+    async def send(self, reward_id, status, ids):
+        self.calls.append((reward_id, status, list(ids)))
+        error = self.fail.get(reward_id)
+        if error is not None:
+            url = URL("https://api.twitch.tv/helix/")
+            request = aiohttp.RequestInfo(url, "PATCH", {}, url)
+            raise aiohttp.ClientResponseError(request, (), status=error)
+
+    async def test_grouped_batches(self):
+        for i in range(120):
+            self.updater.update("hugs", f"h{i}", FULFILLED)
+        self.updater.update("hugs", "x", CANCELED)
+        self.updater.update("fun", "f", FULFILLED)
+        await asyncio.sleep(0.05)
+
+        batches = sorted((r, s, len(ids)) for r, s, ids in self.calls)
+        self.assertEqual(
+            batches,
+            [
+                ("fun", FULFILLED, 1),
+                ("hugs", CANCELED, 1),
+                ("hugs", FULFILLED, 20),
+                ("hugs", FULFILLED, 50),
+                ("hugs", FULFILLED, 50),
+            ],
+        )
+        self.assertEqual(self.updater.updated, 122)
+
+    async def test_unmanaged_reward_is_skipped(self):
+        self.fail["fun"] = 403
+        self.updater.update("fun", "a", FULFILLED)
+        await asyncio.sleep(0.05)
+        self.updater.update("fun", "b", FULFILLED)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_missing_scope_is_not_unmanaged(self):
+        self.fail["fun"] = 401
+        self.updater.update("fun", "a", FULFILLED)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.updater.unmanaged, set())
+
+        del self.fail["fun"]
+        self.updater.update("fun", "b", FULFILLED)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.calls[-1], ("fun", FULFILLED, ["b"]))
+
+    async def test_transient_failure_is_retried_once(self):
+        self.fail["fun"] = 503
+        self.updater.update("fun", "a", FULFILLED)
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.updater.pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
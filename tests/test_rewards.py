@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from rewards import DEFAULT_REWARDS, RewardDispatcher, compile_rewards
+
+
+class TestCompileRewards(unittest.TestCase):
+    def test_compile(self):
+        rewards = compile_rewards(
+            {"Гори!": {"sound": ["a.mp3", "b.mp3"]}, "Ничего": {"sound": "c.mp3"}}
+        )
+        self.assertEqual(rewards["Гори!"].sound, ("a.mp3", "b.mp3"))
+        self.assertEqual(rewards["Ничего"].sound, ("c.mp3",))
+        self.assertEqual(rewards["Ничего"].concurrency, 1)
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            compile_rewards({"Ничего": {"sonud": "c.mp3"}})
+
+    def test_defaults(self):
+        rewards = compile_rewards(DEFAULT_REWARDS)
+        self.assertEqual(rewards["Распылить упорин"].effect, "disco")
+        self.assertEqual(len(rewards["Гори!"].sound), 3)
+
+
+class TestRewardDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.done = []
+        self.release = asyncio.Event()
+        self.dispatcher = RewardDispatcher(
+            {
+                "slow": {"queue_size": 1},
+                "fast": {"concurrency": 2},
+            },
+            self.handle,
+        )
+
+    async def asyncTearDown(self):
+        self.dispatcher.close()
+
+    async def handle(self, reward, requestor):
+        if reward.title == "slow":
+            await self.release.wait()
+        self.done.append((reward.title, requestor))
+
+    async def test_slow_reward_does_not_block_others(self):
+        self.assertTrue(self.dispatcher.dispatch("slow", "alice"))
+        await asyncio.sleep(0)
+        self.assertTrue(self.dispatcher.dispatch("slow", "bob"))
+        # the queue holds one redemption, the third one is dropped
+        self.assertFalse(self.dispatcher.dispatch("slow", "carol"))
+        self.assertTrue(self.dispatcher.dispatch("fast", "dave"))
+        self.assertFalse(self.dispatcher.dispatch("unknown", "erin"))
+
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.done, [("fast", "dave")])
+
+        self.release.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(
+            self.done, [("fast", "dave"), ("slow", "alice"), ("slow", "bob")]
+        )
+
+        stats = self.dispatcher.get_stats()
+        self.assertEqual(stats["slow"]["count"], 2)
+        self.assertEqual(stats["slow"]["dropped"], 1)
+        self.assertEqual(stats["slow"]["queue_depth"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
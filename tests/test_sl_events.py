@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from sl_events import EventPipeline, normalise
+
+
+def sub(_id, name, gifter=None):
+    message = {
+        "_id": _id,
+        "name": name,
+        "months": 1,
+        "message": "",
+        "sub_plan": "1000",
+        "sub_type": "subgift" if gifter else "sub",
+    }
+    if gifter:
+        message["gifter_display_name"] = gifter
+    return {"type": "subscription", "message": [message]}
+
+
+class TestNormalise(unittest.TestCase):
+    def test_fields_and_keys(self):
+        events = normalise(
+            {"type": "follow", "event_id": "e1", "message": [{"name": "a"}, {}]}
+        )
+        self.assertEqual(
+            events,
+            [
+                ("e1:0", {"type": "follow", "name": "a"}),
+                ("e1:1", {"type": "follow", "name": "UNKNOWN"}),
+            ],
+        )
+
+    def test_ignored(self):
+        self.assertEqual(normalise({"type": "alertPlaying", "message": {}}), [])
+
+
+class TestEventPipeline(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.emitted = []
+        self.pipeline = EventPipeline(self.emit, maxsize=3, coalesce_window=0.05)
+
+    async def emit(self, event):
+        self.emitted.append(event)
+
+    async def test_duplicates_are_dropped(self):
+        self.pipeline.put(sub("1", "a"))
+        self.pipeline.put(sub("1", "a"))
+        self.assertEqual(self.pipeline.queue.qsize(), 1)
+        self.assertEqual(self.pipeline.stats["duplicates"], 1)
+
+    async def test_subgifts_are_coalesced(self):
+        for i in range(5):
+            self.pipeline.put(sub(str(i), f"user{i}", gifter="Santa"))
+        self.pipeline.put(sub("x", "lonely", gifter="Grinch"))
+        await asyncio.sleep(0.1)
+
+        events = [self.pipeline.queue.get_nowait() for _ in range(2)]
+        self.assertEqual(events[0]["type"], "subgifts")
+        self.assertEqual(events[0]["count"], 5)
+        self.assertEqual(events[0]["names"], [f"user{i}" for i in range(5)])
+        self.assertEqual(events[1]["name"], "lonely")
+        self.assertEqual(self.pipeline.stats["coalesced"], 4)
+
+    async def test_oldest_event_is_dropped_when_full(self):
+        for i in range(5):
+            self.pipeline.put(sub(str(i), f"user{i}"))
+        self.assertEqual(self.pipeline.stats["dropped"], 2)
+
+        task = asyncio.ensure_future(self.pipeline.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        self.assertEqual(
+            [event["name"] for event in self.emitted], ["user2", "user3", "user4"]
+        )
+
+    async def test_close_sends_pending_gifts(self):
+        self.pipeline.coalesce_window = 60
+        task = asyncio.ensure_future(self.pipeline.run())
+        self.pipeline.put(sub("0", "a"))
+        for i in range(1, 3):
+            self.pipeline.put(sub(str(i), f"user{i}", gifter="Santa"))
+
+        await self.pipeline.close()
+        task.cancel()
+        self.assertEqual(
+            [event["type"] for event in self.emitted], ["subscription", "subgifts"]
+        )
+        self.assertEqual(self.pipeline.gift_timers, {})
+
+    async def test_close_gives_up_without_run(self):
+        self.pipeline.put(sub("0", "a"))
+        await self.pipeline.close(timeout=0.01)
+        self.assertEqual(self.pipeline.queue.qsize(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import peewee
+
+from duel_stats import DuelStats
+from sqlite_profile import check_indexes, get_pragmas, open_database
+
+
+class TestProfiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "test.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def pragma(self, database, name):
+        return database.execute_sql(f"PRAGMA {name}").fetchone()[0]
+
+    def test_get_pragmas(self):
+        self.assertEqual(get_pragmas("default"), {})
+        pragmas = get_pragmas("performance", {"mmap_size": 0})
+        self.assertEqual(pragmas["mmap_size"], 0)
+        self.assertEqual(pragmas["journal_mode"], "wal")
+        with self.assertRaises(ValueError):
+            get_pragmas("fast")
+
+    def test_performance_profile(self):
+        database = open_database(self.path)
+        database.connect()
+        self.assertEqual(self.pragma(database, "journal_mode"), "wal")
+        # 1 is NORMAL
+        self.assertEqual(self.pragma(database, "synchronous"), 1)
+        database.close()
+
+    def test_default_profile(self):
+        database = open_database(self.path, "default")
+        database.connect()
+        self.assertEqual(self.pragma(database, "journal_mode"), "delete")
+        # 2 is FULL
+        self.assertEqual(self.pragma(database, "synchronous"), 2)
+        database.close()
+
+
+class TestCheckIndexes(unittest.TestCase):
+    def setUp(self):
+        self.database = peewee.SqliteDatabase(":memory:")
+        self.bound = self.database.bind_ctx([DuelStats])
+        self.bound.__enter__()
+        # the table as created before the indexes were declared
+        DuelStats._schema.create_table()
+
+    def tearDown(self):
+        self.bound.__exit__(None, None, None)
+        self.database.close()
+
+    def test_missing_indexes_are_created_once(self):
+        self.assertEqual(
+            sorted(check_indexes(self.database, [DuelStats])),
+            ["duelstats_attacker_losses", "duelstats_attacker_wins"],
+        )
+        names = {index.name for index in self.database.get_indexes("duelstats")}
+        self.assertIn("duelstats_attacker_wins", names)
+        self.assertIn("duelstats_attacker_losses", names)
+
+        self.assertEqual(check_indexes(self.database, [DuelStats]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from stream_metrics import StreamSampler, ViewerSeries
+
+
+class TestViewerSeries(unittest.TestCase):
+    def test_old_samples_are_downsampled(self):
+        series = ViewerSeries(recent_window=600, bucket=300)
+        for i in range(40):
+            series.add(i * 60.0, i)
+
+        points = series.points()
+        # whole 5 minute buckets older than 10 minutes are averaged
+        self.assertEqual(points[0], (0.0, 2))
+        self.assertEqual(points[1], (300.0, 7))
+        self.assertLess(len(series), 40)
+        self.assertEqual(points[-1], (39 * 60.0, 39))
+        self.assertEqual([t for t, _ in points], sorted(t for t, _ in points))
+
+
+class TestStreamSampler(unittest.IsolatedAsyncioTestCase):
+    async def test_samples(self):
+        self.now = 0.0
+        stream = {
+            "viewer_count": 10,
+            "started_at": "s1",
+            "title": "t",
+            "game_name": "g",
+        }
+        streams = [
+            None,
+            stream,
+            dict(stream, viewer_count=12),
+            dict(stream, started_at="s2"),
+        ]
+        seen = []
+
+        async def fetch():
+            self.now += 60
+            return streams.pop(0)
+
+        sampler = StreamSampler(fetch, seen.append, clock=lambda: self.now)
+        self.assertFalse((await sampler.sample()).live)
+        await sampler.sample()
+        await sampler.sample()
+        self.assertEqual(sampler.latest.viewers, 12)
+        self.assertEqual(sampler.series.points(), [(120.0, 10), (180.0, 12)])
+
+        # a new stream starts a new series
+        await sampler.sample()
+        self.assertEqual(sampler.series.points(), [(240.0, 10)])
+        self.assertEqual(len(seen), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+from aiohttp import web
+
+import aio_http
+from tokens import (
+    BaseToken,
+    DonateAllToken,
+    OAuth2Token,
+    TokenError,
+    TokenManager,
+    write_json_atomic,
+)
+
+
+class TestOAuth2Token(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.token_file = os.path.join(self.tmpdir.name, "token.json")
+        self.refreshes = []
+
+        app = web.Application()
+        app.router.add_post("/token", self.token_endpoint)
+        app.router.add_post("/authenticate", self.reject)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/token"
+
+    async def asyncTearDown(self):
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+        self.tmpdir.cleanup()
+
+    async def token_endpoint(self, request):
+        data = await request.post()
+        self.refreshes.append(data["refresh_token"])
+        return web.json_response(
+            {"access_token": "new", "refresh_token": "r2", "expires_in": 3600}
+        )
+
+    async def reject(self, request):
+        return web.Response(status=401, text="Bad credentials")
+
+    def make_token(self, expires_at):
+        write_json_atomic(
+            self.token_file,
+            {"access_token": "old", "refresh_token": "r1", "expires_at": expires_at},
+        )
+        return OAuth2Token("test", self.token_file, self.url, "id", "secret")
+
+    async def test_valid_token_needs_no_network(self):
+        token = self.make_token(time.time() + 3600)
+        self.assertEqual(await token.get_token(), "old")
+        self.assertEqual(self.refreshes, [])
+
+    async def test_expiring_token_is_refreshed_and_saved(self):
+        token = self.make_token(time.time() + 60)
+        await token.maintain()
+        self.assertEqual(self.refreshes, ["r1"])
+        self.assertEqual(await token.get_token(), "new")
+
+        with open(self.token_file) as f:
+            saved = json.load(f)
+        self.assertEqual(saved["refresh_token"], "r2")
+        self.assertGreater(saved["expires_at"], time.time() + 3000)
+        self.assertEqual(
+            [name for name in os.listdir(self.tmpdir.name)], ["token.json"]
+        )
+
+    async def test_forced_refresh(self):
+        token = self.make_token(time.time() + 3600)
+        self.assertEqual(await token.get_token(refresh=True), "new")
+        self.assertEqual(self.refreshes, ["r1"])
+
+    async def test_rejected_credentials(self):
+        token = DonateAllToken("user", "wrong")
+        token.api_url = self.url.replace("token", "")
+        token.token_file = self.token_file
+        with self.assertRaises(TokenError):
+            await token.get_token()
+        self.assertIsNone(token.token)
+
+
+class Broken(BaseToken):
+    name = "broken"
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def expires_at(self):
+        return None
+
+    async def refresh(self):
+        raise self.error
+
+
+class TestTokenManager(unittest.IsolatedAsyncioTestCase):
+    def test_base_token_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseToken()
+
+    async def run_once(self, manager):
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            raise asyncio.CancelledError
+
+        with unittest.mock.patch("tokens.asyncio.sleep", fake_sleep):
+            with self.assertRaises(asyncio.CancelledError):
+                await manager.run()
+        return sleeps
+
+    async def test_token_errors_are_retried(self):
+        manager = TokenManager()
+        manager.add(Broken(TokenError("rejected")))
+        sleeps = await self.run_once(manager)
+        self.assertAlmostEqual(sleeps[0], TokenManager.retry_delay, delta=1)
+
+    async def test_bugs_are_not_hidden(self):
+        manager = TokenManager()
+        manager.add(Broken(TypeError("bug")))
+        with self.assertRaises(TypeError):
+            await manager.run()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from aiohttp import web
+
+import aio_http
+from voxworker_client import VoxWorker, VoxWorkerError
+
+PAGE = """
+<form>
+<input name="textId" value="t1">
+<input name="sessionId" value="s1">
+</form>
+"""
+
+
+class TestVoxWorker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pages = 0
+        self.converted = []
+        self.queued = 2
+        self.result = "ok"
+
+        app = web.Application()
+        app.router.add_get("/ru/", self.page)
+        app.router.add_post("/ru/ajax/convert", self.convert)
+        app.router.add_get("/ru/ajax/status", self.status)
+        app.router.add_get("/file.mp3", self.download)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/"
+        self.vox = VoxWorker(base_url=self.url + "ru/")
+        self.vox.poll_interval = 0
+
+    async def asyncTearDown(self):
+        aio_http._breakers.clear()
+        await aio_http.close_sessions()
+        await self.runner.cleanup()
+
+    async def page(self, request):
+        self.pages += 1
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def convert(self, request):
+        self.converted.append(dict(await request.post()))
+        return web.json_response({"status": "queue", "taskId": "42"})
+
+    async def status(self, request):
+        assert request.query["id"] == "42"
+        if self.queued:
+            self.queued -= 1
+            return web.json_response({"status": "queue", "taskId": "42"})
+        return web.json_response(
+            {
+                "status": self.result,
+                "textId": "t2",
+                "downloadUrl": self.url + "file.mp3",
+                "error": "bad",
+                "errorText": "text",
+            }
+        )
+
+    async def download(self, request):
+        return web.Response(body=b"ID3 mp3")
+
+    async def test_convert(self):
+        self.assertEqual(await self.vox.convert("привет"), b"ID3 mp3")
+        self.assertEqual(self.converted[0]["text"], "привет")
+        self.assertEqual(self.converted[0]["sessionId"], "s1")
+
+        await self.vox.convert("ещё")
+        # the page is read once, the next text continues the session
+        self.assertEqual(self.pages, 1)
+        self.assertEqual(self.converted[1]["textId"], "t2")
+
+    async def test_failed_conversion(self):
+        self.result = "error"
+        with self.assertRaises(VoxWorkerError):
+            await self.vox.convert("привет")
+
+    async def test_queue_timeout(self):
+        self.queued = 100
+        self.vox.max_polls = 3
+        with self.assertRaises(VoxWorkerError):
+            await self.vox.convert("привет")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from wiz_lights import LightController
+
+
+class FakeState:
+    def __init__(self, on, pilot):
+        self.on = on
+        self.pilot = pilot
+
+    def get_state(self):
+        return self.on
+
+    def get_speed(self):
+        return self.pilot["speed"]
+
+    def get_scene_id(self):
+        return self.pilot["sceneId"]
+
+    def get_brightness(self):
+        # like pywizlight: percent to 0-255
+        return round(self.pilot["dimming"] * 255 / 100)
+
+
+class FakeBulb:
+    def __init__(self, on=True, speed=50, scene=11, dimming=100):
+        self.on = on
+        self.pilot = {"speed": speed, "sceneId": scene, "dimming": dimming}
+        self.reads = 0
+        self.pilots = []
+
+    async def updateState(self):
+        self.reads += 1
+        return FakeState(self.on, self.pilot)
+
+    async def turn_on(self, builder):
+        self.pilot = dict(builder.pilot_params)
+        self.pilots.append(self.pilot)
+
+
+EFFECT_A = {"scene": 4, "speed": 100, "brightness": 255}
+EFFECT_B = {"scene": 7, "speed": 100, "brightness": 255}
+
+
+class TestLightController(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.lights = LightController([{"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}])
+        self.on = FakeBulb(scene=11, dimming=50)
+        self.off = FakeBulb(on=False)
+        self.lights.bulbs = {"10.0.0.1": self.on, "10.0.0.2": self.off}
+
+    async def test_overlapping_effects_restore_once(self):
+        original = dict(self.on.pilot)
+
+        await self.lights.start_effect(EFFECT_A)
+        await self.lights.start_effect(EFFECT_B)
+        self.assertEqual(self.on.pilot["sceneId"], 7)
+        # the state is captured only by the first effect
+        self.assertEqual(self.on.reads, 1)
+
+        await self.lights.stop_effect()
+        # B is still running
+        self.assertEqual(self.on.pilot["sceneId"], 7)
+
+        await self.lights.stop_effect()
+        self.assertEqual(self.on.pilot, original)
+        self.assertEqual(len(self.on.pilots), 3)
+        self.assertEqual(self.lights.active_effects, 0)
+
+        # the bulb that was off is left alone
+        self.assertEqual(self.off.pilots, [])
+
+    async def test_stop_without_start(self):
+        await self.lights.stop_effect()
+        self.assertEqual(self.lights.active_effects, 0)
+        self.assertEqual(self.on.pilots, [])
+
+        # and the next effect still captures and restores the state
+        original = dict(self.on.pilot)
+        await self.lights.start_effect(EFFECT_A)
+        await self.lights.stop_effect()
+        self.assertEqual(self.on.pilot, original)
+        self.assertEqual(self.on.reads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
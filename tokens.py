@@ -0,0 +1,337 @@
+import abc
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+import aiohttp
+from loguru import logger
+from requests_oauthlib import OAuth2Session
+
+import aio_http
+
+
+def write_json_atomic(path: str, data):
+    """Write `data` to a temporary file next to `path` and move it over"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class TokenError(Exception):
+    """A new token can't be obtained, e.g. the credentials were rejected"""
+
+
+class BaseToken(abc.ABC):
+    name = ""
+    # refresh this long before the access token expires
+    refresh_margin = 300
+    token_file = ""
+
+    def __init__(self):
+        self.token: Optional[dict] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def load(self) -> bool:
+        try:
+            with open(self.token_file, "r") as f:
+                self.set_token(json.load(f))
+            return True
+        except (OSError, json.JSONDecodeError, KeyError, ValueError) as e:
+            logger.warning(f"Failed to load {self.name} token: {e}")
+            return False
+
+    def save(self):
+        write_json_atomic(self.token_file, self.token)
+
+    def set_token(self, token: Optional[dict]):
+        self.token = token
+
+    @abc.abstractmethod
+    def expires_at(self) -> Optional[float]:
+        """Unix time the access token expires at, None if it never does"""
+
+    def due(self) -> Optional[float]:
+        """When maintain() needs to run next, None if never"""
+        expires_at = self.expires_at()
+        if expires_at is None:
+            return None
+        return expires_at - self.refresh_margin
+
+    def needs_refresh(self) -> bool:
+        due = self.due()
+        return self.token is None or (due is not None and time.time() >= due)
+
+    @abc.abstractmethod
+    async def refresh(self):
+        """Get a new access token, raises TokenError if that's impossible"""
+
+    async def maintain(self):
+        if self.needs_refresh():
+            async with self.lock:
+                if self.needs_refresh():
+                    await self.refresh()
+
+    async def get_token(self, refresh: bool = False) -> str:
+        """
+        Current access token. Only goes to the network when the token is
+        expired or the caller says it was rejected (`refresh`).
+        """
+        if refresh or self.needs_refresh():
+            old = self.token
+            async with self.lock:
+                # somebody else may have refreshed it while we waited
+                if self.token is old and (refresh or self.needs_refresh()):
+                    await self.refresh()
+
+        return self.token["access_token"]
+
+
+class OAuth2Token(BaseToken):
+    """
+    Standard OAuth2 refresh_token flow (Twitch, Nightbot, Streamlabs). Twitch
+    tokens additionally have to be validated periodically (`validate_url`).
+    """
+
+    validate_interval = 60 * 60
+
+    def __init__(
+        self,
+        name: str,
+        token_file: str,
+        token_url: str,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        validate_url: Optional[str] = None,
+        authorize: Optional[Callable[[], dict]] = None,
+        scope=None,
+        redirect_uri: Optional[str] = None,
+    ):
+        super().__init__()
+        self.name = name
+        self.token_file = token_file
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.validate_url = validate_url
+        self.scope = scope
+        self.redirect_uri = redirect_uri
+        self.last_validated = 0.0
+        self._session: Optional[OAuth2Session] = None
+
+        if not self.load() and authorize is not None:
+            # interactive, only happens on the very first start
+            self.set_token(authorize())
+            self.save()
+
+    def expires_at(self) -> Optional[float]:
+        if self.token is None or "expires_at" not in self.token:
+            return None
+        return float(self.token["expires_at"])
+
+    def due(self) -> Optional[float]:
+        due = super().due()
+        if self.validate_url is not None:
+            validate_at = self.last_validated + self.validate_interval
+            due = validate_at if due is None else min(due, validate_at)
+        return due
+
+    def needs_refresh(self) -> bool:
+        expires_at = self.expires_at()
+        return self.token is None or (
+            expires_at is not None and time.time() >= expires_at - self.refresh_margin
+        )
+
+    def set_token(self, token: Optional[dict]):
+        if token is not None and "expires_in" in token and "expires_at" not in token:
+            token["expires_at"] = time.time() + float(token["expires_in"])
+        self.token = token
+        if self._session is not None and token is not None:
+            self._session.token = token
+
+    def update(self, token: dict):
+        """token_updater for OAuth2Session, called when it refreshed by itself"""
+        self.set_token(token)
+        self.save()
+
+    def session(self) -> OAuth2Session:
+        """requests-oauthlib session sharing this token, for the sync API modules"""
+        if self._session is None:
+            self._session = OAuth2Session(
+                self.client_id,
+                token=self.token,
+                auto_refresh_url=self.token_url,
+                auto_refresh_kwargs={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                },
+                redirect_uri=self.redirect_uri,
+                scope=self.scope,
+                token_updater=self.update,
+            )
+        return self._session
+
+    async def refresh(self):
+        logger.info(f"Refreshing {self.name} token")
+        async with aio_http.request(
+            self.name + "-oauth",
+            "POST",
+            self.token_url,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": self.token["refresh_token"],
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+        ) as r:
+            r.raise_for_status()
+            data = await r.json()
+
+        token = dict(self.token)
+        token.update(data)
+        token.pop("expires_at", None)
+        self.set_token(token)
+        self.save()
+        self.last_validated = time.time()
+
+    async def validate(self):
+        async with aio_http.request(
+            self.name + "-oauth",
+            "GET",
+            self.validate_url,
+            headers={"Authorization": f"OAuth {self.token['access_token']}"},
+        ) as r:
+            if r.status == 401:
+                logger.info(f"{self.name} token is no longer valid")
+                await self.refresh()
+                return
+            r.raise_for_status()
+            data = await r.json()
+
+        self.last_validated = time.time()
+        if "expires_in" in data:
+            self.token["expires_at"] = time.time() + float(data["expires_in"])
+
+    async def maintain(self):
+        await super().maintain()
+        if (
+            self.validate_url is not None
+            and time.time() >= self.last_validated + self.validate_interval
+        ):
+            async with self.lock:
+                await self.validate()
+
+
+class DonateAllToken(BaseToken):
+    """donateall.online public API token, see MusicCog"""
+
+    name = "donateall"
+    token_file = "music_token.json"
+    api_url = "https://www.donateall.online/public/api/v1/"
+
+    def __init__(self, login: Optional[str], password: Optional[str]):
+        super().__init__()
+        self.login = login
+        self.password = password
+        # expiry as unix timestamps, computed once per token
+        self.access_deadline = 0.0
+        self.refresh_deadline = 0.0
+        self.load()
+
+    def set_token(self, token: Optional[dict]):
+        self.token = token
+        if token is None:
+            self.access_deadline = self.refresh_deadline = 0.0
+        else:
+            self.access_deadline = int(token["access_token_expires"]) / 1000
+            self.refresh_deadline = int(token["refresh_token_expires"]) / 1000
+
+    def expires_at(self) -> Optional[float]:
+        return self.access_deadline if self.token is not None else None
+
+    async def refresh(self):
+        if time.time() < self.refresh_deadline:
+            async with aio_http.request(
+                "donateall",
+                "POST",
+                self.api_url + "refresh",
+                json={"refresh_token": self.token["refresh_token"]},
+            ) as r:
+                if r.status == 200:
+                    data = await r.json(content_type=None)
+                    token = dict(self.token)
+                    token["access_token_expires"] = data["access_token_expires"]
+                    token["access_token"] = data["access_token"]
+                    self.set_token(token)
+                    self.save()
+                    return
+                logger.warning(
+                    f"Failed to refresh music token: {r.status} {await r.text()}"
+                )
+
+        logger.debug("get new music token from scratch")
+        async with aio_http.request(
+            "donateall",
+            "POST",
+            self.api_url + "authenticate",
+            json={"username": self.login, "password": self.password},
+        ) as r:
+            if r.status != 200:
+                self.set_token(None)
+                raise TokenError(
+                    f"Failed to get new music token: {r.status} {await r.text()}"
+                )
+            self.set_token(await r.json(content_type=None))
+        self.save()
+
+
+class TokenManager:
+    """
+    Keeps every token in memory and refreshes them in the background ahead
+    of expiry, so callers normally get a token without a network round trip.
+    """
+
+    max_sleep = 300
+    retry_delay = 60
+
+    def __init__(self):
+        self.tokens: Dict[str, BaseToken] = {}
+
+    def add(self, token: BaseToken) -> BaseToken:
+        self.tokens[token.name] = token
+        return token
+
+    def __getitem__(self, name: str) -> BaseToken:
+        return self.tokens[name]
+
+    async def run(self):
+        while True:
+            now = time.time()
+            next_check = now + self.max_sleep
+            for token in self.tokens.values():
+                try:
+                    await token.maintain()
+                    due = token.due()
+                except (aiohttp.ClientError, asyncio.TimeoutError, TokenError) as e:
+                    logger.warning(f"Failed to refresh {token.name} token: {e}")
+                    due = now + self.retry_delay
+                if due is not None:
+                    next_check = min(next_check, due)
+
+            await asyncio.sleep(max(1.0, next_check - time.time()))
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+from bs4 import BeautifulSoup
+from loguru import logger
+
+import aio_http
+
+VOXWORKER_URL = "https://voxworker.com/ru/"
+
+
+class VoxWorkerError(Exception):
+    """VoxWorker refused or failed to convert the text"""
+
+
+class VoxWorker:
+    """
+    Text-to-speech through voxworker.com. The form fields are read from the
+    page on first use; the site keeps the session in a cookie, so the
+    requests go through the "voxworker" session and its cookie jar.
+    """
+
+    voice = "rh-anna"
+    max_polls = 60
+    poll_interval = 1.0
+
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        base_url: str = VOXWORKER_URL,
+    ):
+        self.session = session
+        self.base_url = base_url
+        self.form: Optional[dict] = None
+
+    def _request(self, method: str, url: str, **kwargs):
+        return aio_http.request(
+            "voxworker", method, url, session=self.session, **kwargs
+        )
+
+    async def prepare(self):
+        async with self._request("GET", self.base_url) as r:
+            r.raise_for_status()
+            soup = BeautifulSoup(await r.text(), "html.parser")
+
+        try:
+            self.form = dict(
+                textId=soup.select("input[name=textId]")[0]["value"],
+                sessionId=soup.select("input[name=sessionId]")[0]["value"],
+                voice=self.voice,
+                speed="1.0",
+                pitch="1.0",
+            )
+        except (IndexError, KeyError):
+            raise VoxWorkerError("Failed to parse voxworker page")
+        logger.debug("VoxWorker session ready")
+
+    async def _json(self, method: str, url: str, **kwargs) -> dict:
+        async with self._request(method, url, **kwargs) as r:
+            r.raise_for_status()
+            return await r.json(content_type=None)
+
+    async def convert(self, text: str) -> bytes:
+        """MP3 of `text`"""
+        if self.form is None:
+            await self.prepare()
+
+        res = await self._json(
+            "POST", self.base_url + "ajax/convert", data=dict(self.form, text=text)
+        )
+        logger.debug("Sent request to VoxWorker")
+        if res["status"] == "notify":
+            raise VoxWorkerError(
+                f"Got status 'notify': {res['error']}, {res['errorText']}"
+            )
+
+        polls = 0
+        while res["status"] == "queue":
+            if polls == self.max_polls:
+                raise VoxWorkerError("Conversion timed out")
+            logger.debug(f"VoxWorker: request queued, count: {polls}")
+            await asyncio.sleep(self.poll_interval)
+            res = await self._json(
+                "GET", self.base_url + "ajax/status", params={"id": res["taskId"]}
+            )
+            polls += 1
+
+        if res["status"] != "ok":
+            raise VoxWorkerError(
+                f"Bad status '{res['status']}': {res.get('error')}, "
+                f"{res.get('errorText')}"
+            )
+
+        self.form["textId"] = res.get("textId", "")
+        logger.debug("Downloading file from VoxWorker")
+        async with self._request("GET", res["downloadUrl"]) as r:
+            r.raise_for_status()
+            return await r.read()
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from pywizlight import PilotBuilder, wizlight
+
+
+class LightController:
+    """
+    Keeps one wizlight (UDP handle) per bulb and talks to all bulbs at once.
+
+    Effects may overlap: the state is captured when the first effect starts
+    and restored when the last one ends, so an effect never mistakes another
+    effect's scene for the "original" one.
+    """
+
+    def __init__(self, configs: Iterable[dict]):
+        self.configs = {config["ip"]: config for config in configs}
+        self.bulbs: Dict[str, wizlight] = {}
+        # last known pilot of each bulb, None if it's off or unreachable
+        self.states: Dict[str, Optional[dict]] = {}
+        self.active_effects = 0
+        self.saved: Dict[str, Optional[dict]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def bulb(self, ip: str) -> wizlight:
+        b = self.bulbs.get(ip)
+        if b is None:
+            b = self.bulbs[ip] = wizlight(**self.configs[ip])
+        return b
+
+    async def _read_state(self, ip: str) -> Optional[dict]:
+        state = await self.bulb(ip).updateState()
+        if not state.get_state():
+            logger.error(f"!!! Lightbulb {ip} is off !!!")
+            return None
+
+        return {
+            "speed": state.get_speed(),
+            "scene": state.get_scene_id(),
+            "brightness": state.get_brightness(),
+        }
+
+    async def refresh(self) -> Dict[str, Optional[dict]]:
+        ips: List[str] = list(self.configs)
+        results = await asyncio.gather(
+            *(self._read_state(ip) for ip in ips), return_exceptions=True
+        )
+        for ip, res in zip(ips, results):
+            if isinstance(res, Exception):
+                logger.warning(f"Failed to read state of lightbulb {ip}: {res}")
+                res = None
+            self.states[ip] = res
+
+        return dict(self.states)
+
+    async def _turn_on(self, ip: str, pilot: dict):
+        await self.bulb(ip).turn_on(PilotBuilder(**pilot))
+
+    async def apply(self, pilots: Dict[str, dict]):
+        ips = list(pilots)
+        results = await asyncio.gather(
+            *(self._turn_on(ip, pilots[ip]) for ip in ips), return_exceptions=True
+        )
+        for ip, res in zip(ips, results):
+            if isinstance(res, Exception):
+                logger.warning(f"Failed to set lightbulb {ip}: {res}")
+                self.states.pop(ip, None)
+            else:
+                self.states[ip] = pilots[ip]
+
+    async def start_effect(self, pilot: dict):
+        """Switch every bulb that is on to `pilot` until stop_effect()"""
+        async with self.lock:
+            if self.active_effects == 0:
+                self.saved = await self.refresh()
+            self.active_effects += 1
+            await self.apply({ip: pilot for ip, s in self.saved.items() if s})
+
+    async def stop_effect(self):
+        async with self.lock:
+            if self.active_effects == 0:
+                logger.warning("stop_effect() without start_effect()")
+                return
+            self.active_effects -= 1
+            if self.active_effects == 0:
+                logger.info("Restoring lights...")
+                await self.apply({ip: s for ip, s in self.saved.items() if s})
+
+    async def close(self):
+        bulbs, self.bulbs = self.bulbs, {}
+        await asyncio.gather(
+            *(b.async_close() for b in bulbs.values()), return_exceptions=True
+        )